@@ -0,0 +1,102 @@
+import json
+import time
+from functools import wraps
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+
+
+def idempotency_cache_key(request, key):
+    digest = sha256(f'{request.method}:{request.path}:{key}'.encode('utf-8')).hexdigest()
+    return f'idempotency:{request.user.pk}:{digest}'
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return sha256(body.encode('utf-8')).hexdigest()
+
+
+def replay(stored):
+    response = Response(stored['data'], status=stored['status'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(func):
+    """
+    Decorator replaying the stored response of a request with the same
+    Idempotency-Key header
+
+    The first response for a key is stored in the cache for
+    IDEMPOTENCY_KEY_TIMEOUT seconds and returned verbatim to any retry by
+    the same user on the same method and path, without running the view.
+    A retry that arrives while the first request is still running waits
+    for its response, so concurrent requests with one key run the view
+    once. Requests without the header are not affected.
+
+    :param func: view method to decorate
+
+    :return: inner function
+    """
+    @wraps(func)
+    def inner(view, request, *args, **kwargs):
+        key = request.META.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return func(view, request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response({
+                'status': 'Error',
+                'message': f'Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters'
+            },
+            status=status.HTTP_400_BAD_REQUEST)
+
+        cache_key = idempotency_cache_key(request, key)
+        lock_key = f'{cache_key}:lock'
+        fingerprint = request_fingerprint(request)
+
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            stored = cache.get(cache_key)
+            if stored is not None:
+                if stored['fingerprint'] != fingerprint:
+                    return Response({
+                        'status': 'Error',
+                        'message': 'Idempotency-Key was already used with a different request'
+                    },
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                return replay(stored)
+            # cache.add only sets a missing key, so one request at a time holds the lock
+            if cache.add(lock_key, fingerprint, settings.IDEMPOTENCY_LOCK_TIMEOUT):
+                # The previous holder may have stored its response and released
+                # the lock since the read above, so read it again under the lock
+                if cache.get(cache_key) is None:
+                    break
+                cache.delete(lock_key)
+                continue
+            if time.monotonic() >= deadline:
+                return Response({
+                    'status': 'Error',
+                    'message': 'A request with this Idempotency-Key is in progress'
+                },
+                status=status.HTTP_409_CONFLICT)
+            time.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
+
+        try:
+            response = func(view, request, *args, **kwargs)
+            # Server errors are not stored so the client can retry them
+            if response.status_code < 500:
+                cache.set(cache_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'data': response.data,
+                }, settings.IDEMPOTENCY_KEY_TIMEOUT)
+            return response
+        finally:
+            cache.delete(lock_key)
+    return inner
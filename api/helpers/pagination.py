@@ -0,0 +1,132 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.utils.urls import replace_query_param
+
+
+class InvalidCursor(Exception):
+    """Raised when the cursor query param cannot be decoded"""
+
+
+class KeysetPagination:
+    """Keyset (cursor) pagination over a ``(datetime field, id)`` ordering
+
+    Pages are fetched with ``WHERE field >= value AND (field > value OR
+    (field = value AND id > pk)) LIMIT n + 1``. The ``field >= value``
+    conjunct bounds the index range scan, so every page costs the same as
+    the first one, no OFFSET is scanned and no COUNT is issued. The cursor
+    is an opaque token holding the position of the boundary row and the
+    direction of travel.
+
+    Arguments:
+        ordering {tuple} -- datetime field name and unique tie breaker field name
+        page_size {int} -- default number of items per page
+        max_page_size {int} -- upper bound for the page_size query param
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self, ordering, page_size, max_page_size):
+        self.field, self.tie_breaker = ordering
+        self.default_page_size = page_size
+        self.max_page_size = max_page_size
+
+    def paginate_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        if reverse:
+            queryset = queryset.order_by(f'-{self.field}', f'-{self.tie_breaker}')
+            if position is not None:
+                queryset = queryset.filter(self.position_filter('lt', position))
+        else:
+            queryset = queryset.order_by(self.field, self.tie_breaker)
+            if position is not None:
+                queryset = queryset.filter(self.position_filter('gt', position))
+
+        # Fetch one extra row to find out whether there is a following page
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.results = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.default_page_size
+        if page_size < 1:
+            return self.default_page_size
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next or not self.results:
+            return None
+        return self.build_link(self.get_position(self.results[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.results:
+            return None
+        return self.build_link(self.get_position(self.results[0]), reverse=True)
+
+    def get_pagination_data(self):
+        return {
+            'page_size': self.page_size,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link()
+        }
+
+    def position_filter(self, lookup, position):
+        value, pk = position
+        # Postgres cannot bound an index scan with the OR alone
+        bound = Q(**{f'{self.field}__{lookup}e': value})
+        return bound & (Q(**{f'{self.field}__{lookup}': value}) |
+                        Q(**{self.field: value, f'{self.tie_breaker}__{lookup}': pk}))
+
+    def get_position(self, item):
+        if isinstance(item, dict):
+            return item[self.field], item[self.tie_breaker]
+        return getattr(item, self.field), getattr(item, self.tie_breaker)
+
+    def build_link(self, position, reverse):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.encode_cursor(position, reverse))
+
+    def encode_cursor(self, position, reverse):
+        value, pk = position
+        payload = {'p': [value.isoformat(), pk]}
+        if reverse:
+            payload['r'] = 1
+        token = json.dumps(payload, separators=(',', ':')).encode('ascii')
+        return urlsafe_b64encode(token).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+
+        try:
+            padding = '=' * (-len(token) % 4)
+            payload = json.loads(urlsafe_b64decode((token + padding).encode('ascii')))
+            raw_value, pk = payload['p']
+            value = parse_datetime(raw_value)
+            reverse = bool(payload.get('r', 0))
+        except (BinasciiError, TypeError, ValueError, KeyError, UnicodeError):
+            raise InvalidCursor('Invalid cursor')
+        if value is None or not isinstance(pk, int):
+            raise InvalidCursor('Invalid cursor')
+        return (value, pk), reverse
@@ -0,0 +1,56 @@
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def iterate_in_chunks(queryset, chunk_size):
+    """Yield lists of at most chunk_size rows from queryset
+
+    The rows are read with QuerySet.iterator, which uses a server-side cursor
+    on PostgreSQL, so only one chunk is held in memory at a time.
+
+    Arguments:
+        queryset {QuerySet} -- rows to read
+        chunk_size {int} -- number of rows per chunk
+    """
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def stream_envelope(message, queryset, serialize, chunk_size):
+    """Stream a success envelope whose data is the serialized queryset
+
+    Produces the same ``{'status', 'message', 'data'}`` body as a Response,
+    but serializes and writes the rows chunk by chunk so peak memory does not
+    depend on the number of rows.
+
+    Arguments:
+        message {str} -- envelope message
+        queryset {QuerySet} -- rows to serialize
+        serialize {callable} -- turns a list of rows into a list of dicts
+        chunk_size {int} -- number of rows serialized at a time
+
+    Returns:
+        StreamingHttpResponse -- streaming JSON response
+    """
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    def generate():
+        head = encoder.encode({'status': 'Success', 'message': message})
+        yield f'{head[:-1]},"data":['
+        separator = ''
+        for chunk in iterate_in_chunks(queryset, chunk_size):
+            rows = serialize(chunk)
+            yield separator + ','.join(encoder.encode(row) for row in rows)
+            separator = ','
+        yield ']}'
+
+    return StreamingHttpResponse(generate(),
+                                 status=status.HTTP_200_OK,
+                                 content_type='application/json')
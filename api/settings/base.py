@@ -176,3 +176,81 @@ EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
+
+# Cache configuration
+# The local memory cache is per process, production shares memcached
+# between the web and worker processes
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+FLIGHT_CACHE_TIMEOUT = int(os.getenv('FLIGHT_CACHE_TIMEOUT', 300))
+
+# Flight list pagination
+FLIGHT_LIST_PAGE_SIZE = int(os.getenv('FLIGHT_LIST_PAGE_SIZE', 50))
+FLIGHT_LIST_MAX_PAGE_SIZE = int(os.getenv('FLIGHT_LIST_MAX_PAGE_SIZE', 500))
+
+# Streaming flight exports
+FLIGHT_EXPORT_CHUNK_SIZE = int(os.getenv('FLIGHT_EXPORT_CHUNK_SIZE', 2000))
+
+# Bulk flight import
+FLIGHT_IMPORT_BATCH_SIZE = int(os.getenv('FLIGHT_IMPORT_BATCH_SIZE', 5000))
+
+# Batched flight updates and deletes
+FLIGHT_BATCH_SIZE = int(os.getenv('FLIGHT_BATCH_SIZE', 1000))
+
+# Itinerary search connection times
+ITINERARY_MIN_CONNECTION_MINUTES = int(os.getenv('ITINERARY_MIN_CONNECTION_MINUTES', 45))
+ITINERARY_MAX_CONNECTION_HOURS = int(os.getenv('ITINERARY_MAX_CONNECTION_HOURS', 24))
+
+# Ticket numbers
+# TICKET_NUMBER_KEY keys the ticket number permutation and must never change
+# once tickets have been issued
+TICKET_NUMBER_KEY = os.getenv('TICKET_NUMBER_KEY', 'airtech-flight-tickets')
+TICKET_NUMBER_BLOCK_SIZE = int(os.getenv('TICKET_NUMBER_BLOCK_SIZE', 100))
+
+# Flights booked together in one group booking
+BOOKING_GROUP_MAX_FLIGHTS = int(os.getenv('BOOKING_GROUP_MAX_FLIGHTS', 10))
+
+# Stored responses for requests sent with an Idempotency-Key header
+IDEMPOTENCY_KEY_TIMEOUT = int(os.getenv('IDEMPOTENCY_KEY_TIMEOUT', 60 * 60 * 24))
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', 30))
+IDEMPOTENCY_WAIT_SECONDS = int(os.getenv('IDEMPOTENCY_WAIT_SECONDS', 10))
+IDEMPOTENCY_POLL_INTERVAL = 0.05
+
+# Relay publishing the notification outbox to Celery
+NOTIFICATION_RELAY_BATCH_SIZE = int(os.getenv('NOTIFICATION_RELAY_BATCH_SIZE', 500))
+NOTIFICATION_RELAY_POLL_INTERVAL = float(os.getenv('NOTIFICATION_RELAY_POLL_INTERVAL', 0.5))
+
+# Flight reservations list pagination
+BOOKING_RESERVATIONS_PAGE_SIZE = int(os.getenv('BOOKING_RESERVATIONS_PAGE_SIZE', 100))
+BOOKING_RESERVATIONS_MAX_PAGE_SIZE = int(os.getenv('BOOKING_RESERVATIONS_MAX_PAGE_SIZE', 1000))
+
+# Rendered tickets served to ticket status lookups. Keep it well below the
+# lifetime of the signed passport photo URLs they contain.
+TICKET_CACHE_TIMEOUT = int(os.getenv('TICKET_CACHE_TIMEOUT', 300))
+
+# Unpaid bookings are cancelled once they are older than the hold window
+BOOKING_HOLD_HOURS = int(os.getenv('BOOKING_HOLD_HOURS', 24))
+BOOKING_EXPIRY_BATCH_SIZE = int(os.getenv('BOOKING_EXPIRY_BATCH_SIZE', 1000))
+
+# Per-flight booking stats
+BOOKING_STATS_CACHE_TIMEOUT = int(os.getenv('BOOKING_STATS_CACHE_TIMEOUT', 60))
+BOOKING_STATS_MAX_FLIGHTS = int(os.getenv('BOOKING_STATS_MAX_FLIGHTS', 500))
+
+# Pooled SMTP connections used by the mail workers
+MAIL_POOL_SIZE = int(os.getenv('MAIL_POOL_SIZE', 2))
+MAIL_BATCH_SIZE = int(os.getenv('MAIL_BATCH_SIZE', 100))
+MAIL_IDLE_TIMEOUT = int(os.getenv('MAIL_IDLE_TIMEOUT', 60))
+MAIL_RETRIES = int(os.getenv('MAIL_RETRIES', 2))
+# Seconds between publishing the mail counters of a worker and logging their totals
+MAIL_STATS_INTERVAL = int(os.getenv('MAIL_STATS_INTERVAL', 60))
+
+# Travel reminders sent per worker task, and how long a run's progress is kept
+REMINDER_CHUNK_SIZE = int(os.getenv('REMINDER_CHUNK_SIZE', 500))
+REMINDER_RUN_TIMEOUT = int(os.getenv('REMINDER_RUN_TIMEOUT', 60 * 60 * 12))
+
+# Outbound email rate shared by the mail workers, in messages per second (0 disables it)
+MAIL_SEND_RATE = float(os.getenv('MAIL_SEND_RATE', 10))
+MAIL_SEND_BURST = int(os.getenv('MAIL_SEND_BURST', 100))
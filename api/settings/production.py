@@ -1,6 +1,7 @@
 import os
 
 import django_heroku
+from django.core.exceptions import ImproperlyConfigured
 
 from .base import *
 
@@ -13,5 +14,18 @@ X_FRAME_OPTIONS = 'DENY'
 # Celery configuration
 CELERY_BROKER_URL = os.getenv('CLOUDAMQP_URL')
 
+# Cache configuration
+# Catalog versions, idempotency locks, ticket invalidation and the email send
+# rate are shared through the cache, so every web and worker process must use
+# the same one: a per-process LocMemCache would silently serve stale data.
+if not os.getenv('MEMCACHED_LOCATION'):
+    raise ImproperlyConfigured('MEMCACHED_LOCATION must be set in production')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': os.getenv('MEMCACHED_LOCATION').split(','),
+    }
+}
+
 # Configure Django App for Heroku.
 django_heroku.settings(locals())
@@ -0,0 +1,59 @@
+"""Benchmarks for the airtech-flight API
+
+Every benchmark is a module runnable from the project root, e.g.
+
+    >$ python -m benchmarks.flight_search --sizes 100000 1000000
+
+Benchmarks never touch the configured database: they create a throwaway
+test database (the same one ``manage.py test`` would use), seed it and
+destroy it when they finish.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+
+def setup():
+    """Configure Django the same way manage.py does"""
+    load_dotenv()
+    if os.getenv('DJANGO_ENV') == 'production':
+        settings = 'api.settings.production'
+    else:
+        settings = 'api.settings.development'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings)
+
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database(keepdb=False):
+    """Create the test database for the duration of the block
+
+    Keyword Arguments:
+        keepdb {bool} -- keep the database between runs (default: {False})
+    """
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+
+@contextmanager
+def timer(label, results=None):
+    """Print (and optionally record) the wall time spent in the block"""
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    if results is not None:
+        results[label] = elapsed
+    print(f'{label}: {elapsed * 1000:.2f} ms')
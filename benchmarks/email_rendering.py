@@ -0,0 +1,81 @@
+"""Rendering of the travel reminder emails
+
+Renders the reminders of unsaved in-memory bookings, so no database is
+needed, and prints the renders per second of the legacy pipeline
+(``render_to_string`` of the HTML, ``strip_tags`` for the text part and
+datetimes parsed back from strings by the filters) and of the compiled
+template pair used by the tasks.
+
+    >$ python -m benchmarks.email_rendering --reminders 100000
+"""
+import argparse
+import time
+from datetime import timedelta
+
+from . import setup
+
+
+def build_bookings(count):
+    from django.utils import timezone
+
+    from bookings.models import Booking
+    from flights.models import Flight
+    from users.models import User
+
+    departure = timezone.now() + timedelta(days=1)
+    flight = Flight(flight_number='AT0001', departing='Lagos', departing_airport='LOS',
+                    destination='Dubai', destination_airport='DXB',
+                    departure_datetime=departure,
+                    arrival_datetime=departure + timedelta(hours=7))
+    return [Booking(ticket_number=f'{index:06X}', flight_id=flight, passenger_id=User(
+        email=f'passenger{index}@example.com', first_name='Jane', last_name=f'Doe {index}'))
+            for index in range(count)]
+
+
+def legacy_message(booking):
+    from django.conf import settings
+    from django.core.mail import EmailMultiAlternatives
+    from django.template.loader import render_to_string
+    from django.utils.html import strip_tags
+
+    html_content = render_to_string('bookings/reminder.html', {
+        'ticket_number': booking.ticket_number,
+        'departure_datetime': booking.flight_id.departure_datetime.isoformat(),
+        'departure_airport': booking.flight_id.departing,
+        'arrival_datetime': booking.flight_id.arrival_datetime.isoformat(),
+        'destination_airport': booking.flight_id.destination,
+        'passenger': [booking.passenger_id.first_name, booking.passenger_id.last_name]
+    })
+    message = EmailMultiAlternatives(
+        f'Reminder - Flight schedule to {booking.flight_id.destination}',
+        strip_tags(html_content), settings.EMAIL_HOST_USER, [booking.passenger_id.email])
+    message.attach_alternative(html_content, 'text/html')
+    return message
+
+
+def run(count):
+    from django.conf import settings
+
+    from bookings.tasks import reminder_message
+
+    bookings = build_bookings(count)
+    print(f'{count} reminders, DEBUG={settings.DEBUG}')
+    for label, render in (('legacy', legacy_message), ('compiled', reminder_message)):
+        start = time.perf_counter()
+        for booking in bookings:
+            render(booking)
+        elapsed = time.perf_counter() - start
+        print(f'{label}: {count / elapsed:.0f} renders/s ({elapsed:.2f} s)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--reminders', type=int, default=100000)
+    args = parser.parse_args()
+
+    setup()
+    run(args.reminders)
+
+
+if __name__ == '__main__':
+    main()
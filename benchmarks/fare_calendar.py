@@ -0,0 +1,72 @@
+"""Fare calendar latency, cold and from cache
+
+Seeds the catalog up to each requested size and, for every size, requests
+the fare calendar of random routes and months through FareCalendarView,
+printing the median latency of the cold (aggregate) and cached responses.
+
+    >$ python -m benchmarks.fare_calendar --sizes 100000 1000000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from . import setup, test_database
+
+
+def run(sizes, repeat):
+    from django.core.cache import cache
+    from django.utils import timezone
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    from flights.views import FareCalendarView
+    from .fixtures import AIRPORTS, create_admin, create_flights
+
+    admin = create_admin()
+    view = FareCalendarView.as_view()
+    factory = APIRequestFactory()
+    rng = random.Random(1)
+
+    def get_fares(params):
+        request = factory.get('/api/v1/flights/fares', params)
+        force_authenticate(request, admin)
+        start = time.perf_counter()
+        response = view(request)
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 200, response.data
+        return elapsed
+
+    seeded = 0
+    for size in sorted(sizes):
+        create_flights(size - seeded, admin, seed=size)
+        seeded = size
+        cache.clear()
+
+        cold, cached = [], []
+        for _ in range(repeat):
+            (_, origin), (_, destination) = rng.sample(AIRPORTS, 2)
+            month = timezone.now() + timedelta(days=rng.randrange(30, 330))
+            params = {'departing_airport': origin, 'destination_airport': destination,
+                      'month': month.strftime('%Y-%m')}
+            cold.append(get_fares(params))
+            cached.append(get_fares(params))
+            cache.clear()
+
+        print(f'{size} flights: cold {statistics.median(cold) * 1000:.2f} ms, '
+              f'cached {statistics.median(cached) * 1000:.2f} ms (median of {repeat})')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        run(args.sizes, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Data generators shared by the benchmarks"""
+import random
+from datetime import timedelta
+
+from django.utils import timezone
+
+AIRPORTS = [
+    ('Lagos', 'LOS'), ('Abuja', 'ABV'), ('Nairobi', 'NBO'), ('Accra', 'ACC'),
+    ('Johannesburg', 'JNB'), ('Cairo', 'CAI'), ('Dubai', 'DXB'), ('London', 'LHR'),
+    ('Paris', 'CDG'), ('Amsterdam', 'AMS'), ('Frankfurt', 'FRA'), ('Istanbul', 'IST'),
+    ('Doha', 'DOH'), ('New York', 'JFK'), ('Atlanta', 'ATL'), ('Addis Ababa', 'ADD'),
+    ('Kigali', 'KGL'), ('Dakar', 'DSS'), ('Casablanca', 'CMN'), ('Cape Town', 'CPT'),
+]
+
+
+def create_admin(email='bench-admin@example.com'):
+    from users.models import User
+
+    return User.objects.create_superuser(email, 'Bench', 'Admin', password='benchmark')
+
+
+def create_users(count, prefix='bench-user'):
+    """Bulk create passengers without paying for password hashing"""
+    from users.models import User
+
+    users = []
+    for index in range(count):
+        user = User(email=f'{prefix}-{index}@example.com', first_name='Bench',
+                    last_name='User', phone_number=f'+{10 ** 10 + index}')
+        user.set_unusable_password()
+        users.append(user)
+    return User.objects.bulk_create(users, batch_size=5000)
+
+
+def flight_rows(count, days=365, seed=1):
+    """Yield unsaved Flight instances spread over ``days`` from tomorrow"""
+    from flights.models import Flight
+
+    rng = random.Random(seed)
+    start = timezone.now() + timedelta(days=1)
+    for index in range(count):
+        (departing, departing_airport), (destination, destination_airport) = rng.sample(AIRPORTS, 2)
+        departure = start + timedelta(minutes=rng.randrange(days * 24 * 60))
+        yield Flight(
+            flight_number=f'BN{index}',
+            departure_datetime=departure,
+            arrival_datetime=departure + timedelta(minutes=rng.randrange(60, 16 * 60)),
+            flight_cost=rng.randrange(80, 1500),
+            departing=departing,
+            departing_airport=departing_airport,
+            destination=destination,
+            destination_airport=destination_airport,
+        )
+
+
+def create_flights(count, created_by, days=365, batch_size=10000, seed=1):
+    """Insert ``count`` random flights in batches and refresh the planner stats"""
+    from django.db import connection
+    from flights.models import Flight
+
+    batch = []
+    for flight in flight_rows(count, days=days, seed=seed):
+        flight.created_by = created_by
+        batch.append(flight)
+        if len(batch) == batch_size:
+            Flight.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Flight.objects.bulk_create(batch)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'ANALYZE {Flight._meta.db_table}')
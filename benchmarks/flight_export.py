@@ -0,0 +1,53 @@
+"""Streaming flight export
+
+Seeds the catalog up to each requested size and streams the whole flight list
+through the export path, printing the wall time and the peak Python memory
+allocated while the body is produced. The peak should stay flat as the
+catalog grows.
+
+    >$ python -m benchmarks.flight_export --sizes 10000 100000 500000
+"""
+import argparse
+import tracemalloc
+
+from . import setup, test_database, timer
+
+
+def run(sizes):
+    from django.conf import settings
+
+    from api.helpers.streaming import stream_envelope
+    from flights.models import Flight
+    from flights.views import flight_reader
+    from .fixtures import create_admin, create_flights
+
+    admin = create_admin()
+    seeded = 0
+    for size in sorted(sizes):
+        create_flights(size - seeded, admin, seed=size)
+        seeded = size
+        print(f'\n=== {size} flights ===')
+
+        queryset = flight_reader.values(Flight.objects.order_by('departure_datetime', 'id'))
+        response = stream_envelope('Flights retrieved', queryset, flight_reader.serialize,
+                                   settings.FLIGHT_EXPORT_CHUNK_SIZE)
+        tracemalloc.start()
+        with timer('stream'):
+            length = sum(len(part) for part in response.streaming_content)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'body: {length / 2 ** 20:.1f} MiB, peak memory: {peak / 2 ** 20:.1f} MiB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 500000])
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        run(args.sizes)
+
+
+if __name__ == '__main__':
+    main()
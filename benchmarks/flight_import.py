@@ -0,0 +1,74 @@
+"""Bulk flight import
+
+Writes a seasonal schedule of the requested size to a CSV file and imports it
+with FlightImporter, once through PostgreSQL COPY and once through
+bulk_create, printing the rows per second of each.
+
+    >$ python -m benchmarks.flight_import --rows 500000
+"""
+import argparse
+import csv
+import tempfile
+from datetime import timedelta
+
+from . import setup, test_database, timer
+
+COLUMNS = ('flight_number', 'departure_datetime', 'arrival_datetime', 'flight_cost',
+           'departing', 'departing_airport', 'destination', 'destination_airport')
+
+
+def write_schedule(stream, rows):
+    from .fixtures import flight_rows
+
+    # Shift the schedule a day later so no row falls inside the 24 hour rule
+    shift = timedelta(days=1)
+    writer = csv.writer(stream)
+    writer.writerow(COLUMNS)
+    for flight in flight_rows(rows):
+        writer.writerow([
+            flight.flight_number,
+            (flight.departure_datetime + shift).isoformat(),
+            (flight.arrival_datetime + shift).isoformat(),
+            flight.flight_cost.amount,
+            flight.departing,
+            flight.departing_airport,
+            flight.destination,
+            flight.destination_airport,
+        ])
+    stream.flush()
+
+
+def run(rows):
+    from flights.importer import FlightImporter, read_rows
+    from flights.models import Flight
+    from .fixtures import create_admin
+
+    admin = create_admin()
+    with tempfile.NamedTemporaryFile('w+', suffix='.csv', newline='') as schedule:
+        write_schedule(schedule, rows)
+
+        for label, use_copy in (('COPY', True), ('bulk_create', False)):
+            Flight.objects.all().delete()
+            schedule.seek(0)
+            results = {}
+            with timer(f'{label} import of {rows} rows', results):
+                report = FlightImporter(admin, use_copy=use_copy).run(
+                    read_rows(schedule, 'csv'))
+            if report['imported'] != rows:
+                raise SystemExit(f'{label} imported {report["imported"]} of {rows} rows')
+            elapsed = results[f'{label} import of {rows} rows']
+            print(f'{label}: {rows / elapsed:.0f} rows/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=500000)
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        run(args.rows)
+
+
+if __name__ == '__main__':
+    main()
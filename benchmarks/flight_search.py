@@ -0,0 +1,84 @@
+"""Route and departure date search over the flight catalog
+
+Seeds the catalog up to each requested size and, for every size, prints the
+query plan and the median latency of the searches the flight list endpoint
+runs, failing if the planner does not read one of the flight indexes.
+
+    >$ python -m benchmarks.flight_search --sizes 100000 1000000
+"""
+import argparse
+import statistics
+import time
+from datetime import timedelta
+
+from . import setup, test_database
+
+
+def measure(queryset, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        list(queryset.all())
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def run(sizes, repeat):
+    from django.conf import settings
+    from django.utils import timezone
+
+    from flights.models import Flight
+    from .fixtures import create_admin, create_flights
+
+    admin = create_admin()
+    page_size = settings.FLIGHT_LIST_PAGE_SIZE
+    tomorrow = timezone.now() + timedelta(days=1)
+    searches = {
+        'route + day': {
+            'departing_airport': 'LOS', 'destination_airport': 'NBO',
+            'departure_datetime__gte': tomorrow + timedelta(days=30),
+            'departure_datetime__lt': tomorrow + timedelta(days=31),
+        },
+        'route + week': {
+            'departing_airport': 'LOS', 'destination_airport': 'NBO',
+            'departure_datetime__gte': tomorrow + timedelta(days=30),
+            'departure_datetime__lt': tomorrow + timedelta(days=37),
+        },
+        'destination + day': {
+            'destination_airport': 'NBO',
+            'departure_datetime__gte': tomorrow + timedelta(days=30),
+            'departure_datetime__lt': tomorrow + timedelta(days=31),
+        },
+    }
+
+    seeded = 0
+    for size in sorted(sizes):
+        create_flights(size - seeded, admin, seed=size)
+        seeded = size
+        print(f'\n=== {size} flights ===')
+
+        for label, filters in searches.items():
+            queryset = (Flight.objects.filter(**filters)
+                        .order_by('departure_datetime', 'id')[:page_size + 1])
+            plan = queryset.explain()
+            latency = measure(queryset, repeat)
+
+            print(f'\n{label}: {latency * 1000:.2f} ms (median of {repeat})')
+            print(plan)
+            if 'Index' not in plan:
+                raise SystemExit(f'{label} did not use an index at {size} flights')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        run(args.sizes, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""FlightSerializer against the values() read path
+
+Seeds the catalog up to each requested size and, for every size, times
+serializing the whole catalog with FlightSerializer over model instances and
+with FlightReadSerializer over values() rows, failing if the outputs differ.
+
+    >$ python -m benchmarks.flight_serialization --sizes 1000 10000 100000
+"""
+import argparse
+import json
+import statistics
+import time
+
+from . import setup, test_database
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def run(sizes, repeat):
+    from flights.models import Flight
+    from flights.serializers import FlightSerializer, FlightReadSerializer
+    from .fixtures import create_admin, create_flights
+
+    admin = create_admin()
+    reader = FlightReadSerializer()
+    seeded = 0
+    for size in sorted(sizes):
+        create_flights(size - seeded, admin, seed=size)
+        seeded = size
+        queryset = Flight.objects.order_by('departure_datetime', 'id')
+
+        model_time, model_data = measure(
+            lambda: FlightSerializer(queryset.all(), many=True).data, repeat)
+        values_time, values_data = measure(
+            lambda: reader.serialize(reader.values(queryset.all())), repeat)
+
+        if json.dumps(model_data) != json.dumps(values_data):
+            raise SystemExit(f'Outputs differ at {size} flights')
+        print(f'{size} flights: FlightSerializer {model_time * 1000:.1f} ms, '
+              f'FlightReadSerializer {values_time * 1000:.1f} ms, '
+              f'speedup {model_time / values_time:.1f}x (median of {repeat})')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        run(args.sizes, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
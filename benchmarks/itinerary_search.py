@@ -0,0 +1,64 @@
+"""Multi-leg itinerary search over the in-memory flight graph
+
+Seeds the catalog up to each requested size, builds the flight graph and
+times 1- and 2-stop searches between random airport pairs, printing the
+build time and the median and 99th percentile search latency.
+
+    >$ python -m benchmarks.itinerary_search --sizes 10000 100000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from . import setup, test_database, timer
+
+
+def run(sizes, queries):
+    from django.utils import timezone
+
+    from flights.itineraries import FlightGraph
+    from .fixtures import AIRPORTS, create_admin, create_flights
+
+    admin = create_admin()
+    rng = random.Random(1)
+    seeded = 0
+    for size in sorted(sizes):
+        create_flights(size - seeded, admin, seed=size)
+        seeded = size
+        print(f'\n=== {size} flights ===')
+
+        graph = FlightGraph()
+        with timer('build graph'):
+            graph.sync()
+
+        tomorrow = timezone.now() + timedelta(days=1)
+        for sort in ('duration', 'cost'):
+            timings, found = [], 0
+            for _ in range(queries):
+                (_, origin), (_, destination) = rng.sample(AIRPORTS, 2)
+                start = tomorrow + timedelta(days=rng.randrange(300))
+                began = time.perf_counter()
+                found += len(graph.search(origin, destination, start,
+                                          start + timedelta(days=1), sort=sort))
+                timings.append(time.perf_counter() - began)
+            timings.sort()
+            print(f'search by {sort}: p50 {statistics.median(timings) * 1000:.2f} ms, '
+                  f'p99 {timings[int(len(timings) * 0.99) - 1] * 1000:.2f} ms, '
+                  f'{found / queries:.1f} itineraries per search')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--queries', type=int, default=500)
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        run(args.sizes, args.queries)
+
+
+if __name__ == '__main__':
+    main()
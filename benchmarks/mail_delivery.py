@@ -0,0 +1,79 @@
+"""Booking email delivery through the SMTP connection pool
+
+Sends the same ticket emails to a local SMTP sink twice: one
+``message.send()`` per email, as the tasks used to, and through
+``MailPool.send``, and prints the messages per second of both. The sink
+simulates the connection handshake and the round trip of a remote server.
+
+    >$ python -m benchmarks.mail_delivery --messages 2000 --rtt 2
+"""
+import argparse
+import time
+
+from . import setup
+from .smtp_sink import SMTPSink
+
+
+def build_messages(count):
+    from bookings.tasks import ticket_message
+
+    return [ticket_message({
+        'ticket_number': f'TK{index:04d}',
+        'flight_status': 'Booked',
+        'flight': {
+            'flight_number': 'AT0001',
+            'departing': 'Lagos',
+            'destination': 'Abuja',
+            'destination_airport': 'ABV',
+            'departure_datetime': '2030-01-01T07:00:00Z',
+            'arrival_datetime': '2030-01-01T08:00:00Z',
+        },
+        'passenger': {
+            'first_name': 'Jane',
+            'last_name': 'Doe',
+            'email': f'passenger{index}@example.com',
+        },
+    }) for index in range(count)]
+
+
+def run(count, rtt, handshake):
+    from django.test import override_settings
+
+    from bookings.mail import SMTP_BACKEND, MailPool
+
+    messages = build_messages(count)
+    with SMTPSink(connect_delay=handshake / 1000, command_delay=rtt / 1000) as sink:
+        with override_settings(EMAIL_BACKEND=SMTP_BACKEND, EMAIL_HOST=sink.host,
+                               EMAIL_PORT=sink.port, EMAIL_USE_TLS=False,
+                               EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD=''):
+            start = time.perf_counter()
+            for message in messages:
+                message.send()
+            serial = time.perf_counter() - start
+
+            pool = MailPool()
+            start = time.perf_counter()
+            pool.send(messages)
+            pooled = time.perf_counter() - start
+
+        print(f'{count} messages, {rtt} ms round trip, {handshake} ms handshake')
+        print(f'message.send(): {count / serial:.1f} msg/s ({serial * 1000:.2f} ms)')
+        print(f'MailPool.send(): {count / pooled:.1f} msg/s ({pooled * 1000:.2f} ms)')
+        print(f'sink received {sink.received} messages over {sink.connections} connections')
+        print(f'pool stats: {pool.stats()}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--rtt', type=float, default=2, help='milliseconds per SMTP reply')
+    parser.add_argument('--handshake', type=float, default=50,
+                        help='milliseconds to open a connection')
+    args = parser.parse_args()
+
+    setup()
+    run(args.messages, args.rtt, args.handshake)
+
+
+if __name__ == '__main__':
+    main()
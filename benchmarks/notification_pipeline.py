@@ -0,0 +1,193 @@
+"""End-to-end latency of the booking notifications
+
+Runs the whole notification path in one process: bookings and
+reservations go through BookingListView and BookingDetailView, the relay
+publishes their outbox rows to an in-memory broker, an in-process Celery
+worker runs the email tasks and the messages are delivered to a local SMTP
+sink. Prints the p50/p99 latency from the start of each request to the
+delivery of its email, and the CPU the worker and the relay spent per
+message.
+
+    >$ python -m benchmarks.notification_pipeline --bookings 1000 --rtt 2
+"""
+import argparse
+import email
+import re
+import statistics
+import threading
+import time
+
+from . import setup, test_database, timer
+from .smtp_sink import SMTPSink
+
+TICKET_NUMBER = re.compile(r'Ticket number: (\w+)')
+
+
+class RelayThread(threading.Thread):
+    """Relay the outbox until stopped, recording the CPU it used"""
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.stopping = threading.Event()
+        self.cpu_seconds = 0
+
+    def run(self):
+        from django.db import connection
+
+        from bookings.outbox import NotificationRelay
+
+        relay = NotificationRelay(poll_interval=0.01)
+        try:
+            while not self.stopping.is_set():
+                if not relay.relay_batch():
+                    time.sleep(relay.poll_interval)
+        finally:
+            self.cpu_seconds = time.thread_time()
+            connection.close()
+
+
+class TaskCPU:
+    """Sum the CPU time of the tasks run by the worker thread"""
+    def __init__(self):
+        self.started = {}
+        self.seconds = 0
+        self.tasks = 0
+
+    def prerun(self, task_id=None, **kwargs):
+        self.started[task_id] = time.thread_time()
+
+    def postrun(self, task_id=None, **kwargs):
+        from django.db import close_old_connections
+
+        self.seconds += time.thread_time() - self.started.pop(task_id)
+        self.tasks += 1
+        # As the Django fixup of a real worker does
+        close_old_connections()
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def delivered_at(sink):
+    """Delivery time of every message by (notification, ticket number)"""
+    delivered = {}
+    for received, data in sink.messages:
+        message = email.message_from_bytes(data)
+        kind = 'reservation' if message['Subject'].endswith('Reserved') else 'booking'
+        for part in message.walk():
+            if part.get_content_type() == 'text/plain':
+                text = part.get_payload(decode=True).decode()
+                delivered[(kind, TICKET_NUMBER.search(text).group(1))] = received
+    return delivered
+
+
+def drive(flight, passengers):
+    """Book and reserve a seat for every passenger through the views
+
+    Arguments:
+        flight {Flight} -- flight to book
+        passengers {list} -- users booking the flight
+
+    Returns:
+        dict -- request start time by (notification, ticket number)
+    """
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    from bookings.views import BookingDetailView, BookingListView
+
+    booking_view = BookingListView.as_view()
+    detail_view = BookingDetailView.as_view()
+    factory = APIRequestFactory()
+    amount = str(flight.flight_cost.amount)
+
+    started = {}
+    for passenger in passengers:
+        start = time.time()
+        request = factory.post('/api/v1/bookings', {'flight_id': flight.id}, format='json')
+        force_authenticate(request, passenger)
+        response = booking_view(request)
+        assert response.status_code == 201, response.data
+        ticket = response.data['data']
+        started[('booking', ticket['ticket_number'])] = start
+
+        start = time.time()
+        request = factory.put(f'/api/v1/bookings/{ticket["id"]}', {'amount_paid': amount},
+                              format='json')
+        force_authenticate(request, passenger)
+        response = detail_view(request, booking_pk=ticket['id'])
+        assert response.status_code == 200, response.data
+        started[('reservation', ticket['ticket_number'])] = start
+    return started
+
+
+def run(count, rtt, timeout):
+    import celery.contrib.testing.tasks  # noqa: F401 registers the ping task start_worker needs
+    from celery import signals
+    from celery.contrib.testing.worker import start_worker
+    from django.test import override_settings
+
+    from api.celery import app
+    from bookings.mail import SMTP_BACKEND, mail_pool, send_rate
+    from flights.models import Flight
+    from .fixtures import create_admin, create_flights, create_users
+
+    admin = create_admin()
+    create_flights(1, admin)
+    Flight.objects.update(capacity=count)
+    flight = Flight.objects.get()
+    passengers = create_users(count)
+
+    app.conf.update(broker_url='memory://',
+                    broker_transport_options={'polling_interval': 0.01})
+    send_rate.rate = 0
+    cpu = TaskCPU()
+    signals.task_prerun.connect(cpu.prerun, weak=False)
+    signals.task_postrun.connect(cpu.postrun, weak=False)
+
+    with SMTPSink(command_delay=rtt / 1000, keep=True) as sink, \
+         override_settings(EMAIL_BACKEND=SMTP_BACKEND, EMAIL_HOST=sink.host,
+                           EMAIL_PORT=sink.port, EMAIL_USE_TLS=False,
+                           EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD=''), \
+         start_worker(app, pool='solo', perform_ping_check=False):
+        relay = RelayThread()
+        relay.start()
+        with timer(f'{count} bookings and reservations'):
+            started = drive(flight, passengers)
+        with timer('drain'):
+            deadline = time.monotonic() + timeout
+            while sink.received < len(started) and time.monotonic() < deadline:
+                time.sleep(0.05)
+        relay.stopping.set()
+        relay.join()
+
+    delivered = delivered_at(sink)
+    print(f'delivered {len(delivered)} of {len(started)} messages')
+    for kind in ('booking', 'reservation'):
+        latencies = [(delivered[key] - start) * 1000 for key, start in started.items()
+                     if key[0] == kind and key in delivered]
+        if latencies:
+            print(f'{kind}: p50 {statistics.median(latencies):.1f} ms, '
+                  f'p99 {percentile(latencies, 99):.1f} ms')
+    if delivered:
+        print(f'worker CPU {cpu.seconds / len(delivered) * 1000:.3f} ms/message '
+              f'over {cpu.tasks} tasks, relay CPU '
+              f'{relay.cpu_seconds / len(delivered) * 1000:.3f} ms/message')
+    print(f'pool stats: {mail_pool.stats()}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bookings', type=int, default=1000)
+    parser.add_argument('--rtt', type=float, default=0, help='milliseconds per SMTP reply')
+    parser.add_argument('--timeout', type=float, default=300,
+                        help='seconds to wait for the last delivery')
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        run(args.bookings, args.rtt, args.timeout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Reservation listing of one flight with a large manifest
+
+Seeds one flight with the requested number of bookings, half of them
+reserved, and times the flight/date/status listing of BookingListView:
+the legacy count plus full list on ``__date`` lookups, the first page of the
+paginated listing and a walk over every page.
+
+    >$ python -m benchmarks.reservations_list --bookings 50000
+"""
+import argparse
+import statistics
+import time
+from datetime import timedelta
+from urllib.parse import parse_qs, urlparse
+
+from . import setup, test_database, timer
+
+
+def legacy_listing(flight, flight_status, date):
+    from bookings.models import Booking
+    from bookings.serializers import BookingReservationsSerializer
+
+    date_field = 'reserved_at' if flight_status == 'R' else 'created_at'
+    bookings = Booking.objects.filter(flight_id=flight, flight_status=flight_status,
+                                      **{f'{date_field}__date__lte': date})
+    serializer = BookingReservationsSerializer(bookings, many=True)
+    return {'count': bookings.count(), 'reservations': serializer.data}
+
+
+def seed_bookings(flight, passengers):
+    from django.db import connection
+    from django.utils import timezone
+
+    from bookings.models import Booking
+    from bookings.tickets import ticket_numbers
+
+    now = timezone.now()
+    bookings = []
+    for index, passenger in enumerate(passengers):
+        reserved = index % 2 == 0
+        bookings.append(Booking(ticket_number=ticket_numbers.allocate(),
+                                flight_id=flight, passenger_id=passenger,
+                                flight_status='R' if reserved else 'B',
+                                reserved_at=now if reserved else None))
+    Booking.objects.bulk_create(bookings, batch_size=10000)
+    with connection.cursor() as cursor:
+        cursor.execute(f'ANALYZE {Booking._meta.db_table}')
+
+
+def run(size, repeat):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django.utils import timezone
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    from bookings.views import BookingListView
+    from flights.models import Flight
+    from .fixtures import create_admin, create_flights, create_users
+
+    admin = create_admin()
+    create_flights(1, admin)
+    Flight.objects.update(capacity=size)
+    flight = Flight.objects.get()
+    with timer(f'seed {size} bookings'):
+        seed_bookings(flight, create_users(size))
+
+    view = BookingListView.as_view()
+    factory = APIRequestFactory()
+    date = (timezone.now() + timedelta(days=1)).date().isoformat()
+
+    def get_page(params):
+        request = factory.get('/api/v1/bookings', params)
+        force_authenticate(request, admin)
+        response = view(request)
+        assert response.status_code == 200, response.data
+        return response.data['data']
+
+    for flight_status, label in (('B', 'Booked'), ('R', 'Reserved')):
+        params = {'flight': flight.id, 'date': date, 'status': label}
+        timings = {'legacy': [], 'first page': []}
+        for _ in range(repeat):
+            start = time.perf_counter()
+            legacy_listing(flight, flight_status, date)
+            timings['legacy'].append(time.perf_counter() - start)
+
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                get_page(params)
+                timings['first page'].append(time.perf_counter() - start)
+
+        start, pages = time.perf_counter(), 0
+        page_params = dict(params, page_size=1000)
+        while True:
+            data = get_page(page_params)
+            pages += 1
+            if not data['pagination']['next']:
+                break
+            cursor = parse_qs(urlparse(data['pagination']['next']).query)['cursor'][0]
+            page_params = dict(params, page_size=1000, cursor=cursor)
+        walk = time.perf_counter() - start
+
+        print(f'{label}: legacy {statistics.median(timings["legacy"]) * 1000:.2f} ms, '
+              f'first page {statistics.median(timings["first page"]) * 1000:.2f} ms '
+              f'in {len(queries)} queries, all {pages} pages of 1000 {walk * 1000:.2f} ms '
+              f'(median of {repeat})')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bookings', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        run(args.bookings, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
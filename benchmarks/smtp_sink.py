@@ -0,0 +1,125 @@
+"""Local SMTP server that accepts and discards every message
+
+A stand-in for the real mail provider in benchmarks: it speaks just enough
+SMTP for ``smtplib`` (EHLO, MAIL, RCPT, DATA, RSET, NOOP, QUIT) and runs an
+asyncio loop in a background thread. ``connect_delay`` and
+``command_delay`` simulate the TLS/AUTH handshake and the network round
+trip of a remote server. With ``keep`` the sink also records every
+message with the time it was received.
+
+    with SMTPSink(command_delay=0.002) as sink:
+        send_to(sink.host, sink.port)
+"""
+import asyncio
+import threading
+import time
+
+
+class SMTPSink:
+    """Discarding SMTP server running in a background thread
+
+    Keyword Arguments:
+        host {str} -- address to listen on (default: {'127.0.0.1'})
+        port {int} -- port to listen on, 0 picks a free one (default: {0})
+        connect_delay {float} -- seconds before the greeting (default: {0})
+        command_delay {float} -- seconds before every reply (default: {0})
+        keep {bool} -- record the received messages (default: {False})
+    """
+    def __init__(self, host='127.0.0.1', port=0, connect_delay=0, command_delay=0, keep=False):
+        self.host = host
+        self.port = port
+        self.connect_delay = connect_delay
+        self.command_delay = command_delay
+        self.keep = keep
+        self.messages = []
+        self.received = 0
+        self.connections = 0
+        self.writers = set()
+        self.loop = None
+        self.server = None
+        self.thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        started = threading.Event()
+        self.loop = asyncio.new_event_loop()
+
+        def serve():
+            asyncio.set_event_loop(self.loop)
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self.handle, self.host, self.port))
+            self.port = self.server.sockets[0].getsockname()[1]
+            started.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=serve, daemon=True)
+        self.thread.start()
+        started.wait()
+
+    def stop(self):
+        async def close():
+            self.server.close()
+            # Pooled clients keep their connections open
+            for writer in self.writers:
+                writer.close()
+            await self.server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    async def reply(self, writer, line):
+        if self.command_delay:
+            await asyncio.sleep(self.command_delay)
+        writer.write(f'{line}\r\n'.encode())
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        self.writers.add(writer)
+        if self.connect_delay:
+            await asyncio.sleep(self.connect_delay)
+        await self.reply(writer, '220 localhost SMTP sink')
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode('ascii', 'replace').strip().split(' ', 1)[0].upper()
+                if command == 'EHLO':
+                    await self.reply(writer, '250-localhost\r\n250-8BITMIME\r\n250 SMTPUTF8')
+                elif command == 'HELO':
+                    await self.reply(writer, '250 localhost')
+                elif command in ('MAIL', 'RCPT', 'RSET', 'NOOP'):
+                    await self.reply(writer, '250 OK')
+                elif command == 'DATA':
+                    await self.reply(writer, '354 End data with <CR><LF>.<CR><LF>')
+                    data = []
+                    while True:
+                        line = await reader.readline()
+                        if line in (b'.\r\n', b'.\n', b''):
+                            break
+                        if self.keep:
+                            # Undo the dot stuffing of the client
+                            data.append(line[1:] if line.startswith(b'..') else line)
+                    if self.keep:
+                        self.messages.append((time.time(), b''.join(data)))
+                    self.received += 1
+                    await self.reply(writer, '250 OK: queued')
+                elif command == 'QUIT':
+                    await self.reply(writer, '221 Bye')
+                    break
+                else:
+                    await self.reply(writer, '502 Command not implemented')
+        except ConnectionError:
+            pass
+        finally:
+            self.writers.discard(writer)
+            writer.close()
@@ -0,0 +1,106 @@
+"""Ticket number allocation as the bookings table fills
+
+Seeds the bookings table up to each requested size and, for every size,
+times the legacy probe loop (uuid4 prefix plus an exists() query per try)
+against TicketNumberAllocator, and the latency of a booking POST through
+BookingListView using the allocator.
+
+    >$ python -m benchmarks.ticket_numbers --sizes 10000 100000 1000000
+"""
+import argparse
+import statistics
+import time
+from uuid import uuid4
+
+from . import setup, test_database
+
+SEED_PASSENGERS = 1000
+
+
+def legacy_ticket_number():
+    from bookings.models import Booking
+
+    while True:
+        unique_str = str(uuid4())[:6].upper()
+        if not Booking.objects.filter(ticket_number=unique_str).exists():
+            return unique_str
+
+
+def median_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def seed_bookings(count, flights, passengers):
+    from bookings.models import Booking
+    from bookings.tickets import ticket_numbers
+
+    batch = []
+    for index in range(count):
+        flight = flights[index // len(passengers)]
+        passenger = passengers[index % len(passengers)]
+        batch.append(Booking(ticket_number=ticket_numbers.allocate(),
+                             flight_id=flight, passenger_id=passenger))
+        if len(batch) == 10000:
+            Booking.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Booking.objects.bulk_create(batch)
+
+
+def run(sizes, repeat):
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    from bookings.tickets import ticket_numbers
+    from bookings.views import BookingListView
+    from flights.models import Flight
+    from .fixtures import create_admin, create_flights, create_users
+
+    admin = create_admin()
+    largest = max(sizes)
+    create_flights(largest // SEED_PASSENGERS + 2, admin)
+    flights = list(Flight.objects.order_by('id'))
+    users = create_users(SEED_PASSENGERS + repeat * len(sizes))
+    passengers, bookers = users[:SEED_PASSENGERS], users[SEED_PASSENGERS:]
+    booking_flight = flights[-1]
+    Flight.objects.filter(id=booking_flight.id).update(capacity=len(bookers))
+
+    view = BookingListView.as_view()
+    factory = APIRequestFactory()
+    seeded = 0
+    for size in sorted(sizes):
+        seed_bookings(size - seeded, flights[seeded // SEED_PASSENGERS:], passengers)
+        seeded = size
+
+        legacy = median_ms(legacy_ticket_number, repeat)
+        allocator = median_ms(ticket_numbers.allocate, repeat)
+
+        def book():
+            request = factory.post('/api/v1/bookings', {'flight_id': booking_flight.id},
+                                   format='json')
+            force_authenticate(request, bookers.pop())
+            response = view(request)
+            assert response.status_code == 201, response.data
+
+        post = median_ms(book, repeat)
+        print(f'{size} bookings: legacy probe {legacy:.3f} ms, allocator {allocator:.3f} ms, '
+              f'booking POST {post:.2f} ms (median of {repeat})')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        run(args.sizes, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
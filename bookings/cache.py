@@ -0,0 +1,31 @@
+from django.core.cache import cache
+
+from flights.cache import get_catalog_version
+
+
+def ticket_cache_key(ticket_number):
+    """Build the cache key of a rendered ticket
+
+    The key is bound to the flight catalog version, so any flight update
+    invalidates the cached tickets along with the cached flights.
+
+    Arguments:
+        ticket_number {str} -- ticket number
+
+    Returns:
+        str -- cache key
+    """
+    return f'bookings:ticket:{get_catalog_version()}:{ticket_number}'
+
+
+def invalidate_tickets(ticket_numbers):
+    """Drop the cached rendering of every ticket number given"""
+    cache.delete_many([ticket_cache_key(ticket_number) for ticket_number in ticket_numbers])
+
+
+def invalidate_passenger_tickets(passenger):
+    """Drop the cached tickets of a passenger whose profile changed"""
+    from .models import Booking
+
+    invalidate_tickets(Booking.objects.filter(passenger_id=passenger)
+                       .values_list('ticket_number', flat=True))
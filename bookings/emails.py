@@ -0,0 +1,71 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.template.loader import get_template
+from django.utils.dateparse import parse_datetime
+
+
+@lru_cache(maxsize=None)
+def compiled_template(name):
+    """Load and compile a template once per worker process
+
+    Django only caches compiled templates when DEBUG is off, so without
+    this every email would read and parse its templates again.
+
+    Arguments:
+        name {str} -- template name
+
+    Returns:
+        Template -- compiled template
+    """
+    return get_template(name)
+
+
+def render_email(name, context):
+    """Render the text and HTML parts of an email
+
+    Every email has a ``.txt`` template next to its ``.html`` one, so the
+    text part does not have to be stripped out of the HTML.
+
+    Arguments:
+        name {str} -- template name without extension, e.g. 'bookings/ticket'
+        context {dict} -- template context
+
+    Returns:
+        tuple -- text and HTML content
+    """
+    return (compiled_template(f'{name}.txt').render(context),
+            compiled_template(f'{name}.html').render(context))
+
+
+def email_message(subject, to_email, name, context):
+    """Build a text and HTML email from a template pair
+
+    Arguments:
+        subject {str} -- subject of the email
+        to_email {str} -- recipient
+        name {str} -- template name without extension
+        context {dict} -- template context
+
+    Returns:
+        EmailMultiAlternatives -- message ready to send
+    """
+    text_content, html_content = render_email(name, context)
+    message = EmailMultiAlternatives(subject, text_content, settings.EMAIL_HOST_USER, [to_email])
+    message.attach_alternative(html_content, 'text/html')
+    return message
+
+
+def parse_datetimes(data, *fields):
+    """Copy a task payload with its ISO datetime strings parsed
+
+    Arguments:
+        data {dict} -- JSON payload of a task
+        *fields {str} -- keys holding datetimes
+
+    Returns:
+        dict -- payload with datetime values
+    """
+    return dict(data, **{field: parse_datetime(data[field])
+                         for field in fields if isinstance(data.get(field), str)})
@@ -0,0 +1,122 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from api.helpers.utils import StatusChoices
+from flights.models import Flight
+from . import outbox
+from .cache import invalidate_tickets
+from .models import Booking
+from .tasks import email_cancellations
+
+NOTICE_FIELDS = {
+    'id': 'id',
+    'ticket_number': 'ticket_number',
+    'flight_id': 'flight_id',
+    'email': 'passenger_id__email',
+    'first_name': 'passenger_id__first_name',
+    'last_name': 'passenger_id__last_name',
+    'destination': 'flight_id__destination',
+    'departure_datetime': 'flight_id__departure_datetime',
+}
+
+
+class BookingExpiry:
+    """Cancel bookings left unpaid for longer than the hold window
+
+    Expired bookings are cancelled a chunk at a time, each chunk in its own
+    short transaction: the oldest bookings still in 'B' are read through the
+    ``(flight_status, created_at)`` index, their flights are locked in id
+    order, then the bookings themselves with ``FOR UPDATE SKIP LOCKED``.
+    They are set to 'C' with one UPDATE, their seats are released with one
+    UPDATE per chunk and a single cancellation notice task for the chunk is
+    written to the outbox. Rows held by a concurrent reservation are
+    skipped rather than waited on.
+
+    A booking takes its seat, locking the flight, before it inserts the
+    booking row, so the flights are locked first here too and a passenger
+    booking the flight again during a sweep cannot deadlock with it.
+
+    Keyword Arguments:
+        hold {timedelta} -- time a booking is held unpaid
+        batch_size {int} -- bookings cancelled per transaction
+    """
+    def __init__(self, hold=None, batch_size=None):
+        self.hold = hold or timedelta(hours=settings.BOOKING_HOLD_HOURS)
+        self.batch_size = batch_size or settings.BOOKING_EXPIRY_BATCH_SIZE
+
+    def run(self):
+        """Cancel every booking created before the hold window
+
+        Returns:
+            int -- number of bookings cancelled
+        """
+        cutoff = timezone.now() - self.hold
+        cancelled, position = 0, None
+        while True:
+            count, position = self.cancel_chunk(cutoff, position)
+            if position is None:
+                return cancelled
+            cancelled += count
+
+    def cancel_chunk(self, cutoff, position=None):
+        """Cancel the next chunk of expired bookings
+
+        Arguments:
+            cutoff {datetime} -- bookings created before it have expired
+
+        Keyword Arguments:
+            position {tuple} -- (created_at, id) of the last booking of the previous chunk
+
+        Returns:
+            tuple -- bookings cancelled and the position of the chunk, None once done
+        """
+        candidates = (Booking.objects
+                      .filter(flight_status=StatusChoices.B.name, created_at__lt=cutoff)
+                      .order_by('created_at', 'id'))
+        if position is not None:
+            created_at, booking_id = position
+            candidates = candidates.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=booking_id))
+        with transaction.atomic():
+            candidates = list(candidates.values_list('created_at', 'id', 'flight_id')
+                              [:self.batch_size])
+            if not candidates:
+                return 0, None
+            list(Flight.objects.select_for_update()
+                 .filter(pk__in={flight_id for _, _, flight_id in candidates})
+                 .order_by('pk').values_list('pk', flat=True))
+            # A booking reserved or cancelled since it was read is skipped
+            rows = (Booking.objects
+                    .select_for_update(skip_locked=True, of=('self',))
+                    .filter(id__in=[booking_id for _, booking_id, _ in candidates],
+                            flight_status=StatusChoices.B.name)
+                    .order_by('created_at', 'id')
+                    .values_list(*NOTICE_FIELDS.values()))
+            expired = [dict(zip(NOTICE_FIELDS, row)) for row in rows]
+            position = candidates[-1][:2]
+            if not expired:
+                return 0, position
+            Booking.objects.filter(id__in=[booking['id'] for booking in expired]) \
+                .update(flight_status=StatusChoices.C.name)
+            self.release_seats(expired)
+            outbox.enqueue(email_cancellations, [
+                {key: value for key, value in booking.items() if key not in ('id', 'flight_id')}
+                for booking in expired
+            ])
+        invalidate_tickets(booking['ticket_number'] for booking in expired)
+        return len(expired), position
+
+    def release_seats(self, bookings):
+        seats = {}
+        for booking in bookings:
+            seats[booking['flight_id']] = seats.get(booking['flight_id'], 0) + 1
+        released = Case(*[When(pk=flight_id, then=Value(count))
+                          for flight_id, count in seats.items()],
+                        output_field=IntegerField())
+        Flight.objects.filter(pk__in=seats).update(
+            seats_taken=Greatest(F('seats_taken') - released, Value(0)))
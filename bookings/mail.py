@@ -0,0 +1,391 @@
+import logging
+import os
+import queue
+import smtplib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import get_connection
+from django.core.mail.backends.smtp import EmailBackend
+
+logger = logging.getLogger(__name__)
+
+SMTP_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+
+
+class PooledConnection(EmailBackend):
+    """SMTP backend that stays open and tracks how far a batch got
+
+    Keyword Arguments:
+        see django.core.mail.backends.smtp.EmailBackend
+    """
+    def __init__(self, **kwargs):
+        super().__init__(fail_silently=False, **kwargs)
+        self.progress = 0
+        self.last_used = 0
+
+    def _send(self, email_message):
+        sent = super()._send(email_message)
+        self.progress += 1
+        return sent
+
+
+class MailPool:
+    """Deliver email through a pool of open, authenticated SMTP connections
+
+    Messages are sent with ``send_messages`` in batches of ``batch_size``
+    over connections kept open between tasks, so the TCP, TLS and AUTH
+    handshakes are paid once per connection instead of once per message.
+    A connection that fails part way through a batch is replaced and the
+    messages it had not sent yet are retried on the new one. Connections
+    idle for longer than ``idle_timeout`` are reopened before use, since
+    SMTP servers drop idle clients.
+
+    The counters of each worker process are added to totals in the cache
+    at most every MAIL_STATS_INTERVAL seconds, so ``shared_stats`` reports
+    every worker.
+
+    Keyword Arguments:
+        size {int} -- open connections kept per worker process
+        batch_size {int} -- messages sent per send_messages call
+        idle_timeout {int} -- seconds a connection may stay idle
+        retries {int} -- reconnects allowed per batch
+    """
+    errors = (smtplib.SMTPException, OSError)
+    # Kept in the cache as whole milliseconds, since incr only takes integers
+    timers = ('send_seconds', 'queue_delay_seconds')
+    stats_key = 'mail:stats'
+
+    def __init__(self, size=None, batch_size=None, idle_timeout=None, retries=None):
+        self.size = size or settings.MAIL_POOL_SIZE
+        self.batch_size = batch_size or settings.MAIL_BATCH_SIZE
+        self.idle_timeout = idle_timeout or settings.MAIL_IDLE_TIMEOUT
+        self.retries = settings.MAIL_RETRIES if retries is None else retries
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Drop the pooled connections, e.g. in a forked worker process"""
+        self.pid = os.getpid()
+        self.idle = queue.LifoQueue()
+        self.published = time.monotonic()
+        self.counters = {
+            'sent': 0,
+            'failed': 0,
+            'batches': 0,
+            'connections': 0,
+            'reconnects': 0,
+            'send_seconds': 0.0,
+            'deferred': 0,
+            'delayed': 0,
+            'queue_delay_seconds': 0.0,
+        }
+        self.unpublished = dict.fromkeys(self.counters, 0)
+
+    def stats(self):
+        """Throughput counters of this worker process
+
+        ``queue_delay`` is the average time deferred messages waited for the
+        send rate, ``backlog_seconds`` how long a new message would wait now.
+
+        Returns:
+            dict -- counters, messages sent per second of sending and queue delay
+        """
+        with self.lock:
+            counters = dict(self.counters)
+        return self.rates(counters)
+
+    def shared_stats(self):
+        """Throughput counters totalled over every worker process
+
+        Returns:
+            dict -- counters published to the cache, with the rates of stats
+        """
+        keys = {f'{self.stats_key}:{name}': name for name in self.counters}
+        counters = dict.fromkeys(self.counters, 0)
+        for key, value in cache.get_many(keys).items():
+            counters[keys[key]] = value
+        for name in self.timers:
+            counters[name] /= 1000
+        return self.rates(counters)
+
+    def rates(self, counters):
+        seconds = counters['send_seconds']
+        counters['messages_per_second'] = counters['sent'] / seconds if seconds else 0.0
+        delayed = counters['delayed']
+        counters['queue_delay'] = counters['queue_delay_seconds'] / delayed if delayed else 0.0
+        counters['send_rate'] = send_rate.rate
+        counters['backlog_seconds'] = send_rate.backlog()
+        return counters
+
+    def count(self, **increments):
+        with self.lock:
+            for name, value in increments.items():
+                self.counters[name] += value
+                self.unpublished[name] += value
+            due = time.monotonic() - self.published >= settings.MAIL_STATS_INTERVAL
+        if due:
+            self.publish()
+
+    def publish(self):
+        """Add the counters counted since the last call to the totals in the cache"""
+        with self.lock:
+            unpublished = self.unpublished
+            self.unpublished = dict.fromkeys(self.counters, 0)
+            self.published = time.monotonic()
+        for name, value in unpublished.items():
+            if name in self.timers:
+                value = round(value * 1000)
+            if not value:
+                continue
+            key = f'{self.stats_key}:{name}'
+            try:
+                cache.incr(key, value)
+            except ValueError:
+                cache.add(key, 0, None)
+                cache.incr(key, value)
+
+    def send(self, messages):
+        """Send the messages over pooled connections
+
+        Arguments:
+            messages {list} -- EmailMessage instances
+
+        Returns:
+            int -- number of messages sent
+        """
+        messages = list(messages)
+        if not messages:
+            return 0
+        if settings.EMAIL_BACKEND != SMTP_BACKEND:
+            # e.g. the locmem backend of the test runner
+            return get_connection().send_messages(messages)
+        start = time.perf_counter()
+        connection = self.acquire()
+        try:
+            sent = 0
+            for index in range(0, len(messages), self.batch_size):
+                connection, count = self.send_batch(connection,
+                                                    messages[index:index + self.batch_size])
+                sent += count
+        except Exception:
+            self.discard(connection)
+            raise
+        else:
+            self.release(connection)
+        finally:
+            self.count(send_seconds=time.perf_counter() - start)
+        return sent
+
+    def send_batch(self, connection, batch):
+        attempts = 0
+        sent = 0
+        while batch:
+            connection.progress = 0
+            try:
+                connection.send_messages(batch)
+            except self.errors as error:
+                if self.rejected(error):
+                    # The server refused this message, the connection is still usable
+                    logger.exception('SMTP server rejected a message')
+                    sent += connection.progress
+                    self.count(sent=connection.progress, failed=1)
+                    batch = batch[connection.progress + 1:]
+                    continue
+                sent += connection.progress
+                self.count(sent=connection.progress)
+                batch = batch[connection.progress:]
+                self.discard(connection)
+                attempts += 1
+                if attempts > self.retries:
+                    self.count(failed=len(batch))
+                    raise
+                logger.warning('SMTP connection failed, reconnecting to resend %s messages',
+                               len(batch), exc_info=True)
+                connection = self.connect()
+                self.count(reconnects=1)
+                continue
+            sent += len(batch)
+            self.count(sent=len(batch), batches=1)
+            batch = []
+        connection.last_used = time.monotonic()
+        return connection, sent
+
+    def rejected(self, error):
+        """Whether the server permanently refused the message being sent
+
+        Temporary 4xx replies, e.g. 421 or 451, often mean the server is
+        closing the connection, so they are retried on a new one.
+
+        Arguments:
+            error {Exception} -- error raised by send_messages
+
+        Returns:
+            bool -- True for a 5xx reply to one message
+        """
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            codes = [code for code, _ in error.recipients.values()]
+            return bool(codes) and min(codes) >= 500
+        if isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+            return error.smtp_code >= 500
+        return False
+
+    def acquire(self):
+        if self.pid != os.getpid():
+            # A forked worker must not share the sockets of its parent
+            self.reset()
+        try:
+            connection = self.idle.get_nowait()
+        except queue.Empty:
+            return self.connect()
+        if time.monotonic() - connection.last_used > self.idle_timeout:
+            self.discard(connection)
+            return self.connect()
+        return connection
+
+    def release(self, connection):
+        if self.idle.qsize() < self.size:
+            self.idle.put(connection)
+        else:
+            self.discard(connection)
+
+    def connect(self):
+        connection = PooledConnection()
+        connection.open()
+        connection.last_used = time.monotonic()
+        self.count(connections=1)
+        return connection
+
+    def discard(self, connection):
+        try:
+            connection.close()
+        except self.errors:
+            pass
+
+
+class SendRateLimiter:
+    """Token bucket on the outbound email rate, shared through the cache
+
+    The bucket is kept as two cache entries: the number of tokens ever
+    taken, bumped with an atomic ``incr``, and the epoch from which tokens
+    accrue at ``rate`` per second. The n-th token exists at
+    ``epoch + n / rate``, so taking tokens is a single ``incr`` and tells
+    the caller how long to wait for them. Tokens are reserved even when
+    they are in the future, so callers waiting for them queue up in order
+    instead of competing again. After an idle period the epoch is moved
+    forward so that no more than ``burst`` tokens accumulate.
+
+    Keyword Arguments:
+        rate {float} -- messages per second, 0 to disable the limit
+        burst {int} -- messages that may be sent at once
+        key {str} -- cache key prefix of the bucket
+    """
+    def __init__(self, rate=None, burst=None, key='mail:bucket'):
+        self.rate = settings.MAIL_SEND_RATE if rate is None else rate
+        self.burst = burst or settings.MAIL_SEND_BURST
+        self.taken_key = f'{key}:taken'
+        self.epoch_key = f'{key}:epoch'
+
+    def epoch(self, now):
+        epoch = cache.get(self.epoch_key)
+        if epoch is None:
+            # Start with a full bucket
+            cache.add(self.epoch_key, now - self.burst / self.rate, None)
+            epoch = cache.get(self.epoch_key)
+        return epoch
+
+    def take(self, count):
+        try:
+            return cache.incr(self.taken_key, count)
+        except ValueError:
+            cache.add(self.taken_key, 0, None)
+            return cache.incr(self.taken_key, count)
+
+    def acquire(self, count=1):
+        """Take tokens for sending messages
+
+        Arguments:
+            count {int} -- messages to send
+
+        Returns:
+            float -- seconds to wait before sending, 0 to send now
+        """
+        if not self.rate:
+            return 0
+        now = time.time()
+        epoch = self.epoch(now)
+        taken = self.take(count)
+        if (now - epoch) * self.rate - (taken - count) > self.burst:
+            # The bucket has been idle, drop the tokens above the burst
+            epoch = now - (self.burst + taken - count) / self.rate
+            cache.set(self.epoch_key, epoch, None)
+        return max(epoch + taken / self.rate - now, 0)
+
+    def backlog(self):
+        """Seconds a message taking a token now would wait for it
+
+        Returns:
+            float -- wait of the next message
+        """
+        if not self.rate:
+            return 0
+        epoch = cache.get(self.epoch_key)
+        taken = cache.get(self.taken_key)
+        if epoch is None or taken is None:
+            return 0
+        return max(epoch + (taken + 1) / self.rate - time.time(), 0)
+
+
+def throttle(task, args, count, deferred_at=None):
+    """Hold a mail task back while the send rate is exhausted
+
+    A task over the rate is published again with an ETA at which its
+    tokens are available, instead of failing and being retried. The
+    deferred run gets ``deferred_at`` and sends without taking tokens
+    again, since they were reserved for it.
+
+    A task sending more than ``burst`` messages would reach the server as
+    one burst over the limit, so it is split into tasks of at most
+    ``burst`` messages, each published with the ETA of its own tokens.
+    The messages of such a task must be built from its last argument.
+
+    Arguments:
+        task {Task} -- celery task sending the messages
+        args {list} -- arguments of the task
+        count {int} -- messages the task sends
+
+    Keyword Arguments:
+        deferred_at {float} -- when the task was first held back (default: {None})
+
+    Returns:
+        bool -- True when the task was deferred and must not send now
+    """
+    if deferred_at is not None:
+        mail_pool.count(delayed=count, queue_delay_seconds=count * (time.time() - deferred_at))
+        return False
+    if settings.EMAIL_BACKEND != SMTP_BACKEND or not send_rate.rate:
+        return False
+    if count > send_rate.burst:
+        items = args[-1]
+        for index in range(0, count, send_rate.burst):
+            part = items[index:index + send_rate.burst]
+            task.apply_async(args=[*args[:-1], part], kwargs={'deferred_at': time.time()},
+                             countdown=send_rate.acquire(len(part)))
+        mail_pool.count(deferred=count)
+        logger.info('%s split %s messages into tasks of at most %s', task.name, count,
+                    send_rate.burst)
+        return True
+    wait = send_rate.acquire(count)
+    if not wait:
+        return False
+    task.apply_async(args=args, kwargs={'deferred_at': time.time()}, countdown=wait)
+    mail_pool.count(deferred=count)
+    logger.info('Send rate exhausted, %s deferred %ss for %s messages', task.name,
+                round(wait, 2), count)
+    return True
+
+
+mail_pool = MailPool()
+send_rate = SendRateLimiter()
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from bookings.outbox import NotificationRelay
+
+
+class Command(BaseCommand):
+    help = 'Publish the notification outbox to Celery'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            help='notifications published per transaction')
+        parser.add_argument('--poll-interval', type=float,
+                            help='seconds to wait when the outbox is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='stop once the outbox is empty')
+
+    def handle(self, *args, **options):
+        NotificationRelay(batch_size=options['batch_size'],
+                          poll_interval=options['poll_interval']).run(once=options['once'])
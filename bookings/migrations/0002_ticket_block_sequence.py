@@ -0,0 +1,17 @@
+# Generated by Django 2.1.7 on 2026-10-17 17:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE SEQUENCE bookings_ticket_block_seq MINVALUE 0 START 0',
+            'DROP SEQUENCE bookings_ticket_block_seq',
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.1.7 on 2026-10-17 20:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_notification'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['flight_id', 'flight_status', 'created_at', 'id'], name='booking_flight_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['flight_id', 'flight_status', 'reserved_at', 'id'], name='booking_flight_reserved_idx'),
+        ),
+    ]
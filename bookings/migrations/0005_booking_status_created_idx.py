@@ -0,0 +1,17 @@
+# Generated by Django 2.1.7 on 2026-10-17 21:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_booking_manifest_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['flight_status', 'created_at', 'id'], name='booking_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 2.1.7 on 2026-10-18 09:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_booking_status_created_idx'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='booking',
+            unique_together=set(),
+        ),
+        # Django 2.1 has no conditional constraints, so the partial index is raw SQL
+        migrations.RunSQL(
+            "CREATE UNIQUE INDEX booking_active_passenger_uniq "
+            "ON bookings_booking (flight_id_id, passenger_id_id) "
+            "WHERE flight_status <> 'C'",
+            'DROP INDEX booking_active_passenger_uniq',
+        ),
+    ]
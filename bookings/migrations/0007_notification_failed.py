@@ -0,0 +1,18 @@
+# Generated by Django 2.1.7 on 2026-10-18 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_booking_active_passenger_uniq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='failed',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.fields import JSONField
 from djmoney.models.fields import MoneyField
+from rest_framework.utils.encoders import JSONEncoder
 
 from api.helpers.utils import StatusChoices
 from flights.models import Flight
@@ -19,4 +21,29 @@ class Booking(models.Model):
     passenger_id = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
     class Meta:
-        unique_together = ('flight_id', 'passenger_id')
+        # A passenger holds one active booking per flight. The constraint is
+        # the partial unique index booking_active_passenger_uniq (migration
+        # 0006), which ignores cancelled bookings so the flight can be booked
+        # again after a booking expires.
+        indexes = [
+            models.Index(fields=['flight_id', 'flight_status', 'created_at', 'id'],
+                         name='booking_flight_created_idx'),
+            models.Index(fields=['flight_id', 'flight_status', 'reserved_at', 'id'],
+                         name='booking_flight_reserved_idx'),
+            models.Index(fields=['flight_status', 'created_at', 'id'],
+                         name='booking_status_created_idx'),
+        ]
+
+
+class Notification(models.Model):
+    """Outbox of notification tasks
+
+    Rows are written in the transaction of the booking change they report
+    and published to Celery by the notification relay. A row the relay
+    cannot publish, e.g. for an unknown task, is marked failed and kept
+    for inspection instead of blocking the outbox.
+    """
+    task = models.CharField(max_length=255)
+    payload = JSONField(encoder=JSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    failed = models.BooleanField(default=False)
@@ -0,0 +1,102 @@
+import logging
+import time
+
+from celery import current_app
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from kombu.exceptions import EncodeError, OperationalError
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(task, payload):
+    """Record a notification task in the outbox
+
+    Call it inside the transaction of the change being reported, so the
+    notification is stored if and only if the change commits. No broker is
+    reached on the request path.
+
+    Arguments:
+        task {Task} -- celery task sending the notification
+        payload {dict|list} -- JSON serializable argument of the task
+
+    Returns:
+        Notification -- outbox row
+    """
+    return Notification.objects.create(task=task.name, payload=payload)
+
+
+class NotificationRelay:
+    """Publish outbox notifications to Celery in batches
+
+    Each batch is locked with SELECT ... FOR UPDATE SKIP LOCKED, published
+    and deleted in one transaction, so several relays can run side by side.
+    If the broker fails part way through, the transaction rolls back and the
+    whole batch is published again later: delivery is at least once, and
+    the tasks may see a notification twice. A notification that cannot be
+    published on its own, for an unknown task or a payload that cannot be
+    serialized, is marked failed and skipped so it does not block the rest.
+
+    Keyword Arguments:
+        batch_size {int} -- notifications published per transaction
+        poll_interval {float} -- seconds to wait when the outbox is empty
+    """
+    max_backoff = 30
+
+    def __init__(self, batch_size=None, poll_interval=None):
+        self.batch_size = batch_size or settings.NOTIFICATION_RELAY_BATCH_SIZE
+        self.poll_interval = poll_interval or settings.NOTIFICATION_RELAY_POLL_INTERVAL
+
+    def relay_batch(self):
+        """Publish and delete one batch of notifications
+
+        Returns:
+            int -- number of notifications published
+        """
+        with transaction.atomic():
+            batch = list(Notification.objects.select_for_update(skip_locked=True)
+                         .filter(failed=False)
+                         .order_by('id')[:self.batch_size])
+            if not batch:
+                return 0
+            failed = []
+            with current_app.producer_or_acquire() as producer:
+                for notification in batch:
+                    try:
+                        # NotRegistered, raised for an unknown task, is a KeyError
+                        current_app.tasks[notification.task].apply_async(
+                            args=[notification.payload], producer=producer)
+                    except (KeyError, EncodeError):
+                        logger.exception('Could not publish notification %s for %s',
+                                         notification.id, notification.task)
+                        failed.append(notification.id)
+            Notification.objects.filter(id__in=failed).update(failed=True)
+            Notification.objects.filter(id__in=[notification.id for notification in batch]) \
+                .exclude(id__in=failed) \
+                .delete()
+        return len(batch)
+
+    def run(self, once=False):
+        """Relay notifications until stopped
+
+        Keyword Arguments:
+            once {bool} -- stop when the outbox is empty (default: {False})
+        """
+        backoff = self.poll_interval
+        while True:
+            try:
+                published = self.relay_batch()
+            except (OperationalError, DatabaseError):
+                logger.exception('Could not relay notifications, retrying in %ss', backoff)
+                # Drop a broken database connection so the next batch reconnects
+                connection.close_if_unusable_or_obsolete()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            backoff = self.poll_interval
+            if not published:
+                if once:
+                    return
+                time.sleep(self.poll_interval)
@@ -1,7 +1,7 @@
 import re
 
+from django.conf import settings
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
 
 from api.helpers.utils import StatusChoices
 from users.serializers import UserSerializer
@@ -13,23 +13,20 @@ def is_valid_ticket(value):
         raise serializers.ValidationError('Ticket number invalid please provide a valid ticket')
 
 
-class BookingSerializer(serializers.ModelSerializer):
-    """Booking serializer
+class BookingCreateSerializer(serializers.ModelSerializer):
+    """Booking create serializer
+
+    Validates only the flight. The passenger and ticket number are passed
+    to save and the uniqueness of the booking is left to the database
+    constraints, so no SELECT runs ahead of the INSERT to check for it.
 
     Arguments:
         ModelSerializer {serializer} -- rest framework model serializer
     """
     class Meta:
         model = Booking
-        fields = '__all__'
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Booking.objects.all(),
-                fields=('flight_id', 'passenger_id'),
-                message='Ticket already booked'
-            )
-        ]
-        extra_kwargs = {'flight_status': {'read_only': True}}
+        fields = ('flight_id',)
+        validators = []
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -86,6 +83,17 @@ class TicketReservationSerializer(serializers.ModelSerializer):
         return data
 
 
+class ReservationRequestSerializer(serializers.Serializer):
+    """Reservation request serializer
+
+    Reads the amount paid for a reservation before any booking is loaded
+
+    Arguments:
+        Serializer {serializer} -- rest framework serializer
+    """
+    amount_paid = serializers.DecimalField(max_digits=19, decimal_places=2)
+
+
 class BookingReservationsSerializer(serializers.ModelSerializer):
     date = serializers.DateField(required=True, write_only=True)
     status = serializers.ChoiceField(required=True,
@@ -104,3 +112,42 @@ class BookingReservationsSerializer(serializers.ModelSerializer):
             if field not in ('date', 'status'):
                 self.fields[field].read_only = True
 
+
+class GroupBookingSerializer(serializers.Serializer):
+    """Group booking serializer
+
+    Validates the flights booked together in one request
+
+    Arguments:
+        Serializer {serializer} -- rest framework serializer
+    """
+    flight_ids = serializers.ListField(child=serializers.IntegerField(min_value=1))
+
+    def validate_flight_ids(self, value):
+        if not value:
+            raise serializers.ValidationError('Provide at least one flight')
+        if len(value) > settings.BOOKING_GROUP_MAX_FLIGHTS:
+            raise serializers.ValidationError(
+                f'At most {settings.BOOKING_GROUP_MAX_FLIGHTS} flights can be booked together')
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError('A flight can only be booked once')
+        return value
+
+
+class BookingStatsSerializer(serializers.Serializer):
+    """Booking stats serializer
+
+    Validates the flights whose booking stats are requested
+
+    Arguments:
+        Serializer {serializer} -- rest framework serializer
+    """
+    flight = serializers.ListField(child=serializers.IntegerField(min_value=1))
+
+    def validate_flight(self, value):
+        if not value:
+            raise serializers.ValidationError('Provide at least one flight')
+        if len(value) > settings.BOOKING_STATS_MAX_FLIGHTS:
+            raise serializers.ValidationError(
+                f'At most {settings.BOOKING_STATS_MAX_FLIGHTS} flights can be requested together')
+        return list(dict.fromkeys(value))
@@ -0,0 +1,78 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from api.helpers.utils import StatusChoices
+from flights.models import Flight
+
+
+def stats_cache_key(flight_id):
+    return f'bookings:stats:{flight_id}'
+
+
+def query_flight_stats(flight_ids):
+    """Aggregate the bookings of the flights in one grouped query
+
+    Every status is counted with ``COUNT(*) FILTER (WHERE ...)`` over a
+    left join, so flights without bookings are returned with zero counts.
+
+    Arguments:
+        flight_ids {list} -- ids of the flights
+
+    Returns:
+        dict -- stats by flight id, for the flights that exist
+    """
+    counts = {
+        choice.value.lower(): Count('booking', filter=Q(booking__flight_status=choice.name))
+        for choice in StatusChoices
+    }
+    amount = DecimalField(max_digits=19, decimal_places=2)
+    revenue = Coalesce(
+        Sum('booking__amount_paid', filter=Q(booking__flight_status=StatusChoices.R.name),
+            output_field=amount),
+        Value(0),
+        output_field=amount)
+    flights = (Flight.objects.filter(id__in=flight_ids)
+               .values('id', 'flight_cost_currency')
+               .annotate(revenue=revenue, **counts)
+               .order_by())
+
+    stats = {}
+    for flight in flights:
+        bookings = {name: flight[name] for name in counts}
+        total = sum(bookings.values())
+        stats[flight['id']] = {
+            'flight_id': flight['id'],
+            'bookings': bookings,
+            'total': total,
+            'revenue': str(flight['revenue'].quantize(Decimal('0.01'))),
+            'currency': flight['flight_cost_currency'],
+            # Share of all bookings ever made on the flight that were paid for
+            'reservation_rate': round(bookings['reserved'] / total, 4) if total else 0,
+        }
+    return stats
+
+
+def get_flight_stats(flight_ids):
+    """Get the booking stats of the flights, from the cache where possible
+
+    Arguments:
+        flight_ids {list} -- ids of the flights
+
+    Returns:
+        dict -- stats by flight id, for the flights that exist
+    """
+    keys = {flight_id: stats_cache_key(flight_id) for flight_id in flight_ids}
+    cached = cache.get_many(keys.values())
+    stats = {flight_id: cached[key] for flight_id, key in keys.items() if key in cached}
+
+    missing = [flight_id for flight_id in flight_ids if flight_id not in stats]
+    if missing:
+        fresh = query_flight_stats(missing)
+        cache.set_many({keys[flight_id]: value for flight_id, value in fresh.items()},
+                       settings.BOOKING_STATS_CACHE_TIMEOUT)
+        stats.update(fresh)
+    return stats
@@ -1,46 +1,168 @@
-import os
+import logging
+import time
+import uuid
 from datetime import timedelta
 
-from celery import shared_task
+from celery import group, shared_task
 from celery.task.schedules import crontab
 from celery.decorators import periodic_task
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
+from django.core.cache import cache
 from django.db.models import Q
-from django.template.loader import render_to_string
 from django.utils import timezone
-from django.utils.html import strip_tags
 
 from api.helpers.utils import StatusChoices
+from .emails import email_message, parse_datetimes
+from .mail import mail_pool, send_rate, throttle
 from .models import Booking
 
-@shared_task
-def email_ticket(ticket):
+logger = logging.getLogger(__name__)
+
+FLIGHT_DATETIMES = ('departure_datetime', 'arrival_datetime')
+
+REMINDER_FIELDS = (
+    'ticket_number', 'flight_id', 'passenger_id',
+    'flight_id__destination', 'flight_id__departing',
+    'flight_id__departure_datetime', 'flight_id__arrival_datetime',
+    'passenger_id__email', 'passenger_id__first_name', 'passenger_id__last_name',
+)
+
+def ticket_message(ticket):
     flight_destination = ticket['flight']['destination_airport']
     subject = f'eTicket - Flight to {flight_destination}'
-    from_email = settings.EMAIL_HOST_USER
     to_email = ticket['passenger']['email']
 
-    html_content = render_to_string('bookings/ticket.html', { 'ticket': ticket })
-    text_content = strip_tags(html_content)
+    ticket = dict(ticket, flight=parse_datetimes(ticket['flight'], *FLIGHT_DATETIMES))
+    return email_message(subject, to_email, 'bookings/ticket', { 'ticket': ticket })
+
+@shared_task
+def email_ticket(ticket, deferred_at=None):
+    if throttle(email_ticket, [ticket], 1, deferred_at):
+        return
+    mail_pool.send([ticket_message(ticket)])
 
-    message = EmailMultiAlternatives(subject, text_content, from_email, [to_email])
-    message.attach_alternative(html_content, 'text/html')
-    message.send()
+@shared_task
+def email_tickets(tickets, deferred_at=None):
+    """Send the tickets of a multi-flight booking in one batch"""
+    if throttle(email_tickets, [tickets], len(tickets), deferred_at):
+        return
+    mail_pool.send([ticket_message(ticket) for ticket in tickets])
 
 @shared_task
-def email_reservation(ticket):
+def email_reservation(ticket, deferred_at=None):
+    if throttle(email_reservation, [ticket], 1, deferred_at):
+        return
     flight_destination = ticket['flight']['destination']
     subject = f'eTicket - Flight to {flight_destination} Reserved'
-    from_email = settings.EMAIL_HOST_USER
     to_email = ticket['passenger']['email']
 
-    html_content = render_to_string('bookings/confirmation.html', { 'ticket': ticket })
-    text_content = strip_tags(html_content)
+    ticket = dict(parse_datetimes(ticket, 'reserved_at'),
+                  flight=parse_datetimes(ticket['flight'], *FLIGHT_DATETIMES))
+    mail_pool.send([
+        email_message(subject, to_email, 'bookings/confirmation', { 'ticket': ticket })
+    ])
+
+@shared_task
+def email_cancellations(notices, deferred_at=None):
+    """Send the cancellation notices of expired bookings in batches"""
+    if throttle(email_cancellations, [notices], len(notices), deferred_at):
+        return
+    messages = []
+    for notice in notices:
+        subject = f'Booking cancelled - Flight to {notice["destination"]}'
+        notice = parse_datetimes(notice, 'departure_datetime')
+        messages.append(email_message(subject, notice['email'], 'bookings/cancellation',
+                                      { 'notice': notice }))
+    mail_pool.send(messages)
+
+@periodic_task(
+    name='cancel_expired_bookings',
+    run_every=timedelta(minutes=10),
+    ignore_result=True
+)
+def cancel_expired_bookings():
+    from .expiry import BookingExpiry
+
+    BookingExpiry().run()
 
-    message = EmailMultiAlternatives(subject, text_content, from_email, [to_email])
-    message.attach_alternative(html_content, 'text/html')
-    message.send()
+@periodic_task(
+    name='report_mail_stats',
+    run_every=timedelta(seconds=settings.MAIL_STATS_INTERVAL),
+    ignore_result=True
+)
+def report_mail_stats():
+    """Log the mail counters of every worker, totalled in the cache
+
+    A worker publishes its own counters as it sends, at most every
+    MAIL_STATS_INTERVAL seconds, so the totals can lag by one interval.
+    """
+    mail_pool.publish()
+    stats = mail_pool.shared_stats()
+    logger.info('Mail: %(sent)s sent, %(failed)s failed in %(batches)s batches, '
+                '%(messages_per_second).1f msg/s over %(connections)s connections '
+                '(%(reconnects)s reconnects)', stats)
+    logger.info('Mail send rate %(send_rate)s msg/s: %(deferred)s messages deferred, '
+                '%(queue_delay).2fs average queue delay, %(backlog_seconds).2fs backlog', stats)
+
+def reminder_message(booking):
+    subject = f'Reminder - Flight schedule to {booking.flight_id.destination}'
+    to_email = booking.passenger_id.email
+
+    return email_message(subject, to_email, 'bookings/reminder', {
+        'destination': booking.flight_id.destination,
+        'ticket_number': booking.ticket_number,
+        'departure_datetime': booking.flight_id.departure_datetime,
+        'departure_airport': booking.flight_id.departing,
+        'arrival_datetime': booking.flight_id.arrival_datetime,
+        'destination_airport': booking.flight_id.destination,
+        'passenger': [booking.passenger_id.first_name, booking.passenger_id.last_name]
+    })
+
+def reminder_run_keys(run_id):
+    return {name: f'bookings:reminders:{run_id}:{name}'
+            for name in ('bookings', 'chunks', 'started', 'sent', 'done')}
+
+def report_reminder_progress(run_id, sent):
+    """Count a finished chunk of a reminder run and log the progress of the run"""
+    keys = reminder_run_keys(run_id)
+    try:
+        sent_total = cache.incr(keys['sent'], sent)
+        done = cache.incr(keys['done'])
+    except ValueError:
+        # The run expired from the cache, only the chunk itself can be reported
+        logger.info('Travel reminders %s: chunk of %s sent', run_id, sent)
+        return
+    run = cache.get_many([keys['bookings'], keys['chunks'], keys['started']])
+    chunks = run.get(keys['chunks'])
+    logger.info('Travel reminders %s: %s/%s chunks, %s/%s reminders sent',
+                run_id, done, chunks, sent_total, run.get(keys['bookings']))
+    if done == chunks and keys['started'] in run:
+        logger.info('Travel reminders %s finished: %s reminders sent in %.1fs',
+                    run_id, sent_total, time.time() - run[keys['started']])
+
+@shared_task(ignore_result=True)
+def email_reminder_chunk(run_id, booking_ids, deferred_at=None):
+    """Send the travel reminders of a chunk of bookings
+
+    Bookings cancelled since the run started are skipped.
+
+    Arguments:
+        run_id {str} -- id of the reminder run
+        booking_ids {list} -- ids of the bookings
+
+    Keyword Arguments:
+        deferred_at {float} -- when the send rate held the chunk back (default: {None})
+    """
+    if throttle(email_reminder_chunk, [run_id, booking_ids], len(booking_ids), deferred_at):
+        return
+    bookings = (Booking.objects.filter(id__in=booking_ids, flight_status=StatusChoices.R.name)
+                .select_related('flight_id', 'passenger_id')
+                .only(*REMINDER_FIELDS))
+    sent = 0
+    try:
+        sent = mail_pool.send([reminder_message(booking) for booking in bookings])
+    finally:
+        report_reminder_progress(run_id, sent)
 
 @periodic_task(
     name='email_travel_reminder',
@@ -48,27 +170,45 @@ def email_reservation(ticket):
     ignore_result=True
 )
 def email_travel_reminder():
-    min_threshold = timezone.now() + timedelta(days=1)
-    max_threshold = timezone.now() + timedelta(days=2)
-
-    bookings = Booking.objects.filter(Q(flight_id__departure_datetime__gt=min_threshold) &
-                                      Q(flight_id__departure_datetime__lt=max_threshold),
-                                      flight_status=StatusChoices.R.name)
-    for booking in bookings:
-        subject = f'Reminder - Flight schedule to {booking.flight_id.destination}'
-        from_email = settings.EMAIL_HOST_USER
-        to_email = booking.passenger_id.email
-
-        html_content = render_to_string('bookings/reminder.html', {
-            'ticket_number': booking.ticket_number,
-            'departure_datetime': booking.flight_id.departure_datetime,
-            'departure_airport': booking.flight_id.departing,
-            'arrival_datetime': booking.flight_id.arrival_datetime,
-            'destination_airport': booking.flight_id.destination,
-            'passenger': [booking.passenger_id.first_name, booking.passenger_id.last_name]
-        })
-        text_content = strip_tags(html_content)
-
-        message = EmailMultiAlternatives(subject, text_content, from_email, [to_email])
-        message.attach_alternative(html_content, 'text/html')
-        message.send()
+    """Fan the reminders of flights departing in 24 to 48 hours out to the workers
+
+    The ids of the reserved bookings are streamed from the database and sent
+    as a group of ``email_reminder_chunk`` tasks of REMINDER_CHUNK_SIZE
+    bookings each, so every worker can take part in the run. Chunks are
+    kept within the burst of the send rate, so none of them is split and
+    the progress of the run stays one count per chunk.
+    """
+    now = timezone.now()
+    min_threshold = now + timedelta(days=1)
+    max_threshold = now + timedelta(days=2)
+
+    booking_ids = (Booking.objects.filter(Q(flight_id__departure_datetime__gt=min_threshold) &
+                                          Q(flight_id__departure_datetime__lt=max_threshold),
+                                          flight_status=StatusChoices.R.name)
+                   .order_by('id')
+                   .values_list('id', flat=True)
+                   .iterator(chunk_size=settings.REMINDER_CHUNK_SIZE))
+    chunk_size = settings.REMINDER_CHUNK_SIZE
+    if send_rate.rate:
+        chunk_size = min(chunk_size, send_rate.burst)
+    chunks = []
+    for booking_id in booking_ids:
+        if not chunks or len(chunks[-1]) == chunk_size:
+            chunks.append([])
+        chunks[-1].append(booking_id)
+    if not chunks:
+        return
+
+    run_id = uuid.uuid4().hex
+    keys = reminder_run_keys(run_id)
+    total = sum(len(chunk) for chunk in chunks)
+    cache.set_many({
+        keys['bookings']: total,
+        keys['chunks']: len(chunks),
+        keys['started']: time.time(),
+        keys['sent']: 0,
+        keys['done']: 0,
+    }, settings.REMINDER_RUN_TIMEOUT)
+    logger.info('Travel reminders %s: %s reminders in %s chunks',
+                run_id, total, len(chunks))
+    group(email_reminder_chunk.s(run_id, chunk) for chunk in chunks).apply_async()
@@ -1,19 +1,20 @@
-from datetime import datetime
-
 from django.utils.dateparse import parse_datetime
 from django.template import Library
-from django.template.defaultfilters import stringfilter
 
 register = Library()
 
+def as_datetime(value):
+    # Task payloads may still hold ISO strings
+    if isinstance(value, str):
+        return parse_datetime(value)
+    return value
+
 @register.filter(name='ctime')
-@stringfilter
 def custom_time(value):
-    value = parse_datetime(value)
-    return datetime.strftime(value, '%-I:%M %p')
+    value = as_datetime(value)
+    return value.strftime('%-I:%M %p') if value else ''
 
 @register.filter(name='cdate')
-@stringfilter
 def custom_date(value):
-    value = parse_datetime(value)
-    return datetime.strftime(value, '%a, %d %b, %Y')
+    value = as_datetime(value)
+    return value.strftime('%a, %d %b, %Y') if value else ''
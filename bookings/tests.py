@@ -1,14 +1,35 @@
+import itertools
+import json
 import pytz
-from datetime import datetime
-from unittest.mock import patch
-
+import re
+import smtplib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+from django.core import mail
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from kombu.exceptions import OperationalError
 from rest_framework.test import APIClient, APITestCase
 from rest_framework.views import status
 
 from users.models import User
 from flights.models import Flight
-from .models import Booking
+from flights.serializers import FlightReadSerializer
+from .cache import invalidate_passenger_tickets
+from .expiry import BookingExpiry
+from .mail import SMTP_BACKEND, MailPool, SendRateLimiter
+from .models import Booking, Notification
+from .serializers import TicketSerializer
+from .tasks import (email_cancellations, email_reminder_chunk, email_reservation, email_ticket,
+                    email_tickets, email_travel_reminder, report_mail_stats)
+from .templatetags.bookings_filters import custom_date, custom_time
+from .outbox import NotificationRelay, enqueue
+from .tickets import TicketNumberAllocator, TicketNumbersExhausted
 
 
 class BaseViewTest(APITestCase):
@@ -22,6 +43,7 @@ class BaseViewTest(APITestCase):
     token = []
 
     def setUp(self):
+        cache.clear()
         self.user_data = [{
             'email': 'user@example.com',
             'first_name': 'John',
@@ -96,6 +118,10 @@ class BaseViewTest(APITestCase):
             data.update({'created_by': self.admin})
             return Flight.objects.create(**data)
 
+    def notifications(self, task):
+        return list(Notification.objects.filter(task=task.name)
+                    .order_by('id').values_list('payload', flat=True))
+
 
 class BaseDetailViewTest(BaseViewTest):
     """Base detail view test class
@@ -146,33 +172,86 @@ class BookingListViewTest(BaseViewTest):
                          ['Flight with the id "999999" does not exist'])
 
     def test_booking_flight_successfully(self):
-        with patch('bookings.views.email_ticket.delay') as mock_delay:
-            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        response = self.client.post(reverse('booking_list'),
+                                    {'flight_id': self.flight_1.id},
+                                    format='json')
+        data = response.data
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(data['status'], 'Success')
+        self.assertEqual(data['message'], 'Ticket booked')
+        self.assertEqual(data['data']['flight_status'], 'Booked')
+        self.assertIsInstance(data['data']['ticket_number'], str)
+        self.assertEqual(data['data']['passenger']['id'], self.user_1.id)
+        self.assertEqual(data['data']['flight']['id'], self.flight_1.id)
+        self.assertEqual(data['data']['amount_paid'], '0.00')
+        self.assertIsNone(data['data']['reserved_at'])
+        self.assertTrue(self.notifications(email_ticket))
+
+        response = self.client.post(reverse('booking_list'),
+                                    {'flight_id': self.flight_1.id},
+                                    format='json')
+        data = response.data
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(data['status'], 'Error')
+        self.assertEqual(data['message'], 'Could not book the flight')
+        self.assertEqual(data['error']['non_field_errors'], ['Ticket already booked'])
+
+    def test_booking_fully_booked_flight(self):
+        Flight.objects.filter(id=self.flight_1.id).update(capacity=1, seats_taken=1)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        response = self.client.post(reverse('booking_list'),
+                                    {'flight_id': self.flight_1.id},
+                                    format='json')
+        data = response.data
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(data['status'], 'Error')
+        self.assertEqual(data['message'], 'Flight fully booked')
+        self.assertFalse(Booking.objects.filter(flight_id=self.flight_1).exists())
+        self.assertFalse(self.notifications(email_ticket))
+
+    def test_booking_flight_query_count(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        with patch('bookings.views.ticket_numbers.allocate', return_value='TK0001'):
+            # Authenticated user, flight, savepoint, seat, booking and
+            # notification inserts, release
+            with self.assertNumQueries(7):
+                response = self.client.post(reverse('booking_list'),
+                                            {'flight_id': self.flight_1.id},
+                                            format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['data']['ticket_number'], 'TK0001')
+
+    def test_booking_flight_twice_rolls_back_the_seat(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        for _ in range(2):
             response = self.client.post(reverse('booking_list'),
                                         {'flight_id': self.flight_1.id},
                                         format='json')
-            data = response.data
 
-            self.assertEqual(response.status_code, 201)
-            self.assertEqual(data['status'], 'Success')
-            self.assertEqual(data['message'], 'Ticket booked')
-            self.assertEqual(data['data']['flight_status'], 'Booked')
-            self.assertIsInstance(data['data']['ticket_number'], str)
-            self.assertEqual(data['data']['passenger']['id'], self.user_1.id)
-            self.assertEqual(data['data']['flight']['id'], self.flight_1.id)
-            self.assertEqual(data['data']['amount_paid'], '0.00')
-            self.assertIsNone(data['data']['reserved_at'])
-            self.assertTrue(mock_delay.called)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error']['non_field_errors'], ['Ticket already booked'])
+        self.assertEqual(Flight.objects.get(id=self.flight_1.id).seats_taken, 1)
+        self.assertEqual(len(self.notifications(email_ticket)), 1)
 
+    def test_booking_flight_when_ticket_numbers_are_exhausted(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        with patch('bookings.views.ticket_numbers.allocate',
+                   side_effect=TicketNumbersExhausted):
             response = self.client.post(reverse('booking_list'),
                                         {'flight_id': self.flight_1.id},
                                         format='json')
-            data = response.data
 
-            self.assertEqual(response.status_code, 400)
-            self.assertEqual(data['status'], 'Error')
-            self.assertEqual(data['message'], 'Could not book the flight')
-            self.assertEqual(data['error']['non_field_errors'], ['Ticket already booked'])
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.data['status'], 'Error')
+        self.assertEqual(response.data['message'],
+                         'No ticket numbers are left, bookings are unavailable')
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(Flight.objects.get(id=self.flight_1.id).seats_taken, 0)
 
     def test_get_ticket_status_without_token(self):
         response = self.client.get(reverse('booking_list'), {'ticket_number': 'ticket'})
@@ -203,10 +282,9 @@ class BookingListViewTest(BaseViewTest):
 
     def test_get_ticket_status_with_valid_ticket(self):
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
-        with patch('bookings.views.email_ticket.delay') as mock_delay:
-            booking = self.client.post(reverse('booking_list'),
-                                        {'flight_id': self.flight_1.id},
-                                        format='json')
+        booking = self.client.post(reverse('booking_list'),
+                                    {'flight_id': self.flight_1.id},
+                                    format='json')
 
         response = self.client.get(reverse('booking_list'),
                                    {'ticket': booking.data['data']['ticket_number']})
@@ -272,20 +350,18 @@ class BookingListViewTest(BaseViewTest):
     def test_get_flight_reservations_successfully_for_a_specific_day(self):
         with patch('django.utils.timezone.now', return_value=self.MOCK_NOW):
             # Book a flight
-            with patch('bookings.views.email_ticket.delay') as mock_delay:
-                self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
-                booking = self.client.post(reverse('booking_list'),
-                                            {'flight_id': self.flight_1.id},
-                                            format='json')
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+            booking = self.client.post(reverse('booking_list'),
+                                        {'flight_id': self.flight_1.id},
+                                        format='json')
 
             # Reserve the booked flight
-            with patch('bookings.views.email_reservation.delay') as mock_delay:
-                self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
-                self.client.put(
-                    reverse('booking_detail', kwargs={'booking_pk': booking.data['data']['id']}),
-                    {'amount_paid': 300},
-                    format='json'
-                )
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+            self.client.put(
+                reverse('booking_detail', kwargs={'booking_pk': booking.data['data']['id']}),
+                {'amount_paid': 300},
+                format='json'
+            )
 
             query_params = {
                 'flight': self.flight_1.id,
@@ -304,11 +380,10 @@ class BookingListViewTest(BaseViewTest):
     def test_get_flight_bookings_successfully_for_a_specific_day(self):
         with patch('django.utils.timezone.now', return_value=self.MOCK_NOW):
             # Book a flight
-            with patch('bookings.views.email_ticket.delay') as mock_delay:
-                self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
-                booking = self.client.post(reverse('booking_list'),
-                                            {'flight_id': self.flight_1.id},
-                                            format='json')
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+            booking = self.client.post(reverse('booking_list'),
+                                        {'flight_id': self.flight_1.id},
+                                        format='json')
 
             query_params = {
                 'flight': self.flight_1.id,
@@ -325,6 +400,62 @@ class BookingListViewTest(BaseViewTest):
             self.assertEqual(data['data']['count'], 1)
 
 
+    def create_manifest(self, size):
+        with patch('django.utils.timezone.now', return_value=self.MOCK_NOW):
+            for index in range(size):
+                passenger = User.objects.create_user(f'manifest_{index}@example.com', 'John',
+                                                     'West', password='awesome',
+                                                     phone_number=f'+{10 ** 10 + index}')
+                Booking.objects.create(flight_id=self.flight_1, passenger_id=passenger,
+                                       ticket_number=f'MF{index:04d}')
+
+    def test_get_flight_bookings_in_pages(self):
+        self.create_manifest(5)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        query_params = {
+            'flight': self.flight_1.id,
+            'date': '2019-04-12',
+            'status': 'Booked',
+            'page_size': 2
+        }
+        tickets = []
+        url = reverse('booking_list')
+        while url:
+            response = self.client.get(url, query_params)
+            data = response.data['data']
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(data['count'], 5)
+            tickets.extend(booking['ticket_number'] for booking in data['reservations'])
+            url, query_params = data['pagination']['next'], {}
+
+        self.assertEqual(tickets, [f'MF{index:04d}' for index in range(5)])
+
+    def test_get_flight_bookings_query_count(self):
+        self.create_manifest(3)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        # Authenticated user, then the page and its count together
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('booking_list'), {
+                'flight': self.flight_1.id,
+                'date': '2019-04-12',
+                'status': 'Booked'
+            })
+
+        self.assertEqual(response.data['data']['count'], 3)
+        self.assertEqual(len(response.data['data']['reservations']), 3)
+
+    def test_get_flight_bookings_with_invalid_cursor(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        response = self.client.get(reverse('booking_list'), {
+            'flight': self.flight_1.id,
+            'date': '2019-04-12',
+            'status': 'Booked',
+            'cursor': 'invalid'
+        })
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['message'], 'Invalid cursor')
+
 class BookingDetailViewTest(BaseDetailViewTest):
     """Booking detail view test class
 
@@ -391,28 +522,898 @@ class BookingDetailViewTest(BaseDetailViewTest):
         self.assertEqual(data['error']['non_field_errors'], ['Amount paid is not equal to the flight cost'])
 
     def test_reserve_user_booking_successfully(self):
-        with patch('bookings.views.email_reservation.delay') as mock_delay:
-            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
-            response = self.client.put(
-                reverse('booking_detail', kwargs={'booking_pk': self.booking_1.id}),
-                {'amount_paid': 300},
-                format='json')
-            data = response.data
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        response = self.client.put(
+            reverse('booking_detail', kwargs={'booking_pk': self.booking_1.id}),
+            {'amount_paid': 300},
+            format='json')
+        data = response.data
 
-            self.assertEqual(response.status_code, 200)
-            self.assertEqual(data['status'], 'Success')
-            self.assertEqual(data['message'], 'Flight reserved')
-            self.assertEqual(data['data']['flight_status'], 'Reserved')
-            self.assertEqual(data['data']['amount_paid'], '300.00')
-            self.assertIsNotNone(data['data']['reserved_at'])
-            self.assertTrue(mock_delay.called)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['status'], 'Success')
+        self.assertEqual(data['message'], 'Flight reserved')
+        self.assertEqual(data['data']['flight_status'], 'Reserved')
+        self.assertEqual(data['data']['amount_paid'], '300.00')
+        self.assertIsNotNone(data['data']['reserved_at'])
+        self.assertTrue(self.notifications(email_reservation))
+
+        response = self.client.put(
+            reverse('booking_detail', kwargs={'booking_pk': self.booking_1.id}),
+            {'amount_paid': 300},
+            format='json')
+        data = response.data
 
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(data['status'], 'Error')
+        self.assertEqual(data['message'], 'Flight already reserved')
+
+    def test_reserve_user_booking_query_count(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        # Authenticated user, savepoint, conditional update, ticket,
+        # notification insert, release
+        with self.assertNumQueries(6):
             response = self.client.put(
                 reverse('booking_detail', kwargs={'booking_pk': self.booking_1.id}),
                 {'amount_paid': 300},
                 format='json')
-            data = response.data
 
-            self.assertEqual(response.status_code, 409)
-            self.assertEqual(data['status'], 'Error')
-            self.assertEqual(data['message'], 'Flight already reserved')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['passenger']['id'], self.user_1.id)
+        self.assertEqual(response.data['data']['flight']['id'], self.flight_1.id)
+
+    def test_reserve_cancelled_booking(self):
+        Booking.objects.filter(id=self.booking_1.id).update(flight_status='C')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        response = self.client.put(
+            reverse('booking_detail', kwargs={'booking_pk': self.booking_1.id}),
+            {'amount_paid': 300},
+            format='json')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['message'], 'Booking cancelled')
+
+
+class TicketStatusCacheTest(BaseDetailViewTest):
+    """Ticket status cache test class
+
+    Arguments:
+        BaseDetailViewTest {APITestCase} -- BaseDetailViewTest class
+    """
+    def get_ticket(self, ticket_number):
+        return self.client.get(reverse('booking_list'), {'ticket': ticket_number})
+
+    def test_ticket_status_is_read_once_then_cached(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        # Authenticated user and the ticket joined to its flight and passenger
+        with self.assertNumQueries(2):
+            first = self.get_ticket('EF343F')
+        with self.assertNumQueries(1):
+            second = self.get_ticket('EF343F')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(first.data['data']['flight']['id'], self.flight_1.id)
+        self.assertEqual(first.data['data']['passenger']['id'], self.user_1.id)
+
+    def test_ticket_status_after_reservation(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        self.get_ticket('EF343F')
+        self.client.put(reverse('booking_detail', kwargs={'booking_pk': self.booking_1.id}),
+                        {'amount_paid': 300}, format='json')
+
+        self.assertEqual(self.get_ticket('EF343F').data['data']['flight_status'], 'Reserved')
+
+    def test_ticket_status_after_flight_update(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[0]}')
+        self.get_ticket('EF343F')
+        self.client.put(reverse('flight_detail', kwargs={'flight_pk': self.flight_1.id}),
+                        {'destination': 'Abu Dhabi'}, format='json')
+
+        self.assertEqual(self.get_ticket('EF343F').data['data']['flight']['destination'],
+                         'Abu Dhabi')
+
+    def test_ticket_status_after_profile_change(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        self.get_ticket('EF343F')
+        User.objects.filter(pk=self.user_1.pk).update(first_name='Jack')
+        invalidate_passenger_tickets(self.user_1)
+
+        self.assertEqual(self.get_ticket('EF343F').data['data']['passenger']['first_name'],
+                         'Jack')
+
+
+class GroupBookingViewTest(BaseViewTest):
+    """Group booking view test class
+
+    Arguments:
+        BaseViewTest {APITestCase} -- BaseViewTest class
+    """
+    def book_flights(self, flight_ids):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        return self.client.post(reverse('booking_group'), {'flight_ids': flight_ids},
+                                format='json')
+
+    def test_group_booking_without_token(self):
+        response = self.client.post(reverse('booking_group'), {}, format='json')
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_group_booking_with_repeated_flight(self):
+        response = self.book_flights([self.flight_1.id, self.flight_1.id])
+        data = response.data
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(data['message'], 'Could not book the flights')
+        self.assertEqual(data['error']['flight_ids'], ['A flight can only be booked once'])
+
+    def test_group_booking_non_existing_flight(self):
+        response = self.book_flights([self.flight_1.id, 999999])
+        data = response.data
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(data['error']['flight_ids'],
+                         ['Flight with the id "999999" does not exist'])
+        self.assertFalse(Booking.objects.exists())
+
+    def test_group_booking_successfully(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.book_flights([self.flight_1.id, self.flight_2.id])
+        data = response.data
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(data['status'], 'Success')
+        self.assertEqual(data['message'], 'Tickets booked')
+        self.assertEqual([ticket['flight']['id'] for ticket in data['data']],
+                         [self.flight_1.id, self.flight_2.id])
+        self.assertTrue(all(ticket['passenger']['id'] == self.user_1.id
+                            for ticket in data['data']))
+        self.assertEqual(Booking.objects.filter(passenger_id=self.user_1).count(), 2)
+        self.assertEqual(set(Flight.objects.values_list('seats_taken', flat=True)), {1})
+        self.assertEqual(self.notifications(email_tickets), [data['data']])
+        # Authentication, flights, duplicate check, ticket block, seats,
+        # booking and notification inserts and the savepoint pair,
+        # however many flights are booked
+        self.assertLessEqual(len(queries), 9)
+
+    def test_group_booking_already_booked_flight(self):
+        Booking.objects.create(flight_id=self.flight_2, passenger_id=self.user_1,
+                               ticket_number='EF343F')
+        response = self.book_flights([self.flight_1.id, self.flight_2.id])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['message'], 'Ticket already booked')
+        self.assertEqual(Booking.objects.filter(passenger_id=self.user_1).count(), 1)
+
+    def test_group_booking_fully_booked_flight(self):
+        Flight.objects.filter(id=self.flight_2.id).update(capacity=1, seats_taken=1)
+        response = self.book_flights([self.flight_1.id, self.flight_2.id])
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['message'], 'Flight fully booked')
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(Flight.objects.get(id=self.flight_1.id).seats_taken, 0)
+        self.assertFalse(self.notifications(email_tickets))
+
+    def test_group_booking_when_ticket_numbers_are_exhausted(self):
+        with patch('bookings.views.ticket_numbers.allocate',
+                   side_effect=TicketNumbersExhausted):
+            response = self.book_flights([self.flight_1.id, self.flight_2.id])
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.data['message'],
+                         'No ticket numbers are left, bookings are unavailable')
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(set(Flight.objects.values_list('seats_taken', flat=True)), {0})
+
+
+class IdempotencyKeyTest(BaseDetailViewTest):
+    """Idempotency key test class
+
+    Arguments:
+        BaseDetailViewTest {APITestCase} -- BaseDetailViewTest class
+    """
+    def book(self, key, flight_id):
+        return self.client.post(reverse('booking_list'), {'flight_id': flight_id},
+                                format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retried_booking_replays_first_response(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        first = self.book('booking-1', self.flight_2.id)
+        with self.assertNumQueries(1):
+            retry = self.book('booking-1', self.flight_2.id)
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Booking.objects.filter(passenger_id=self.user_1).count(), 2)
+        self.assertEqual(len(self.notifications(email_ticket)), 1)
+
+    def test_key_reused_with_different_request(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        self.book('booking-1', self.flight_2.id)
+        response = self.book('booking-1', self.flight_1.id)
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.data['message'],
+                         'Idempotency-Key was already used with a different request')
+
+    def test_keys_are_scoped_to_the_user(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        first = self.book('booking-1', self.flight_2.id)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[2]}')
+        second = self.book('booking-1', self.flight_1.id)
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertNotEqual(first.data['data']['id'], second.data['data']['id'])
+
+    def test_retried_reservation_replays_first_response(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        url = reverse('booking_detail', kwargs={'booking_pk': self.booking_1.id})
+        first = self.client.put(url, {'amount_paid': 300}, format='json',
+                                HTTP_IDEMPOTENCY_KEY='reserve-1')
+        retry = self.client.put(url, {'amount_paid': 300}, format='json',
+                                HTTP_IDEMPOTENCY_KEY='reserve-1')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(len(self.notifications(email_reservation)), 1)
+
+    def test_retry_taking_released_lock_replays_stored_response(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        first = self.book('booking-1', self.flight_2.id)
+        # The retry read the key before the first request stored its response
+        reads = [None]
+        get = cache.get
+        with patch('api.helpers.idempotency.cache.get',
+                   side_effect=lambda key: reads.pop() if reads else get(key)):
+            retry = self.book('booking-1', self.flight_2.id)
+
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(len(self.notifications(email_ticket)), 1)
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+    def test_request_with_key_in_progress(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        with patch('api.helpers.idempotency.cache.add', return_value=False):
+            response = self.book('booking-1', self.flight_2.id)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['message'],
+                         'A request with this Idempotency-Key is in progress')
+        self.assertFalse(self.notifications(email_ticket))
+
+
+class BookingStatsViewTest(BaseDetailViewTest):
+    """Booking stats view test class
+
+    Arguments:
+        BaseDetailViewTest {APITestCase} -- BaseDetailViewTest class
+    """
+    def setUp(self):
+        super().setUp()
+        Booking.objects.filter(id=self.booking_1.id).update(flight_status='R', amount_paid=300)
+        self.book_flight({
+            'flight_id': self.flight_1,
+            'ticket_number': 'CA2C3L',
+            'flight_status': 'C'
+        }, self.user_2)
+
+    def test_get_booking_stats_as_non_admin(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        response = self.client.get(reverse('booking_stats'), {'flight': self.flight_1.id})
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_get_booking_stats_of_several_flights(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[0]}')
+        params = {'flight': [self.flight_2.id, self.flight_1.id]}
+        # Authenticated user and one aggregate over both flights
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('booking_stats'), params)
+        with self.assertNumQueries(1):
+            cached = self.client.get(reverse('booking_stats'), params)
+        data = response.data['data']
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(cached.data, response.data)
+        self.assertEqual([stats['flight_id'] for stats in data],
+                         [self.flight_2.id, self.flight_1.id])
+        self.assertEqual(data[0]['bookings'], {'booked': 1, 'reserved': 0, 'cancelled': 0})
+        self.assertEqual(data[1]['bookings'], {'booked': 0, 'reserved': 1, 'cancelled': 1})
+        self.assertEqual(data[1]['total'], 2)
+        self.assertEqual(data[1]['revenue'], '300.00')
+        self.assertEqual(data[1]['currency'], 'USD')
+        self.assertEqual(data[1]['reservation_rate'], 0.5)
+
+    def test_get_booking_stats_of_non_existing_flight(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[0]}')
+        response = self.client.get(reverse('booking_stats'),
+                                   {'flight': [self.flight_1.id, 99999]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error']['flight'],
+                         ['Flight with the id "99999" does not exist'])
+
+    def test_get_flight_booking_stats(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[0]}')
+        response = self.client.get(
+            reverse('flight_booking_stats', kwargs={'flight_pk': self.flight_2.id}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['total'], 1)
+        self.assertEqual(response.data['data']['revenue'], '0.00')
+        self.assertEqual(response.data['data']['reservation_rate'], 0)
+
+        response = self.client.get(
+            reverse('flight_booking_stats', kwargs={'flight_pk': 99999}))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['message'], 'Flight not found')
+
+class BookingExpiryTest(BaseDetailViewTest):
+    """Booking expiry test class
+
+    Arguments:
+        BaseDetailViewTest {APITestCase} -- BaseDetailViewTest class
+    """
+    def setUp(self):
+        super().setUp()
+        Flight.objects.update(seats_taken=1)
+        Booking.objects.update(created_at=self.MOCK_NOW)
+
+    def test_expired_bookings_are_cancelled_in_chunks(self):
+        with patch('django.utils.timezone.now',
+                   return_value=self.MOCK_NOW + timedelta(hours=25)):
+            cancelled = BookingExpiry(hold=timedelta(hours=24), batch_size=1).run()
+
+        self.assertEqual(cancelled, 2)
+        self.assertEqual(set(Booking.objects.values_list('flight_status', flat=True)), {'C'})
+        self.assertEqual(set(Flight.objects.values_list('seats_taken', flat=True)), {0})
+        notices = self.notifications(email_cancellations)
+        self.assertEqual([[notice['ticket_number'] for notice in chunk] for chunk in notices],
+                         [['EF343F'], ['ST54F3']])
+        self.assertEqual(notices[0][0]['email'], self.user_1.email)
+
+    def test_flights_are_locked_before_bookings(self):
+        with patch('django.utils.timezone.now',
+                   return_value=self.MOCK_NOW + timedelta(hours=25)), \
+             CaptureQueriesContext(connection) as queries:
+            BookingExpiry(hold=timedelta(hours=24)).run()
+
+        locks = [query['sql'] for query in queries if 'FOR UPDATE' in query['sql']]
+        self.assertEqual(len(locks), 2)
+        self.assertIn('FROM "flights_flight"', locks[0])
+        self.assertIn('ORDER BY "flights_flight"."id"', locks[0])
+        self.assertIn('FROM "bookings_booking"', locks[1])
+
+    def test_paid_and_recent_bookings_are_kept(self):
+        Booking.objects.filter(id=self.booking_1.id).update(flight_status='R')
+        Booking.objects.filter(id=self.booking_2.id).update(
+            created_at=self.MOCK_NOW + timedelta(hours=2))
+        with patch('django.utils.timezone.now',
+                   return_value=self.MOCK_NOW + timedelta(hours=25)):
+            cancelled = BookingExpiry(hold=timedelta(hours=24)).run()
+
+        self.assertEqual(cancelled, 0)
+        self.assertFalse(Booking.objects.filter(flight_status='C').exists())
+        self.assertFalse(self.notifications(email_cancellations))
+
+    def test_flight_can_be_booked_again_after_expiry(self):
+        with patch('django.utils.timezone.now',
+                   return_value=self.MOCK_NOW + timedelta(hours=25)):
+            BookingExpiry(hold=timedelta(hours=24)).run()
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        single = self.client.post(reverse('booking_list'), {'flight_id': self.flight_1.id},
+                                  format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[2]}')
+        group = self.client.post(reverse('booking_group'), {'flight_ids': [self.flight_2.id]},
+                                 format='json')
+
+        self.assertEqual(single.status_code, 201)
+        self.assertEqual(group.status_code, 201)
+        self.assertEqual(Booking.objects.filter(passenger_id=self.user_1).count(), 2)
+
+    def test_cancelled_ticket_status_is_not_served_from_cache(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        self.client.get(reverse('booking_list'), {'ticket': 'EF343F'})
+        with patch('django.utils.timezone.now',
+                   return_value=self.MOCK_NOW + timedelta(hours=25)):
+            BookingExpiry(hold=timedelta(hours=24)).run()
+
+        response = self.client.get(reverse('booking_list'), {'ticket': 'EF343F'})
+        self.assertEqual(response.data['data']['flight_status'], 'Cancelled')
+
+class TravelReminderTest(BaseDetailViewTest):
+    """Travel reminder test class
+
+    Arguments:
+        BaseDetailViewTest {APITestCase} -- BaseDetailViewTest class
+    """
+    def setUp(self):
+        super().setUp()
+        self.book_flight({
+            'flight_id': self.flight_1,
+            'ticket_number': 'RM0001',
+            'flight_status': 'R',
+        }, self.user_2)
+        self.book_flight({
+            'flight_id': self.flight_1,
+            'ticket_number': 'RM0002',
+            'flight_status': 'R',
+        }, self.admin)
+        Booking.objects.filter(id=self.booking_1.id).update(flight_status='R')
+        Booking.objects.filter(id=self.booking_2.id).update(flight_status='R')
+
+    @override_settings(REMINDER_CHUNK_SIZE=2)
+    def fan_out(self):
+        with patch('bookings.tasks.group') as group, \
+             patch('django.utils.timezone.now', return_value=self.MOCK_NOW + timedelta(hours=3)):
+            email_travel_reminder()
+        return [signature.args for signature in group.call_args[0][0]]
+
+    def test_reminders_are_fanned_out_in_chunks(self):
+        chunks = self.fan_out()
+
+        self.assertEqual([len(booking_ids) for _, booking_ids in chunks], [2, 1])
+        self.assertEqual(len({run_id for run_id, _ in chunks}), 1)
+        self.assertNotIn(self.booking_2.id, itertools.chain(*(ids for _, ids in chunks)))
+
+    def test_reminder_chunks_stay_within_the_send_burst(self):
+        with patch('bookings.tasks.send_rate', SendRateLimiter(rate=10, burst=1, key='test')):
+            chunks = self.fan_out()
+
+        self.assertEqual([len(booking_ids) for _, booking_ids in chunks], [1, 1, 1])
+
+    def test_reminder_chunk_is_sent_in_one_query(self):
+        chunks = self.fan_out()
+
+        with self.assertNumQueries(1):
+            email_reminder_chunk(*chunks[0])
+        email_reminder_chunk(*chunks[1])
+
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         sorted([self.user_1.email, self.user_2.email, self.admin.email]))
+        self.assertEqual(mail.outbox[0].subject, 'Reminder - Flight schedule to Dubai')
+        run_id = chunks[0][0]
+        self.assertEqual(cache.get(f'bookings:reminders:{run_id}:sent'), 3)
+        self.assertEqual(cache.get(f'bookings:reminders:{run_id}:done'), 2)
+
+    def test_cancelled_bookings_are_skipped(self):
+        chunks = self.fan_out()
+        Booking.objects.filter(ticket_number='RM0001').update(flight_status='C')
+
+        for chunk in chunks:
+            email_reminder_chunk(*chunk)
+
+        self.assertEqual(len(mail.outbox), 2)
+
+class EmailTemplateTest(BaseDetailViewTest):
+    """Email template test class
+
+    Arguments:
+        BaseDetailViewTest {APITestCase} -- BaseDetailViewTest class
+    """
+    def test_ticket_email_has_text_and_html_parts(self):
+        email_ticket(TicketSerializer(self.booking_1).data)
+
+        message = mail.outbox[0]
+        self.assertIn('Dear John,', message.body)
+        self.assertIn('Ticket number: EF343F', message.body)
+        self.assertIn('Departure time: 9:05 AM Fri, 12 Apr, 2019', message.body)
+        self.assertNotIn('<', message.body)
+        self.assertIn('<strong>EF343F</strong>', message.alternatives[0][0])
+
+    def test_date_filters_accept_datetimes_and_strings(self):
+        departure = datetime(2019, 4, 12, 21, 5, tzinfo=pytz.utc)
+
+        for value in (departure, departure.isoformat()):
+            self.assertEqual(custom_time(value), '9:05 PM')
+            self.assertEqual(custom_date(value), 'Fri, 12 Apr, 2019')
+        self.assertEqual(custom_time(None), '')
+
+class TicketFlightReadTest(BaseDetailViewTest):
+    """Ticket flight read test class
+
+    Arguments:
+        BaseDetailViewTest {APITestCase} -- BaseDetailViewTest class
+    """
+    def test_serialize_ticket_flight_like_ticket_serializer(self):
+        reader = FlightReadSerializer(prefix='flight_id__')
+        row = reader.values(Booking.objects.filter(pk=self.booking_1.id)).get()
+
+        self.assertEqual(json.dumps(reader.to_representation(row)),
+                         json.dumps(TicketSerializer(self.booking_1).data['flight']))
+
+
+class BookingConcurrencyTest(TransactionTestCase):
+    """Booking concurrency test class
+
+    Arguments:
+        TransactionTestCase {TestCase} -- django TransactionTestCase class
+    """
+    CAPACITY = 20
+    PASSENGERS = 200
+
+    def setUp(self):
+        admin = User.objects.create_superuser('admin@example.com', 'Micheal', 'Perez',
+                                              password='awesomeadmin')
+        self.flight = Flight.objects.create(
+            flight_number='FE3433',
+            departure_datetime=datetime(2019, 4, 12, 9, 5, tzinfo=pytz.utc),
+            arrival_datetime=datetime(2019, 4, 13, 12, 0, tzinfo=pytz.utc),
+            flight_cost=300,
+            departing='Lagos',
+            departing_airport='LOS',
+            destination='Dubai',
+            destination_airport='DXB',
+            capacity=self.CAPACITY,
+            created_by=admin)
+        self.passengers = [
+            User.objects.create_user(f'user_{index}@example.com', 'John', 'West',
+                                     password='awesome', phone_number=f'+{10 ** 10 + index}')
+            for index in range(self.PASSENGERS)
+        ]
+
+    def book(self, passenger):
+        client = APIClient()
+        client.force_authenticate(passenger)
+        try:
+            return client.post(reverse('booking_list'), {'flight_id': self.flight.id},
+                               format='json').status_code
+        finally:
+            connection.close()
+
+    def test_parallel_bookings_never_oversell(self):
+        with ThreadPoolExecutor(max_workers=25) as executor:
+            statuses = list(executor.map(self.book, self.passengers))
+
+        self.flight.refresh_from_db()
+        self.assertEqual(statuses.count(201), self.CAPACITY)
+        self.assertEqual(statuses.count(409), self.PASSENGERS - self.CAPACITY)
+        self.assertEqual(self.flight.seats_taken, self.CAPACITY)
+        self.assertEqual(Booking.objects.filter(flight_id=self.flight).count(), self.CAPACITY)
+
+    def test_parallel_reservations_reserve_once(self):
+        passenger = self.passengers[0]
+        booking = Booking.objects.create(flight_id=self.flight, passenger_id=passenger,
+                                         ticket_number='EF343F')
+
+        def reserve(_):
+            client = APIClient()
+            client.force_authenticate(passenger)
+            try:
+                return client.put(reverse('booking_detail', kwargs={'booking_pk': booking.id}),
+                                  {'amount_paid': 300}, format='json').status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            statuses = list(executor.map(reserve, range(20)))
+
+        self.assertEqual(statuses.count(200), 1)
+        self.assertEqual(statuses.count(409), 19)
+        self.assertEqual(Notification.objects.filter(task=email_reservation.name).count(), 1)
+
+
+class TicketNumberAllocatorTest(TestCase):
+    """Ticket number allocator test class
+
+    Arguments:
+        TestCase {TestCase} -- django TestCase class
+    """
+    def create_allocator(self, blocks, block_size=100):
+        allocator = TicketNumberAllocator(block_size=block_size, key='test')
+        allocator.reserve_block = lambda: next(blocks)
+        return allocator
+
+    def test_allocate_valid_ticket_numbers(self):
+        allocator = self.create_allocator(itertools.count())
+        tickets = [allocator.allocate() for _ in range(1000)]
+
+        self.assertEqual(len(set(tickets)), 1000)
+        for ticket in tickets:
+            self.assertIsNotNone(re.search(r"^[A-Z0-9]{6}$", ticket))
+            self.assertFalse(set(ticket) <= set('0123456789ABCDEF'))
+
+    def test_allocate_in_parallel(self):
+        allocator = self.create_allocator(itertools.count(), block_size=10)
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            tickets = list(executor.map(lambda _: allocator.allocate(), range(5000)))
+
+        self.assertEqual(len(set(tickets)), 5000)
+
+    def test_allocators_share_the_sequence(self):
+        allocators = [TicketNumberAllocator(block_size=10, key='test') for _ in range(3)]
+        tickets = [allocator.allocate() for _ in range(50) for allocator in allocators]
+
+        self.assertEqual(len(set(tickets)), 150)
+
+    def test_allocate_after_exhaustion(self):
+        last_block = 36 ** 6 // 1000
+        allocator = self.create_allocator(itertools.count(last_block), block_size=1000)
+
+        tickets = []
+        with self.assertRaises(TicketNumbersExhausted):
+            while True:
+                tickets.append(allocator.allocate())
+
+        self.assertLessEqual(len(tickets), 36 ** 6 - last_block * 1000)
+        self.assertEqual(len(set(tickets)), len(tickets))
+
+
+class NotificationRelayTest(TestCase):
+    """Notification relay test class
+
+    Arguments:
+        TestCase {TestCase} -- django TestCase class
+    """
+    def setUp(self):
+        self.app = MagicMock()
+        patcher = patch('bookings.outbox.current_app', self.app)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_relay_publishes_and_deletes_in_batches(self):
+        for index in range(5):
+            enqueue(email_ticket, {'ticket_number': f'TK000{index}'})
+
+        relay = NotificationRelay(batch_size=2)
+        self.assertEqual([relay.relay_batch() for _ in range(4)], [2, 2, 1, 0])
+
+        apply_async = self.app.tasks[email_ticket.name].apply_async
+        self.assertEqual([call[1]['args'] for call in apply_async.call_args_list],
+                         [[{'ticket_number': f'TK000{index}'}] for index in range(5)])
+        self.assertFalse(Notification.objects.exists())
+
+    def test_relay_keeps_batch_when_broker_fails(self):
+        for index in range(3):
+            enqueue(email_ticket, {'ticket_number': f'TK000{index}'})
+        self.app.tasks[email_ticket.name].apply_async.side_effect = [
+            None, OperationalError('connection refused')]
+
+        with self.assertRaises(OperationalError):
+            NotificationRelay(batch_size=3).relay_batch()
+
+        self.assertEqual(Notification.objects.count(), 3)
+
+    def test_relay_marks_unpublishable_notification_failed(self):
+        enqueue(email_ticket, {'ticket_number': 'TK0000'})
+        Notification.objects.create(task='bookings.tasks.removed', payload={})
+        enqueue(email_ticket, {'ticket_number': 'TK0001'})
+        apply_async = MagicMock()
+        self.app.tasks = {email_ticket.name: MagicMock(apply_async=apply_async)}
+
+        relay = NotificationRelay(batch_size=3)
+        self.assertEqual(relay.relay_batch(), 3)
+        self.assertEqual(relay.relay_batch(), 0)
+
+        self.assertEqual([call[1]['args'] for call in apply_async.call_args_list],
+                         [[{'ticket_number': 'TK0000'}], [{'ticket_number': 'TK0001'}]])
+        self.assertEqual(list(Notification.objects.values_list('task', 'failed')),
+                         [('bookings.tasks.removed', True)])
+
+    @patch('bookings.outbox.connection')
+    @patch('bookings.outbox.time.sleep')
+    def test_relay_keeps_running_when_database_fails(self, sleep, db_connection):
+        relay = NotificationRelay()
+        with patch.object(relay, 'relay_batch', side_effect=[DatabaseError('gone away'), 0]) \
+                as relay_batch:
+            relay.run(once=True)
+
+        self.assertEqual(relay_batch.call_count, 2)
+        sleep.assert_called_once_with(relay.poll_interval)
+        db_connection.close_if_unusable_or_obsolete.assert_called_once_with()
+
+
+class FakeConnection:
+    """SMTP connection double failing on the scripted messages"""
+    instances = []
+    failures = {}
+
+    def __init__(self):
+        self.progress = 0
+        self.last_used = 0
+        self.sent = []
+        self.closed = False
+        FakeConnection.instances.append(self)
+
+    def open(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def send_messages(self, messages):
+        for message in messages:
+            error = self.failures.pop(message, None)
+            if error:
+                raise error
+            self.sent.append(message)
+            self.progress += 1
+        return len(messages)
+
+
+@override_settings(EMAIL_BACKEND=SMTP_BACKEND)
+class MailPoolTest(TestCase):
+    """Pooled SMTP delivery test class
+
+    Arguments:
+        TestCase {TestCase} -- django TestCase class
+    """
+    def setUp(self):
+        FakeConnection.instances = []
+        FakeConnection.failures = {}
+        patcher = patch('bookings.mail.PooledConnection', FakeConnection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = MailPool(size=1, batch_size=3, idle_timeout=60, retries=1)
+
+    def test_send_reuses_connection_in_batches(self):
+        self.assertEqual(self.pool.send(range(7)), 7)
+        self.assertEqual(self.pool.send(range(7, 9)), 2)
+
+        self.assertEqual(len(FakeConnection.instances), 1)
+        self.assertEqual(FakeConnection.instances[0].sent, list(range(9)))
+        stats = self.pool.stats()
+        self.assertEqual((stats['sent'], stats['batches'], stats['connections']), (9, 4, 1))
+
+    def test_send_reconnects_and_resends_remainder(self):
+        FakeConnection.failures = {4: smtplib.SMTPServerDisconnected('gone')}
+
+        self.assertEqual(self.pool.send(range(6)), 6)
+
+        first, second = FakeConnection.instances
+        self.assertTrue(first.closed)
+        self.assertEqual(first.sent + second.sent, list(range(6)))
+        self.assertEqual(self.pool.stats()['reconnects'], 1)
+
+    def test_send_skips_rejected_message(self):
+        FakeConnection.failures = {
+            1: smtplib.SMTPRecipientsRefused({'to@example.com': (550, b'No such user')})}
+
+        self.assertEqual(self.pool.send(range(3)), 2)
+
+        self.assertEqual(FakeConnection.instances[0].sent, [0, 2])
+        self.assertEqual(self.pool.stats()['failed'], 1)
+
+    def test_send_retries_temporary_refusal_on_new_connection(self):
+        FakeConnection.failures = {1: smtplib.SMTPDataError(451, b'Try again later')}
+
+        self.assertEqual(self.pool.send(range(3)), 3)
+
+        first, second = FakeConnection.instances
+        self.assertTrue(first.closed)
+        self.assertEqual(second.sent, [1, 2])
+        self.assertEqual(self.pool.stats()['failed'], 0)
+
+    def test_send_gives_up_after_retries(self):
+        FakeConnection.failures = {
+            1: smtplib.SMTPServerDisconnected('gone'), 2: ConnectionResetError()}
+
+        with self.assertRaises(ConnectionResetError):
+            self.pool.send(range(3))
+
+        stats = self.pool.stats()
+        self.assertEqual((stats['sent'], stats['failed']), (2, 1))
+        self.assertTrue(self.pool.idle.empty())
+
+    @override_settings(MAIL_STATS_INTERVAL=0)
+    def test_counters_of_every_pool_are_totalled_in_the_cache(self):
+        cache.clear()
+        other = MailPool(size=1, batch_size=3)
+
+        self.pool.send(range(4))
+        other.send(range(2))
+
+        stats = self.pool.shared_stats()
+        self.assertEqual((stats['sent'], stats['batches'], stats['connections']), (6, 3, 2))
+        with self.assertLogs('bookings.tasks', 'INFO') as logs:
+            report_mail_stats()
+        self.assertIn('Mail: 6 sent, 0 failed in 3 batches', logs.output[0])
+
+    def test_counters_are_published_once_per_interval(self):
+        cache.clear()
+        self.pool.send(range(2))
+
+        self.assertEqual(self.pool.shared_stats()['sent'], 0)
+        self.pool.publish()
+        self.assertEqual(self.pool.shared_stats()['sent'], 2)
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+    def test_send_uses_configured_backend(self):
+        message = mail.EmailMessage('Subject', 'Body', 'from@example.com', ['to@example.com'])
+
+        self.assertEqual(self.pool.send([message]), 1)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(FakeConnection.instances)
+
+
+class SendRateLimiterTest(TestCase):
+    """Outbound email rate limiter test class
+
+    Arguments:
+        TestCase {TestCase} -- django TestCase class
+    """
+    def setUp(self):
+        cache.clear()
+        self.notice = {
+            'ticket_number': 'EF343F',
+            'email': 'user@example.com',
+            'first_name': 'John',
+            'last_name': 'West',
+            'destination': 'Dubai',
+            'departure_datetime': '2019-04-12T09:05:00Z',
+        }
+
+    def acquire(self, limiter, count, now):
+        with patch('bookings.mail.time.time', return_value=now):
+            return [limiter.acquire() for _ in range(count)]
+
+    def test_burst_then_rate(self):
+        waits = self.acquire(SendRateLimiter(rate=10, burst=5, key='test'), 7, 1000.0)
+
+        self.assertEqual(waits[:5], [0] * 5)
+        self.assertAlmostEqual(waits[5], 0.1)
+        self.assertAlmostEqual(waits[6], 0.2)
+
+    def test_idle_bucket_holds_at_most_burst(self):
+        limiter = SendRateLimiter(rate=10, burst=5, key='test')
+        self.acquire(limiter, 5, 1000.0)
+
+        waits = self.acquire(limiter, 6, 2000.0)
+
+        self.assertEqual(waits[:5], [0] * 5)
+        self.assertAlmostEqual(waits[5], 0.1)
+
+    def test_limiters_share_the_bucket(self):
+        limiters = [SendRateLimiter(rate=10, burst=2, key='test') for _ in range(2)]
+        waits = [wait for limiter in limiters for wait in self.acquire(limiter, 2, 1000.0)]
+
+        self.assertEqual(waits[:2], [0, 0])
+        self.assertAlmostEqual(waits[2], 0.1)
+        self.assertAlmostEqual(waits[3], 0.2)
+
+    def test_zero_rate_disables_the_limit(self):
+        waits = self.acquire(SendRateLimiter(rate=0, burst=1, key='test'), 100, 1000.0)
+
+        self.assertEqual(set(waits), {0})
+
+    @override_settings(EMAIL_BACKEND=SMTP_BACKEND)
+    def test_task_over_the_rate_is_deferred(self):
+        with patch('bookings.mail.send_rate', SendRateLimiter(rate=1, burst=1, key='test')), \
+             patch('bookings.tasks.mail_pool') as pool, \
+             patch.object(email_cancellations, 'apply_async') as apply_async:
+            email_cancellations([self.notice])
+            email_cancellations([self.notice])
+
+            self.assertEqual(pool.send.call_count, 1)
+            kwargs = apply_async.call_args[1]
+            self.assertEqual(kwargs['args'], [[self.notice]])
+            self.assertAlmostEqual(kwargs['countdown'], 1, places=1)
+
+            email_cancellations([self.notice], **kwargs['kwargs'])
+
+        self.assertEqual(pool.send.call_count, 2)
+        self.assertEqual(apply_async.call_count, 1)
+
+    @override_settings(EMAIL_BACKEND=SMTP_BACKEND)
+    def test_task_over_the_burst_is_split(self):
+        notices = [dict(self.notice, ticket_number=f'TK000{index}') for index in range(5)]
+        with patch('bookings.mail.send_rate', SendRateLimiter(rate=1, burst=2, key='test')), \
+             patch('bookings.mail.time.time', return_value=1000.0), \
+             patch('bookings.tasks.mail_pool') as pool, \
+             patch.object(email_cancellations, 'apply_async') as apply_async:
+            email_cancellations(notices)
+
+        pool.send.assert_not_called()
+        calls = [call[1] for call in apply_async.call_args_list]
+        self.assertEqual([kwargs['args'] for kwargs in calls],
+                         [[notices[:2]], [notices[2:4]], [notices[4:]]])
+        self.assertEqual([round(kwargs['countdown']) for kwargs in calls], [0, 2, 3])
@@ -0,0 +1,100 @@
+import os
+import string
+import threading
+from hashlib import blake2b, sha256
+
+from django.conf import settings
+from django.db import connection
+
+TICKET_BLOCK_SEQUENCE = 'bookings_ticket_block_seq'
+
+
+class TicketNumbersExhausted(Exception):
+    """Raised when every ticket number has been handed out"""
+
+
+class TicketNumberAllocator:
+    """Mint unique 6 character ticket numbers without querying the bookings
+
+    Ticket numbers are the positions 0, 1, 2, ... of a keyed pseudo-random
+    permutation of the 36 ** 6 codes over digits and upper case letters. The
+    permutation is a 4 round Feistel network over 32 bits, cycle-walked back
+    into the code space, so it is a bijection and two positions can never
+    give the same code.
+
+    Positions are handed to each process in blocks reserved with one
+    ``nextval`` on a PostgreSQL sequence, so a booking only reaches the
+    database for a new block. Codes made only of hex characters are skipped
+    because they may already be taken by tickets issued before the allocator.
+
+    TICKET_NUMBER_KEY must never change once tickets have been issued.
+
+    Keyword Arguments:
+        block_size {int} -- positions reserved per sequence call
+        key {str} -- permutation key, defaults to settings.TICKET_NUMBER_KEY
+    """
+    alphabet = string.digits + string.ascii_uppercase
+    length = 6
+    legacy_characters = frozenset(string.digits + 'ABCDEF')
+    rounds = 4
+
+    def __init__(self, block_size=None, key=None):
+        self.block_size = block_size or settings.TICKET_NUMBER_BLOCK_SIZE
+        self.key = sha256((key or settings.TICKET_NUMBER_KEY).encode('utf-8')).digest()
+        self.space = len(self.alphabet) ** self.length
+        self.lock = threading.Lock()
+        self.pid = None
+        self.next = self.end = 0
+
+    def allocate(self):
+        """Mint the next ticket number
+
+        Returns:
+            str -- ticket number
+        """
+        with self.lock:
+            while True:
+                # A forked worker must not reuse the block of its parent
+                if self.pid != os.getpid() or self.next >= self.end:
+                    self.next, self.end = self.new_block()
+                    self.pid = os.getpid()
+                position = self.next
+                self.next += 1
+                code = self.encode(self.permute(position))
+                if not set(code) <= self.legacy_characters:
+                    return code
+
+    def new_block(self):
+        start = self.reserve_block() * self.block_size
+        if start >= self.space:
+            raise TicketNumbersExhausted('Every ticket number has been issued')
+        return start, min(start + self.block_size, self.space)
+
+    def reserve_block(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nextval(%s)', [TICKET_BLOCK_SEQUENCE])
+            return cursor.fetchone()[0]
+
+    def permute(self, position):
+        value = self.feistel(position)
+        while value >= self.space:
+            value = self.feistel(value)
+        return value
+
+    def feistel(self, value):
+        left, right = value >> 16, value & 0xFFFF
+        for index in range(self.rounds):
+            digest = blake2b(bytes([index]) + right.to_bytes(2, 'big'),
+                             digest_size=2, key=self.key).digest()
+            left, right = right, left ^ int.from_bytes(digest, 'big')
+        return (left << 16) | right
+
+    def encode(self, value):
+        characters = []
+        for _ in range(self.length):
+            value, index = divmod(value, len(self.alphabet))
+            characters.append(self.alphabet[index])
+        return ''.join(reversed(characters))
+
+
+ticket_numbers = TicketNumberAllocator()
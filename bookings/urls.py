@@ -1,8 +1,13 @@
 from django.urls import path
 
-from .views import BookingListView, BookingDetailView
+from .views import (BookingListView, BookingDetailView, BookingStatsView,
+                    FlightBookingStatsView, GroupBookingView)
 
 urlpatterns = [
     path('bookings', BookingListView.as_view(), name='booking_list'),
+    path('bookings/group', GroupBookingView.as_view(), name='booking_group'),
+    path('bookings/stats', BookingStatsView.as_view(), name='booking_stats'),
+    path('bookings/stats/<int:flight_pk>', FlightBookingStatsView.as_view(),
+         name='flight_booking_stats'),
     path('bookings/<int:booking_pk>', BookingDetailView.as_view(), name='booking_detail')
 ]
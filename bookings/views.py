@@ -1,19 +1,33 @@
-from uuid import uuid4
+from datetime import datetime, time, timedelta
 
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Subquery
 from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 
-from api.helpers.validators import validate_resource_exist
+from api.helpers.idempotency import idempotent
+from api.helpers.pagination import InvalidCursor, KeysetPagination
 from api.helpers.utils import StatusChoices
+from flights.models import Flight
+from .cache import invalidate_tickets, ticket_cache_key
 from .models import Booking
-from .serializers import (BookingSerializer,
+from .serializers import (BookingCreateSerializer,
+                          GroupBookingSerializer,
+                          ReservationRequestSerializer,
                           TicketSerializer,
                           TicketStatusSerializer,
                           TicketReservationSerializer,
-                          BookingReservationsSerializer)
-from .tasks import email_ticket, email_reservation
+                          BookingReservationsSerializer,
+                          BookingStatsSerializer)
+from .stats import get_flight_stats
+from .tasks import email_ticket, email_tickets, email_reservation
+from .tickets import TicketNumbersExhausted, ticket_numbers
+from . import outbox
 
 
 class BookingListView(APIView):
@@ -22,16 +36,34 @@ class BookingListView(APIView):
     Arguments:
         APIView {view} -- rest_framework API view
     """
+    @idempotent
     def post(self, request, format=None):
-        booking = request.data
-        booking['passenger_id'] = request.user.id
-        booking['ticket_number'] = generate_ticket_number()
-        serializer = BookingSerializer(data=booking)
+        serializer = BookingCreateSerializer(data=request.data)
 
         if serializer.is_valid():
-            new_booking = serializer.save()
-            ticket = TicketSerializer(new_booking)
-            email_ticket.delay(ticket.data)
+            try:
+                with transaction.atomic():
+                    if not Flight.objects.take_seat(serializer.validated_data['flight_id'].pk):
+                        return Response({
+                            'status': 'Error',
+                            'message': 'Flight fully booked'
+                        },
+                        status=status.HTTP_409_CONFLICT)
+                    new_booking = serializer.save(passenger_id=request.user,
+                                                  ticket_number=generate_ticket_number())
+                    ticket = TicketSerializer(new_booking)
+                    outbox.enqueue(email_ticket, ticket.data)
+            except IntegrityError:
+                # The unique index on flight and passenger stands in for a
+                # duplicate check ahead of the insert
+                return Response({
+                    'status': 'Error',
+                    'message': 'Could not book the flight',
+                    'error': {'non_field_errors': ['Ticket already booked']}
+                },
+                status=status.HTTP_400_BAD_REQUEST)
+            except TicketNumbersExhausted:
+                return tickets_exhausted_response()
 
             return Response({
                 'status': 'Success',
@@ -46,20 +78,25 @@ class BookingListView(APIView):
         },
         status=status.HTTP_400_BAD_REQUEST)
 
+    pagination_keys = (KeysetPagination.cursor_query_param,
+                       KeysetPagination.page_size_query_param)
+
     def get(self, request, format=None):
         params = request.query_params.copy()
         if params:
             # Check that the query params contain only supported keys
             keys = [key for key in params.keys()]
             invalid_keys = list(
-                filter(lambda key: key not in ('ticket', 'flight', 'date', 'status'), keys))
+                filter(lambda key: key not in ('ticket', 'flight', 'date', 'status',
+                                               *self.pagination_keys), keys))
             if invalid_keys:
                 return Response({
                     'status': 'Error',
                     'message': f'Invalid query params - {", ".join(invalid_keys)}'
                 },
                 status=status.HTTP_400_BAD_REQUEST)
-            if not 'ticket' in keys and len(keys) == 3:
+            manifest_keys = [key for key in keys if key not in self.pagination_keys]
+            if not 'ticket' in keys and len(manifest_keys) == 3:
                 # Handle search for bookings based on flight
                 # date and status of the flight bookings
                 params['status'] = params['status'].title()
@@ -72,29 +109,8 @@ class BookingListView(APIView):
                     },
                     status=status.HTTP_400_BAD_REQUEST)
 
-                flight_id = params.get('flight')
-                flight_status = StatusChoices(params.get('status').title()).name
-                date = params.get('date')
-                # Handle booked or reserved date based on status passed
-                date_condition = {}
-                if flight_status == 'R':
-                    date_condition['reserved_at__date__lte'] = date
-                elif flight_status == 'B':
-                    date_condition['created_at__date__lte'] = date
-                bookings = Booking.objects.filter(flight_id=flight_id,
-                                                  flight_status=flight_status,
-                                                  **date_condition)
-                serializer = BookingReservationsSerializer(bookings, many=True)
-
-                return Response({
-                    'status': 'Success',
-                    'message': 'Flight retrieved',
-                    'data': {
-                        'count': bookings.count(),
-                        'reservations': serializer.data
-                    }
-                },
-                status=status.HTTP_200_OK)
+                return self.list_reservations(request, params.get('flight'),
+                                              reservations.validated_data)
             elif 'ticket' in keys and len(keys) == 1:
                 # Handle checking of user flight status
                 # Users can check the status of any flight booking
@@ -108,21 +124,27 @@ class BookingListView(APIView):
                     },
                     status=status.HTTP_400_BAD_REQUEST)
 
-                try:
-                    booking = Booking.objects.get(ticket_number=ticket.data['ticket_number'])
-                except Booking.DoesNotExist:
-                    return Response({
-                        'status': 'Error',
-                        'message': 'Ticket not found'
-                    },
-                    status=status.HTTP_404_NOT_FOUND)
+                ticket_number = ticket.validated_data['ticket_number']
+                cache_key = ticket_cache_key(ticket_number)
+                data = cache.get(cache_key)
+                if data is None:
+                    try:
+                        booking = Booking.objects.select_related(
+                            'flight_id', 'passenger_id').get(ticket_number=ticket_number)
+                    except Booking.DoesNotExist:
+                        return Response({
+                            'status': 'Error',
+                            'message': 'Ticket not found'
+                        },
+                        status=status.HTTP_404_NOT_FOUND)
 
-                serializer = TicketSerializer(booking)
+                    data = TicketSerializer(booking).data
+                    cache.set(cache_key, data, settings.TICKET_CACHE_TIMEOUT)
 
                 return Response({
                     'status': 'Success',
                     'message': 'Booking retrieved',
-                    'data': serializer.data
+                    'data': data
                 },
                 status=status.HTTP_200_OK)
             else:
@@ -139,6 +161,146 @@ class BookingListView(APIView):
             },
             status=status.HTTP_400_BAD_REQUEST)
 
+    def list_reservations(self, request, flight_id, filters):
+        """List one page of the bookings of a flight in a status up to a date
+
+        The page and the count of every matching booking are read in one
+        query, the count as a scalar subquery, both served by the
+        ``(flight_id, flight_status, date, id)`` indexes.
+
+        Arguments:
+            request {Request} -- list request
+            flight_id {str} -- id of the flight
+            filters {dict} -- validated date and status
+
+        Returns:
+            Response -- page of reservations
+        """
+        flight_status = StatusChoices(filters['status']).name
+        # Booked or reserved date based on the status passed. The date is
+        # compared as a datetime range so the index can be used.
+        date_field = 'reserved_at' if flight_status == StatusChoices.R.name else 'created_at'
+        end = timezone.make_aware(datetime.combine(filters['date'] + timedelta(days=1),
+                                                   time.min))
+        date_condition = {}
+        if flight_status in (StatusChoices.R.name, StatusChoices.B.name):
+            date_condition[f'{date_field}__lt'] = end
+        bookings = Booking.objects.filter(flight_id=flight_id,
+                                          flight_status=flight_status,
+                                          **date_condition)
+        total = bookings.order_by().values('flight_id').annotate(
+            total=Count('id')).values('total')
+        bookings = bookings.annotate(total=Subquery(total))
+
+        paginator = KeysetPagination((date_field, 'id'),
+                                     settings.BOOKING_RESERVATIONS_PAGE_SIZE,
+                                     settings.BOOKING_RESERVATIONS_MAX_PAGE_SIZE)
+        try:
+            page = paginator.paginate_queryset(bookings, request)
+        except InvalidCursor as error:
+            return Response({
+                'status': 'Error',
+                'message': str(error)
+            },
+            status=status.HTTP_400_BAD_REQUEST)
+        if page:
+            count = page[0].total
+        elif request.query_params.get(paginator.cursor_query_param):
+            # Past the last page there is no row to read the count from
+            count = bookings.count()
+        else:
+            count = 0
+        serializer = BookingReservationsSerializer(page, many=True)
+
+        return Response({
+            'status': 'Success',
+            'message': 'Flight retrieved',
+            'data': {
+                'count': count,
+                'reservations': serializer.data,
+                'pagination': paginator.get_pagination_data()
+            }
+        },
+        status=status.HTTP_200_OK)
+
+
+class GroupBookingView(APIView):
+    """Group booking view
+
+    Books one seat on each of several flights, e.g. the legs of an
+    itinerary, in a single transaction. Either every flight is booked or
+    none is.
+
+    Arguments:
+        APIView {view} -- rest_framework API view
+    """
+    def post(self, request, format=None):
+        serializer = GroupBookingSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'status': 'Error',
+                'message': 'Could not book the flights',
+                'error': serializer.errors
+            },
+            status=status.HTTP_400_BAD_REQUEST)
+
+        flight_ids = serializer.validated_data['flight_ids']
+        flights = Flight.objects.in_bulk(flight_ids)
+        missing = [flight_id for flight_id in flight_ids if flight_id not in flights]
+        if missing:
+            return Response({
+                'status': 'Error',
+                'message': 'Could not book the flights',
+                'error': {
+                    'flight_ids': [f'Flight with the id "{flight_id}" does not exist'
+                                   for flight_id in missing]
+                }
+            },
+            status=status.HTTP_400_BAD_REQUEST)
+
+        booked = (Booking.objects.filter(passenger_id=request.user, flight_id__in=flight_ids)
+                  .exclude(flight_status=StatusChoices.C.name))
+        if booked.exists():
+            return Response({
+                'status': 'Error',
+                'message': 'Ticket already booked'
+            },
+            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            bookings = [Booking(ticket_number=generate_ticket_number(),
+                                flight_id=flights[flight_id],
+                                passenger_id=request.user)
+                        for flight_id in flight_ids]
+        except TicketNumbersExhausted:
+            return tickets_exhausted_response()
+        try:
+            with transaction.atomic():
+                if Flight.objects.take_seats(flight_ids) != len(flight_ids):
+                    transaction.set_rollback(True)
+                    return Response({
+                        'status': 'Error',
+                        'message': 'Flight fully booked'
+                    },
+                    status=status.HTTP_409_CONFLICT)
+                Booking.objects.bulk_create(bookings)
+                tickets = TicketSerializer(bookings, many=True)
+                outbox.enqueue(email_tickets, tickets.data)
+        except IntegrityError:
+            # A concurrent request booked one of the flights after the check above
+            return Response({
+                'status': 'Error',
+                'message': 'Ticket already booked'
+            },
+            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'status': 'Success',
+            'message': 'Tickets booked',
+            'data': tickets.data
+        },
+        status=status.HTTP_201_CREATED)
+
 
 class BookingDetailView(APIView):
     """Booking detail view
@@ -146,40 +308,79 @@ class BookingDetailView(APIView):
     Arguments:
         APIView {view} -- rest_framework API view
     """
-    @validate_resource_exist(Booking, 'booking')
-    def put(self, request, booking_pk, format=None, **kwargs):
-        instance = kwargs['booking']
+    @idempotent
+    def put(self, request, booking_pk, format=None):
+        reservation = ReservationRequestSerializer(data=request.data)
+        if reservation.is_valid():
+            # The conditional UPDATE is the status and amount check, so two
+            # concurrent requests cannot both reserve the booking
+            amount_paid = reservation.validated_data['amount_paid']
+            with transaction.atomic():
+                reserved = Booking.objects.filter(
+                    pk=booking_pk,
+                    passenger_id=request.user,
+                    flight_status=StatusChoices.B.name,
+                    flight_id__in=Flight.objects.filter(flight_cost=amount_paid).values('pk')
+                ).update(flight_status=StatusChoices.R.name,
+                         amount_paid=amount_paid,
+                         reserved_at=timezone.now())
+                if reserved:
+                    instance = Booking.objects.select_related(
+                        'flight_id', 'passenger_id').get(pk=booking_pk)
+                    ticket = TicketSerializer(instance)
+                    outbox.enqueue(email_reservation, ticket.data)
+            if reserved:
+                invalidate_tickets([instance.ticket_number])
+                return Response({
+                    'status': 'Success',
+                    'message': 'Flight reserved',
+                    'data': ticket.data
+                },
+                status=status.HTTP_200_OK)
+
+        return self.reservation_error(request, booking_pk)
 
-        if instance.passenger_id != request.user:
+    def reservation_error(self, request, booking_pk):
+        """Work out why a booking could not be reserved
+
+        Arguments:
+            request {Request} -- reservation request
+            booking_pk {int} -- id of the booking
+
+        Returns:
+            Response -- error response
+        """
+        instance = Booking.objects.select_related('flight_id').filter(pk=booking_pk).first()
+        if instance is None:
+            return Response({
+                'status': 'Error',
+                'message': 'Booking not found'
+            },
+            status=status.HTTP_404_NOT_FOUND)
+
+        if instance.passenger_id_id != request.user.pk:
             return Response({
                 'status': 'Error',
                 'message': 'You have not booked this flight'
             },
             status=status.HTTP_400_BAD_REQUEST)
 
-        if instance.flight_status == 'R':
+        if instance.flight_status == StatusChoices.C.name:
             return Response({
                 'status': 'Error',
-                'message': 'Flight already reserved'
+                'message': 'Booking cancelled'
             },
             status=status.HTTP_409_CONFLICT)
 
-        request.data['flight_status'] = 'R'
-        request.data['reserved_at'] = timezone.now()
-        serializer = TicketReservationSerializer(instance, data=request.data)
-
-        if serializer.is_valid():
-            instance = serializer.save()
-            ticket = TicketSerializer(instance)
-            email_reservation.delay(ticket.data)
-
+        if instance.flight_status == StatusChoices.R.name:
             return Response({
-                'status': 'Success',
-                'message': 'Flight reserved',
-                'data': ticket.data
+                'status': 'Error',
+                'message': 'Flight already reserved'
             },
-            status=status.HTTP_200_OK)
+            status=status.HTTP_409_CONFLICT)
 
+        serializer = TicketReservationSerializer(instance, data=request.data)
+        serializer.is_valid()
         return Response({
             'status': 'Error',
             'message': 'Flight not reserved',
@@ -187,9 +388,87 @@ class BookingDetailView(APIView):
         },
         status=status.HTTP_400_BAD_REQUEST)
 
+
+class BookingStatsView(APIView):
+    """Booking stats view
+
+    Booking counts per status, revenue and reservation rate of one or
+    more flights, e.g. ``?flight=1&flight=2``
+
+    Arguments:
+        APIView {view} -- rest_framework API view
+    """
+    permission_classes = (IsAuthenticated, IsAdminUser)
+
+    def get(self, request, format=None):
+        serializer = BookingStatsSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response({
+                'status': 'Error',
+                'message': 'Provide valid query parameters',
+                'error': serializer.errors
+            },
+            status=status.HTTP_400_BAD_REQUEST)
+
+        flight_ids = serializer.validated_data['flight']
+        stats = get_flight_stats(flight_ids)
+        missing = [flight_id for flight_id in flight_ids if flight_id not in stats]
+        if missing:
+            return Response({
+                'status': 'Error',
+                'message': 'Provide valid query parameters',
+                'error': {
+                    'flight': [f'Flight with the id "{flight_id}" does not exist'
+                               for flight_id in missing]
+                }
+            },
+            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'status': 'Success',
+            'message': 'Booking stats retrieved',
+            'data': [stats[flight_id] for flight_id in flight_ids]
+        },
+        status=status.HTTP_200_OK)
+
+
+class FlightBookingStatsView(APIView):
+    """Flight booking stats view
+
+    Arguments:
+        APIView {view} -- rest_framework API view
+    """
+    permission_classes = (IsAuthenticated, IsAdminUser)
+
+    def get(self, request, flight_pk, format=None):
+        stats = get_flight_stats([flight_pk]).get(flight_pk)
+        if stats is None:
+            return Response({
+                'status': 'Error',
+                'message': 'Flight not found'
+            },
+            status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            'status': 'Success',
+            'message': 'Booking stats retrieved',
+            'data': stats
+        },
+        status=status.HTTP_200_OK)
+
+
 def generate_ticket_number():
-    while True:
-        unique_str = str(uuid4())[:6].upper()
-        if not Booking.objects.filter(ticket_number=unique_str).exists():
-            break
-    return unique_str
+    return ticket_numbers.allocate()
+
+
+def tickets_exhausted_response():
+    """Error response for a booking made once every ticket number is used
+
+    Returns:
+        Response -- 503 error response
+    """
+    return Response({
+        'status': 'Error',
+        'message': 'No ticket numbers are left, bookings are unavailable'
+    },
+    status=status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -0,0 +1,185 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Value, When
+from django.utils import timezone
+from djmoney.models.fields import MoneyField
+from djmoney.money import Money
+
+from .cache import bump_catalog_version, bump_route_versions
+from .models import Flight
+from .serializers import FlightSerializer
+
+CURRENCY_FIELD = 'flight_cost_currency'
+READ_ONLY_FIELDS = ('id', 'created_by', 'created_at', 'updated_at', 'seats_taken')
+
+
+class FlightBatch:
+    """Apply partial updates and deletes to many flights in one transaction
+
+    The flights are looked up with a single query per chunk, every distinct
+    change set is validated once with FlightSerializer, and the accepted
+    changes are written with one ``UPDATE ... SET field = CASE id ... END
+    WHERE id IN (...)`` per chunk, so a large schedule change costs a handful
+    of statements instead of one round trip per flight.
+
+    Keyword Arguments:
+        batch_size {int} -- flights looked up and written per statement
+    """
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or settings.FLIGHT_BATCH_SIZE
+        self.validated = {}
+        self.errors = {}
+
+    def run(self, updates=(), deletes=()):
+        """Apply the updates and deletes
+
+        Keyword Arguments:
+            updates {list} -- dicts holding a flight id and the changes for it
+            deletes {list} -- ids of the flights to delete
+
+        Returns:
+            dict -- number of updated, deleted and failed flights and per-id results
+        """
+        results, routes, changed = {}, set(), set()
+        with transaction.atomic():
+            accepted = {}
+            for chunk in self.chunks(updates):
+                current = self.get_current(update['id'] for update in chunk)
+                for update in chunk:
+                    flight_id = update['id']
+                    changes = {key: value for key, value in update.items() if key != 'id'}
+                    error = self.check(current.get(flight_id), changes)
+                    if error is None:
+                        validated = self.validated[self.changes_key(changes)]
+                        accepted[flight_id] = validated
+                        results[flight_id] = {'id': flight_id, 'status': 'updated'}
+                        route = self.get_route(current[flight_id])
+                        routes.update((route, self.get_route(validated, route)))
+                    else:
+                        results[flight_id] = {'id': flight_id, **error}
+            self.update(accepted)
+            changed.update(accepted)
+
+            for chunk in self.chunks(deletes):
+                existing = set()
+                for flight in Flight.objects.filter(id__in=chunk).values(
+                        'id', 'departing_airport', 'destination_airport'):
+                    existing.add(flight['id'])
+                    routes.add(self.get_route(flight))
+                Flight.objects.filter(id__in=existing).delete()
+                changed.update(existing)
+                for flight_id in chunk:
+                    results[flight_id] = {
+                        'id': flight_id,
+                        'status': 'deleted' if flight_id in existing else 'not_found'
+                    }
+
+        counts = {'updated': 0, 'deleted': 0}
+        for result in results.values():
+            if result['status'] in counts:
+                counts[result['status']] += 1
+        if counts['updated'] or counts['deleted']:
+            bump_catalog_version(changed)
+            bump_route_versions(routes)
+
+        return {
+            **counts,
+            'failed': len(results) - counts['updated'] - counts['deleted'],
+            'results': list(results.values())
+        }
+
+    def chunks(self, items):
+        items = list(items)
+        for start in range(0, len(items), self.batch_size):
+            yield items[start:start + self.batch_size]
+
+    def get_current(self, ids):
+        flights = Flight.objects.filter(id__in=list(ids)).values(
+            'id', 'departing_airport', 'destination_airport', 'departure_datetime',
+            'arrival_datetime', 'seats_taken')
+        return {flight['id']: flight for flight in flights}
+
+    def get_route(self, flight, default=(None, None)):
+        return (flight.get('departing_airport', default[0]),
+                flight.get('destination_airport', default[1]))
+
+    def changes_key(self, changes):
+        return repr(sorted(changes.items()))
+
+    def check(self, current, changes):
+        """Validate the changes for one flight
+
+        Arguments:
+            current {dict} -- current schedule and seats taken, None if not found
+            changes {dict} -- requested changes
+
+        Returns:
+            dict -- status and error of a rejected change, None if accepted
+        """
+        if current is None:
+            return {'status': 'not_found'}
+        read_only = [field for field in READ_ONLY_FIELDS if field in changes]
+        if read_only:
+            return {'status': 'invalid',
+                    'error': {field: ['This field cannot be updated.'] for field in read_only}}
+
+        if not changes:
+            return {'status': 'invalid',
+                    'error': {'non_field_errors': ['Provide at least one field to update']}}
+
+        key = self.changes_key(changes)
+        if key not in self.validated:
+            serializer = FlightSerializer(data=changes, partial=True)
+            if serializer.is_valid():
+                self.validated[key] = serializer.validated_data
+            else:
+                self.validated[key] = None
+                self.errors[key] = serializer.errors
+        validated = self.validated[key]
+        if validated is None:
+            return {'status': 'invalid', 'error': self.errors[key]}
+
+        departure = validated.get('departure_datetime', current['departure_datetime'])
+        arrival = validated.get('arrival_datetime', current['arrival_datetime'])
+        if departure > arrival:
+            return {'status': 'invalid', 'error': {'non_field_errors': [
+                'Arrival_datetime must occur after departure_datetime']}}
+        if validated.get('capacity', current['seats_taken']) < current['seats_taken']:
+            return {'status': 'invalid', 'error': {'non_field_errors': [
+                'Capacity cannot be less than the seats already taken']}}
+        return None
+
+    def update(self, accepted):
+        now = timezone.now()
+        for chunk in self.chunks(accepted.items()):
+            columns = {}
+            for flight_id, validated in chunk:
+                for name, value in self.column_values(validated).items():
+                    columns.setdefault(name, []).append((flight_id, value))
+
+            ids = [flight_id for flight_id, _ in chunk]
+            assignments = {}
+            for name, values in columns.items():
+                distinct = {repr(value) for _, value in values}
+                if len(values) == len(ids) and len(distinct) == 1:
+                    # Every flight in the chunk gets the same value
+                    assignments[name] = values[0][1]
+                    continue
+                field = Flight._meta.get_field(name)
+                if isinstance(field, MoneyField):
+                    field = DecimalField(max_digits=field.max_digits,
+                                         decimal_places=field.decimal_places)
+                assignments[name] = Case(
+                    *[When(id=flight_id, then=Value(value)) for flight_id, value in values],
+                    default=F(name),
+                    output_field=field)
+            Flight.objects.filter(id__in=ids).update(updated_at=now, **assignments)
+
+    def column_values(self, validated):
+        values = {}
+        for name, value in validated.items():
+            if isinstance(value, Money):
+                values[CURRENCY_FIELD] = str(value.currency)
+                value = value.amount
+            values[name] = value
+        return values
@@ -0,0 +1,139 @@
+import time
+from hashlib import md5
+
+from django.core.cache import cache
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+CATALOG_VERSION_KEY = 'flights:catalog_version'
+CATALOG_CHANGES_KEY = 'flights:catalog_changes'
+# The itinerary graph is rebuilt at least daily, so older changes are never read
+CATALOG_CHANGES_TIMEOUT = 60 * 60 * 24
+
+
+def new_version():
+    # Start from the clock so a version lost to eviction is never reissued
+    return int(time.time() * 1000)
+
+
+def get_version(key):
+    """Get the version stored under key, starting a new one if it is missing
+
+    Arguments:
+        key {str} -- cache key of the version
+
+    Returns:
+        int -- version
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Move the version stored under key so keys built from it change
+
+    Returns:
+        int -- new version, None when the version was missing and restarted
+    """
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, new_version(), None)
+
+
+def get_catalog_version():
+    """Get the current version of the flight catalog
+
+    Returns:
+        int -- catalog version
+    """
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version(changed_ids=None):
+    """Invalidate every cached flight payload by moving to a new catalog version
+
+    The ids of the flights created, updated or deleted by the write are
+    recorded against the new version, so the itinerary graph can sync
+    just those flights.
+
+    Keyword Arguments:
+        changed_ids {iterable} -- ids of the flights written, None if unknown (default: {None})
+    """
+    version = bump_version(CATALOG_VERSION_KEY)
+    if version is not None and changed_ids is not None:
+        cache.set(f'{CATALOG_CHANGES_KEY}:{version}', sorted(set(changed_ids)),
+                  CATALOG_CHANGES_TIMEOUT)
+
+
+def get_catalog_changes(since, version):
+    """Get the ids of the flights written after version since up to version
+
+    Arguments:
+        since {int} -- catalog version already seen
+        version {int} -- current catalog version
+
+    Returns:
+        set -- flight ids, None when a version in between recorded no ids
+    """
+    keys = [f'{CATALOG_CHANGES_KEY}:{number}' for number in range(since + 1, version + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return None
+    return set().union(*changes.values())
+
+
+def route_version_key(departing_airport, destination_airport):
+    return f'flights:route_version:{departing_airport}:{destination_airport}'
+
+
+def get_route_version(departing_airport, destination_airport):
+    """Get the current version of the flights on a route
+
+    Returns:
+        int -- route version
+    """
+    return get_version(route_version_key(departing_airport, destination_airport))
+
+
+def bump_route_versions(routes):
+    """Invalidate the cached payloads of every (departing, destination) route given"""
+    for route in set(routes):
+        bump_version(route_version_key(*route))
+
+
+def catalog_cache_key(name, *parts):
+    """Build a cache key bound to the current catalog version
+
+    Arguments:
+        name {str} -- name of the cached resource
+        parts {list} -- values identifying the cached resource
+
+    Returns:
+        str -- cache key
+    """
+    digest = md5(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'flights:{name}:{get_catalog_version()}:{digest}'
+
+
+def make_etag(cache_key):
+    """Strong ETag for the payload cached under cache_key"""
+    return '"%s"' % md5(cache_key.encode('utf-8')).hexdigest()
+
+
+def etag_matches(request, etag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return '*' in etags or etag in etags
+
+
+def not_modified(etag):
+    response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    response['ETag'] = etag
+    return response
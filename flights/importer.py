@@ -0,0 +1,281 @@
+import csv
+import io
+import json
+import re
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache import bump_catalog_version, bump_route_versions
+from .models import Flight
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+TEXT_FIELDS = {
+    'flight_number': 20,
+    'departing': 32,
+    'departing_airport': 3,
+    'destination': 32,
+    'destination_airport': 3,
+}
+DATETIME_FIELDS = ('departure_datetime', 'arrival_datetime')
+CURRENCY_FIELD = 'flight_cost_currency'
+MAX_COST = Decimal(10) ** 17
+# Largest value of the positive integer column
+MAX_CAPACITY = 2147483647
+CURRENCIES = frozenset(code for code, _ in Flight._meta.get_field(CURRENCY_FIELD).choices)
+
+
+class ImportFormatError(Exception):
+    """Raised when an import file cannot be read"""
+
+
+def get_import_format(filename, file_format=None):
+    """Work out the import format from an explicit value or the file extension
+
+    Arguments:
+        filename {str} -- name of the import file
+
+    Keyword Arguments:
+        file_format {str} -- explicit format, csv or jsonl (default: {None})
+
+    Returns:
+        str -- import format
+    """
+    if not file_format and '.' in filename:
+        file_format = filename.rsplit('.', 1)[1]
+    file_format = (file_format or '').lower()
+    if file_format == 'json':
+        file_format = 'jsonl'
+    if file_format not in IMPORT_FORMATS:
+        raise ImportFormatError('Import format must be one of csv, jsonl')
+    return file_format
+
+
+def read_rows(stream, file_format):
+    """Yield (row number, row) for each record of a CSV or JSONL text stream
+
+    A JSONL line that is not a JSON object is yielded as None so it can be
+    reported against its row number.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        if reader.fieldnames is None:
+            return
+        yield from enumerate(reader, 1)
+        return
+
+    number = 0
+    for line in stream:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+class FlightImporter:
+    """Validate and insert flights in batches
+
+    Every batch is parsed field by field and then checked against the
+    FlightSerializer rules (departure at least 24 hours ahead, arrival after
+    departure) in a single pass with one shared threshold. Valid rows are
+    written with PostgreSQL COPY when the database supports it and with
+    bulk_create otherwise, and invalid rows are collected into a report
+    keyed by row number using the same messages as the flight endpoints.
+
+    Arguments:
+        created_by {User} -- admin recorded as the creator of the flights
+
+    Keyword Arguments:
+        batch_size {int} -- rows validated and inserted at a time
+        use_copy {bool} -- force COPY on or off, defaults to PostgreSQL only
+    """
+    def __init__(self, created_by, batch_size=None, use_copy=None):
+        self.created_by = created_by
+        self.batch_size = batch_size or settings.FLIGHT_IMPORT_BATCH_SIZE
+        if use_copy is None:
+            use_copy = connection.vendor == 'postgresql'
+        self.use_copy = use_copy
+
+    def run(self, rows):
+        """Import rows yielded by read_rows
+
+        Arguments:
+            rows {iterable} -- (row number, row) pairs
+
+        Returns:
+            dict -- number of imported and failed rows and the per-row errors
+        """
+        imported, errors, routes, flight_ids = 0, [], set(), []
+        rows = iter(rows)
+        with transaction.atomic():
+            while True:
+                batch = list(islice(rows, self.batch_size))
+                if not batch:
+                    break
+                flights, batch_errors = self.validate_batch(batch)
+                ids = self.insert(flights)
+                if ids is None or flight_ids is None:
+                    flight_ids = None
+                else:
+                    flight_ids.extend(ids)
+                imported += len(flights)
+                routes.update((flight['departing_airport'], flight['destination_airport'])
+                              for flight in flights)
+                errors.extend(batch_errors)
+        if imported:
+            bump_catalog_version(flight_ids)
+            bump_route_versions(routes)
+
+        return {
+            'imported': imported,
+            'failed': len(errors),
+            'errors': errors
+        }
+
+    def validate_batch(self, batch):
+        parsed, errors = [], []
+        for number, row in batch:
+            if row is None:
+                errors.append({'row': number, 'error': {
+                    'non_field_errors': ['Row must be a JSON object']}})
+                continue
+            flight, row_errors = self.parse_row(row)
+            if row_errors:
+                errors.append({'row': number, 'error': row_errors})
+            else:
+                parsed.append((number, flight))
+
+        min_departure = timezone.now() + timedelta(hours=24)
+        flights = []
+        for number, flight in parsed:
+            if flight['departure_datetime'] < min_departure:
+                errors.append({'row': number, 'error': {'departure_datetime': [
+                    'Departure_datetime must be at least 24 hours ahead']}})
+            elif flight['departure_datetime'] > flight['arrival_datetime']:
+                errors.append({'row': number, 'error': {'non_field_errors': [
+                    'Arrival_datetime must occur after departure_datetime']}})
+            else:
+                flights.append(flight)
+        errors.sort(key=lambda error: error['row'])
+        return flights, errors
+
+    def parse_row(self, row):
+        flight, errors = {}, {}
+
+        for field, max_length in TEXT_FIELDS.items():
+            value = str(row.get(field) or '').strip()
+            if not value:
+                errors[field] = ['This field is required.']
+            elif len(value) > max_length:
+                errors[field] = [f'Ensure this field has no more than {max_length} characters.']
+            elif field == 'flight_number' and not Flight.alphanumeric.regex.search(value):
+                errors[field] = [Flight.alphanumeric.message]
+            else:
+                flight[field] = value
+
+        for field in DATETIME_FIELDS:
+            value = row.get(field)
+            try:
+                value = parse_datetime(str(value).strip()) if value else None
+            except ValueError:
+                value = None
+            if value is None:
+                errors[field] = ['Datetime has wrong format.']
+                continue
+            if timezone.is_naive(value):
+                value = timezone.make_aware(value)
+            flight[field] = value
+
+        cost = row.get('flight_cost')
+        cost = '' if cost is None else str(cost).strip()
+        try:
+            cost = Decimal(cost).quantize(Decimal('0.01')) if cost else None
+            if cost is not None and not cost.is_finite():
+                raise InvalidOperation
+        except InvalidOperation:
+            errors['flight_cost'] = ['A valid number is required.']
+        else:
+            if cost is None:
+                errors['flight_cost'] = ['This field is required.']
+            elif abs(cost) >= MAX_COST:
+                errors['flight_cost'] = ['Ensure that there are no more than 19 digits in total.']
+            else:
+                flight['flight_cost'] = cost
+        currency = str(row.get(CURRENCY_FIELD) or 'USD').strip().upper()
+        if currency in CURRENCIES:
+            flight[CURRENCY_FIELD] = currency
+        else:
+            errors[CURRENCY_FIELD] = [f'"{currency}" is not a valid choice.']
+
+        capacity = row.get('capacity')
+        capacity = '' if capacity is None else str(capacity).strip()
+        if not capacity:
+            flight['capacity'] = Flight._meta.get_field('capacity').default
+        elif not re.fullmatch(r'\d+', capacity, re.ASCII):
+            errors['capacity'] = ['A valid integer is required.']
+        elif int(capacity) > MAX_CAPACITY:
+            errors['capacity'] = [f'Ensure this value is less than or equal to {MAX_CAPACITY}.']
+        else:
+            flight['capacity'] = int(capacity)
+
+        return flight, errors
+
+    def insert(self, flights):
+        """Insert the validated flights
+
+        Arguments:
+            flights {list} -- field values of each flight
+
+        Returns:
+            list -- ids of the inserted flights, None if the database does not return them
+        """
+        if not flights:
+            return []
+        now = timezone.now()
+        for flight in flights:
+            flight.update({
+                'created_by_id': self.created_by.pk,
+                'seats_taken': 0,
+                'created_at': now,
+                'updated_at': now,
+            })
+        if self.use_copy:
+            return self.copy(flights)
+        created = Flight.objects.bulk_create([Flight(**flight) for flight in flights],
+                                             batch_size=self.batch_size)
+        ids = [flight.pk for flight in created]
+        return None if None in ids else ids
+
+    def copy(self, flights):
+        with connection.cursor() as cursor:
+            # COPY cannot return the ids, so they are taken from the sequence first
+            cursor.execute("SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+                           "FROM generate_series(1, %s)", [Flight._meta.db_table, len(flights)])
+            ids = [flight_id for flight_id, in cursor.fetchall()]
+        for flight, flight_id in zip(flights, ids):
+            flight['id'] = flight_id
+
+        fields = list(flights[0])
+        columns = ', '.join(connection.ops.quote_name(Flight._meta.get_field(field).column)
+                            for field in fields)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for flight in flights:
+            writer.writerow(flight[field].isoformat() if hasattr(flight[field], 'isoformat')
+                            else flight[field] for field in fields)
+        buffer.seek(0)
+
+        table = connection.ops.quote_name(Flight._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)',
+                               buffer)
+        return ids
@@ -0,0 +1,218 @@
+import heapq
+import threading
+from bisect import bisect_left, insort
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .cache import get_catalog_changes, get_catalog_version
+from .models import Flight
+
+Leg = namedtuple('Leg', ('id', 'origin', 'destination', 'departure', 'arrival',
+                         'cost', 'currency'))
+LEG_COLUMNS = ('id', 'departing_airport', 'destination_airport', 'departure_datetime',
+               'arrival_datetime', 'flight_cost', 'flight_cost_currency')
+SORT_KEYS = {
+    'duration': lambda legs: (legs[-1].arrival - legs[0].departure, len(legs)),
+    'cost': lambda legs: (sum(leg.cost for leg in legs), len(legs)),
+}
+
+
+class GraphSnapshot:
+    """Flights of the graph at one catalog version
+
+    A snapshot is never changed once published. The sorted lists hold
+    ``(departure timestamp, id, Leg)`` entries, and the legs are indexed by
+    id in shards of ``2 ** shard_bits`` ids. ``copy`` shares every list and
+    shard with the snapshot it was taken from and copies one only the first
+    time a change touches it, so a refresh costs the lists it changes.
+    """
+    shard_bits = 10
+
+    def __init__(self, legs=None, departures=None, routes=None):
+        self.legs = legs if legs is not None else {}
+        self.departures = departures if departures is not None else {}
+        self.routes = routes if routes is not None else {}
+        self.copied = set()
+
+    def copy(self):
+        return GraphSnapshot(dict(self.legs), dict(self.departures), dict(self.routes))
+
+    def keys(self, name, key, container=list):
+        index = getattr(self, name)
+        if (name, key) not in self.copied:
+            index[key] = container(index.get(key, ()))
+            self.copied.add((name, key))
+        return index[key]
+
+    def leg(self, flight_id):
+        return self.legs.get(flight_id >> self.shard_bits, {}).get(flight_id)
+
+    def add(self, leg):
+        self.keys('legs', leg.id >> self.shard_bits, dict)[leg.id] = leg
+        insort(self.keys('departures', leg.origin), (leg.departure, leg.id, leg))
+        insort(self.keys('routes', (leg.origin, leg.destination)),
+               (leg.departure, leg.id, leg))
+
+    def remove(self, flight_id):
+        leg = self.leg(flight_id)
+        if leg is None:
+            return
+        del self.keys('legs', flight_id >> self.shard_bits, dict)[flight_id]
+        for keys in (self.keys('departures', leg.origin),
+                     self.keys('routes', (leg.origin, leg.destination))):
+            index = bisect_left(keys, (leg.departure, leg.id))
+            if index < len(keys) and keys[index][1] == leg.id:
+                del keys[index]
+
+    def window(self, keys, start, end):
+        index = bisect_left(keys, (start, 0))
+        while index < len(keys) and keys[index][0] < end:
+            yield keys[index][2]
+            index += 1
+
+    def connections(self, leg, keys, min_connection, max_connection):
+        return self.window(keys, leg.arrival + min_connection, leg.arrival + max_connection)
+
+    def itineraries(self, origin, destination, start, end, max_stops,
+                    min_connection, max_connection):
+        for first in self.window(self.departures.get(origin, ()), start, end):
+            if first.destination == destination:
+                yield (first,)
+                continue
+            if max_stops < 1 or first.destination == origin:
+                continue
+
+            stop = first.destination
+            for second in self.connections(first, self.routes.get((stop, destination), ()),
+                                           min_connection, max_connection):
+                if second.currency == first.currency:
+                    yield (first, second)
+            if max_stops < 2:
+                continue
+
+            for second in self.connections(first, self.departures.get(stop, ()),
+                                           min_connection, max_connection):
+                if (second.destination in (origin, destination)
+                        or second.currency != first.currency):
+                    continue
+                last_legs = self.routes.get((second.destination, destination), ())
+                for third in self.connections(second, last_legs,
+                                              min_connection, max_connection):
+                    if third.currency == first.currency:
+                        yield (first, second, third)
+
+
+class FlightGraph:
+    """In-memory time-expanded graph of upcoming flights
+
+    Every flight departing after the graph was built is held as a Leg,
+    kept under its ``(departure timestamp, id)`` key in a sorted list per
+    departing airport and per route. A connection search is then a bisect
+    into the lists of the connecting airport, so 1- and 2-stop itineraries
+    are found without joining the flights table to itself.
+
+    The graph follows the flight catalog version. When the version moves,
+    only the flights whose ids the writes recorded with the new versions
+    are re-read: a flight that is gone is dropped, the others re-indexed.
+    The graph is rebuilt from scratch when a version recorded no ids or has
+    expired, after more than ``max_changes`` versions, and once a day to
+    drop departed flights. Every sync publishes a new GraphSnapshot, so
+    searches read a consistent graph without the lock.
+    """
+    rebuild_interval = timedelta(days=1)
+    max_changes = 1000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.version = None
+        self.built_at = None
+        self.snapshot = GraphSnapshot()
+
+    def sync(self):
+        version = get_catalog_version()
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            now = timezone.now()
+            changed = None
+            if (self.built_at is not None and now - self.built_at <= self.rebuild_interval
+                    and 0 < version - self.version <= self.max_changes):
+                changed = get_catalog_changes(self.version, version)
+            if changed is None:
+                self.rebuild(now)
+            else:
+                self.refresh(changed)
+            self.version = version
+
+    def rebuild(self, now):
+        snapshot = GraphSnapshot()
+        flights = Flight.objects.filter(departure_datetime__gte=now).values_list(*LEG_COLUMNS)
+        for row in flights.iterator():
+            leg = self.make_leg(row)
+            entry = (leg.departure, leg.id, leg)
+            snapshot.legs.setdefault(leg.id >> snapshot.shard_bits, {})[leg.id] = leg
+            snapshot.departures.setdefault(leg.origin, []).append(entry)
+            snapshot.routes.setdefault((leg.origin, leg.destination), []).append(entry)
+        for keys in (*snapshot.departures.values(), *snapshot.routes.values()):
+            keys.sort()
+        self.built_at = now
+        self.snapshot = snapshot
+
+    def refresh(self, changed):
+        snapshot = self.snapshot.copy()
+        for flight_id in changed:
+            snapshot.remove(flight_id)
+        # Deleted flights have no row left and stay removed
+        rows = Flight.objects.filter(id__in=changed,
+                                     departure_datetime__gte=self.built_at)
+        for row in rows.values_list(*LEG_COLUMNS).iterator():
+            snapshot.add(self.make_leg(row))
+        self.snapshot = snapshot
+
+    def make_leg(self, row):
+        flight_id, origin, destination, departure, arrival, cost, currency = row
+        return Leg(flight_id, origin, destination, departure.timestamp(),
+                   arrival.timestamp(), cost, currency)
+
+    def search(self, origin, destination, start, end, max_stops=2, min_connection=None,
+               max_connection=None, sort='duration', limit=10):
+        """Find the best itineraries from origin to destination
+
+        Arguments:
+            origin {str} -- departing airport code
+            destination {str} -- destination airport code
+            start {datetime} -- earliest departure of the first flight
+            end {datetime} -- latest departure (exclusive) of the first flight
+
+        Keyword Arguments:
+            max_stops {int} -- number of connections allowed, 0 to 2 (default: {2})
+            min_connection {timedelta} -- shortest connection time
+            max_connection {timedelta} -- longest connection time
+            sort {str} -- rank by 'duration' or summed 'cost' (default: {'duration'})
+            limit {int} -- number of itineraries returned (default: {10})
+
+        Returns:
+            list -- itineraries, each a tuple of Leg
+        """
+        if min_connection is None:
+            min_connection = timedelta(minutes=settings.ITINERARY_MIN_CONNECTION_MINUTES)
+        if max_connection is None:
+            max_connection = timedelta(hours=settings.ITINERARY_MAX_CONNECTION_HOURS)
+        self.sync()
+
+        itineraries = self.snapshot.itineraries(origin, destination, start.timestamp(),
+                                                end.timestamp(), max_stops,
+                                                min_connection.total_seconds(),
+                                                max_connection.total_seconds())
+        return heapq.nsmallest(limit, itineraries, key=SORT_KEYS[sort])
+
+
+itinerary_graph = FlightGraph()
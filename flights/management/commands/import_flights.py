@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from flights.importer import FlightImporter, ImportFormatError, get_import_format, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk import flights from a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file of flights')
+        parser.add_argument('--created-by', required=True,
+                            help='email of the admin recorded as the creator')
+        parser.add_argument('--format', choices=('csv', 'jsonl'),
+                            help='file format, defaults to the file extension')
+        parser.add_argument('--batch-size', type=int,
+                            help='rows validated and inserted at a time')
+
+    def handle(self, *args, **options):
+        try:
+            admin = get_user_model().objects.get(email=options['created_by'],
+                                                 is_staff=True)
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No admin with the email {options["created_by"]}')
+
+        try:
+            file_format = get_import_format(options['path'], options['format'])
+            with open(options['path'], newline='', encoding='utf-8') as stream:
+                report = FlightImporter(admin, batch_size=options['batch_size']).run(
+                    read_rows(stream, file_format))
+        except (ImportFormatError, OSError, UnicodeDecodeError) as error:
+            raise CommandError(str(error))
+
+        for error in report['errors']:
+            self.stderr.write(f'Row {error["row"]}: {error["error"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {report["imported"]} flights, {report["failed"]} rows failed'))
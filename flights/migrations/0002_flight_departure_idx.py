@@ -0,0 +1,17 @@
+# Generated by Django 2.1.7 on 2026-10-17 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['departure_datetime', 'id'], name='flight_departure_idx'),
+        ),
+    ]
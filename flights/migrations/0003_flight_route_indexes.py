@@ -0,0 +1,21 @@
+# Generated by Django 2.1.7 on 2026-10-17 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0002_flight_departure_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['departing_airport', 'destination_airport', 'departure_datetime', 'id'], name='flight_route_departure_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['destination_airport', 'departure_datetime', 'id'], name='flight_destination_dep_idx'),
+        ),
+    ]
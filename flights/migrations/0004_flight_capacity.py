@@ -0,0 +1,39 @@
+# Generated by Django 2.1.7 on 2026-10-17 16:30
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_seats_taken(apps, schema_editor):
+    Flight = apps.get_model('flights', 'Flight')
+    Booking = apps.get_model('bookings', 'Booking')
+
+    taken = (Booking.objects.filter(flight_id=OuterRef('pk')).order_by()
+             .values('flight_id').annotate(count=Count('id')).values('count'))
+    Flight.objects.update(seats_taken=Coalesce(
+        Subquery(taken, output_field=models.PositiveIntegerField()), 0))
+    # Never leave an existing flight overbooked
+    Flight.objects.filter(seats_taken__gt=F('capacity')).update(capacity=F('seats_taken'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0003_flight_route_indexes'),
+        ('bookings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flight',
+            name='capacity',
+            field=models.PositiveIntegerField(default=180),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='seats_taken',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_seats_taken, migrations.RunPython.noop),
+    ]
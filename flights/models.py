@@ -1,9 +1,42 @@
 from django.db import models
 from django.conf import settings
 from django.core.validators import RegexValidator
+from django.db.models import F
 from djmoney.models.fields import MoneyField
 
 
+class FlightQuerySet(models.QuerySet):
+    def take_seat(self, flight_id):
+        """Take one seat on a flight if it is not full
+
+        A single conditional UPDATE both checks and increments seats_taken,
+        so concurrent bookings cannot oversell without locking the row first.
+
+        Arguments:
+            flight_id {int} -- id of the flight
+
+        Returns:
+            bool -- True if a seat was taken
+        """
+        return bool(self.filter(pk=flight_id, seats_taken__lt=F('capacity')).update(
+            seats_taken=F('seats_taken') + 1))
+
+    def take_seats(self, flight_ids):
+        """Take one seat on each of the flights if none of them is full
+
+        Must run inside a transaction, which the caller rolls back when the
+        returned count is short of the number of flights.
+
+        Arguments:
+            flight_ids {list} -- ids of the flights
+
+        Returns:
+            int -- number of flights a seat was taken on
+        """
+        return self.filter(pk__in=flight_ids, seats_taken__lt=F('capacity')).update(
+            seats_taken=F('seats_taken') + 1)
+
+
 class Flight(models.Model):
     alphanumeric = RegexValidator(r'^[0-9a-zA-Z]+$', 'Must be only alphanumeric characters')
 
@@ -15,6 +48,20 @@ class Flight(models.Model):
     departing_airport = models.CharField(max_length=3)
     destination = models.CharField(max_length=32)
     destination_airport = models.CharField(max_length=3)
+    capacity = models.PositiveIntegerField(default=180)
+    seats_taken = models.PositiveIntegerField(default=0)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = FlightQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['departure_datetime', 'id'], name='flight_departure_idx'),
+            models.Index(fields=['departing_airport', 'destination_airport',
+                                 'departure_datetime', 'id'],
+                         name='flight_route_departure_idx'),
+            models.Index(fields=['destination_airport', 'departure_datetime', 'id'],
+                         name='flight_destination_dep_idx'),
+        ]
@@ -1,10 +1,20 @@
-from datetime import timedelta
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
 
 from django.utils import timezone
-from rest_framework.serializers import ModelSerializer, CharField, ValidationError
+from django.utils.functional import cached_property
+from rest_framework.relations import PKOnlyObject, RelatedField
+from rest_framework.serializers import (ModelSerializer, Serializer, BooleanField, CharField,
+                                        ChoiceField, DateField, DateTimeField, DictField,
+                                        IntegerField, ListField, RegexField, ValidationError)
 
+from .cache import bump_catalog_version, bump_route_versions
 from .models import Flight
 
+# Letters and digits only, so a code is always safe to put in a cache key
+AIRPORT_CODE = r'^[A-Za-z0-9]{3}$'
+AIRPORT_CODE_ERRORS = {'invalid': 'Airport must be a 3 character code of letters and digits'}
+
 
 class FlightSerializer(ModelSerializer):
     """Flight serializer
@@ -14,7 +24,9 @@ class FlightSerializer(ModelSerializer):
     """
     class Meta:
         model = Flight
-        fields = ('__all__')
+        # seats_taken changes with every booking and is kept out of the
+        # cached flight payloads
+        exclude = ('seats_taken',)
 
     def validate_departure_datetime(self, value):
         """
@@ -28,6 +40,277 @@ class FlightSerializer(ModelSerializer):
         """
         Check that departure_datetime is before arrival_datetime.
         """
-        if data['departure_datetime'] > data['arrival_datetime']:
+        departure = data.get('departure_datetime',
+                             getattr(self.instance, 'departure_datetime', None))
+        arrival = data.get('arrival_datetime', getattr(self.instance, 'arrival_datetime', None))
+        if departure and arrival and departure > arrival:
             raise ValidationError("Arrival_datetime must occur after departure_datetime")
+        capacity = data.get('capacity')
+        if self.instance and capacity is not None and capacity < self.instance.seats_taken:
+            raise ValidationError("Capacity cannot be less than the seats already taken")
+        return data
+
+    def save(self, **kwargs):
+        routes = []
+        if self.instance is not None:
+            routes.append((self.instance.departing_airport, self.instance.destination_airport))
+        instance = super().save(**kwargs)
+        routes.append((instance.departing_airport, instance.destination_airport))
+        bump_catalog_version([instance.id])
+        bump_route_versions(routes)
+        return instance
+
+
+class FlightReadSerializer:
+    """Read-only fast path for FlightSerializer
+
+    Reads flights with values() instead of building model instances and hands
+    each column straight to the matching FlightSerializer field, so the output
+    is identical to FlightSerializer(...).data without the per-field attribute
+    lookups of Serializer.to_representation.
+
+    Keyword Arguments:
+        prefix {str} -- lookup prefix when the flight is read through a
+                        relation, e.g. 'flight_id__' for a booking (default: {''})
+    """
+    def __init__(self, prefix=''):
+        self.prefix = prefix
+
+    @cached_property
+    def fields(self):
+        fields = []
+        for name, field in FlightSerializer().fields.items():
+            if field.write_only:
+                continue
+            fields.append((name, self.prefix + field.source, field,
+                           isinstance(field, RelatedField)))
+        return fields
+
+    @property
+    def columns(self):
+        return [column for _, column, _, _ in self.fields]
+
+    def values(self, queryset):
+        """Restrict queryset to the columns needed for serialization
+
+        Arguments:
+            queryset {QuerySet} -- flights, or rows related to a flight
+
+        Returns:
+            QuerySet -- queryset yielding dicts
+        """
+        return queryset.values(*self.columns)
+
+    def to_representation(self, row):
+        data = OrderedDict()
+        for name, column, field, related in self.fields:
+            value = row[column]
+            if value is None:
+                data[name] = None
+            elif related:
+                data[name] = field.to_representation(PKOnlyObject(pk=value))
+            else:
+                data[name] = field.to_representation(value)
+        return data
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+class FlightSearchSerializer(Serializer):
+    """Flight search serializer
+
+    Validates the route and departure date query params of the flight list
+
+    Arguments:
+        Serializer {serializer} -- rest framework serializer
+    """
+    departing_airport = CharField(required=False, min_length=3, max_length=3)
+    destination_airport = CharField(required=False, min_length=3, max_length=3)
+    departure_date = DateField(required=False)
+    departure_after = DateTimeField(required=False)
+    departure_before = DateTimeField(required=False)
+
+    def validate_departing_airport(self, value):
+        return value.upper()
+
+    def validate_destination_airport(self, value):
+        return value.upper()
+
+    def validate(self, data):
+        """
+        Check that departure_after is before departure_before.
+        """
+        after = data.get('departure_after')
+        before = data.get('departure_before')
+        if after and before and after > before:
+            raise ValidationError("Departure_after must occur before departure_before")
+        return data
+
+    def get_filters(self):
+        """Build the queryset filters for the validated search
+
+        Returns:
+            dict -- keyword arguments for Flight.objects.filter
+        """
+        data = self.validated_data
+        filters = {}
+        for field in ('departing_airport', 'destination_airport'):
+            if field in data:
+                filters[field] = data[field]
+        lower_bounds, upper_bounds = [], []
+        if 'departure_date' in data:
+            start = timezone.make_aware(datetime.combine(data['departure_date'], time.min))
+            lower_bounds.append(start)
+            upper_bounds.append(start + timedelta(days=1))
+        if 'departure_after' in data:
+            lower_bounds.append(data['departure_after'])
+        if 'departure_before' in data:
+            upper_bounds.append(data['departure_before'])
+
+        if lower_bounds:
+            filters['departure_datetime__gte'] = max(lower_bounds)
+        if upper_bounds:
+            filters['departure_datetime__lt'] = min(upper_bounds)
+        return filters
+
+
+class FlightBatchSerializer(Serializer):
+    """Flight batch serializer
+
+    Validates a batch request, which either lists flight ids with their
+    changes and ids to delete, or selects flights with a search filter and
+    applies one set of changes to them or deletes them.
+
+    Arguments:
+        Serializer {serializer} -- rest framework serializer
+    """
+    updates = ListField(child=DictField(), required=False)
+    delete = ListField(child=IntegerField(min_value=1), required=False)
+    filter = DictField(required=False)
+    changes = DictField(required=False)
+    delete_all = BooleanField(required=False, default=False)
+
+    def validate_updates(self, value):
+        ids = []
+        for update in value:
+            if not isinstance(update.get('id'), int):
+                raise ValidationError("Every update must have an integer id")
+            ids.append(update['id'])
+        if len(set(ids)) != len(ids):
+            raise ValidationError("A flight can only be updated once per batch")
+        return value
+
+    def validate_filter(self, value):
+        search = FlightSearchSerializer(data=value)
+        unknown = [key for key in value if key not in search.fields]
+        if unknown:
+            raise ValidationError(f'Invalid filter keys - {", ".join(unknown)}')
+        if not value:
+            raise ValidationError("Filter must not be empty")
+        search.is_valid(raise_exception=True)
+        return search.get_filters()
+
+    def validate(self, data):
+        """
+        Check that exactly one of the id or filter forms is used.
+        """
+        by_id = 'updates' in data or 'delete' in data
+        by_filter = 'filter' in data
+        if by_id == by_filter:
+            raise ValidationError("Provide either updates and delete, or filter")
+        if by_id:
+            if set(data.get('delete', [])) & {update['id'] for update in data.get('updates', [])}:
+                raise ValidationError("A flight cannot be updated and deleted in one batch")
+        elif ('changes' in data) == data['delete_all']:
+            raise ValidationError("Provide either changes or delete_all with filter")
         return data
+
+
+class ItinerarySearchSerializer(Serializer):
+    """Itinerary search serializer
+
+    Validates the query params of the itinerary search
+
+    Arguments:
+        Serializer {serializer} -- rest framework serializer
+    """
+    departing_airport = CharField(min_length=3, max_length=3)
+    destination_airport = CharField(min_length=3, max_length=3)
+    departure_date = DateField()
+    max_stops = IntegerField(required=False, default=2, min_value=0, max_value=2)
+    min_connection = IntegerField(required=False, min_value=0, max_value=24 * 60)
+    sort = ChoiceField(required=False, default='duration', choices=('duration', 'cost'))
+    limit = IntegerField(required=False, default=10, min_value=1, max_value=50)
+
+    def validate_departing_airport(self, value):
+        return value.upper()
+
+    def validate_destination_airport(self, value):
+        return value.upper()
+
+    def validate(self, data):
+        """
+        Check that the departing and destination airports differ.
+        """
+        if data['departing_airport'] == data['destination_airport']:
+            raise ValidationError("Departing_airport must differ from destination_airport")
+        return data
+
+    def get_search(self):
+        """Build the keyword arguments of FlightGraph.search
+
+        Returns:
+            dict -- search arguments
+        """
+        data = self.validated_data
+        start = timezone.make_aware(datetime.combine(data['departure_date'], time.min))
+        search = {
+            'origin': data['departing_airport'],
+            'destination': data['destination_airport'],
+            'start': start,
+            'end': start + timedelta(days=1),
+            'max_stops': data['max_stops'],
+            'sort': data['sort'],
+            'limit': data['limit'],
+        }
+        if 'min_connection' in data:
+            search['min_connection'] = timedelta(minutes=data['min_connection'])
+        return search
+
+
+class FareCalendarSerializer(Serializer):
+    """Fare calendar serializer
+
+    Validates the route and month query params of the fare calendar
+
+    Arguments:
+        Serializer {serializer} -- rest framework serializer
+    """
+    departing_airport = RegexField(AIRPORT_CODE, error_messages=AIRPORT_CODE_ERRORS)
+    destination_airport = RegexField(AIRPORT_CODE, error_messages=AIRPORT_CODE_ERRORS)
+    month = RegexField(r'^\d{4}-(0[1-9]|1[0-2])$',
+                       error_messages={'invalid': 'Month must be in the format YYYY-MM'})
+
+    def validate_departing_airport(self, value):
+        return value.upper()
+
+    def validate_destination_airport(self, value):
+        return value.upper()
+
+    def get_filters(self):
+        """Build the queryset filters for the route and month
+
+        Returns:
+            dict -- keyword arguments for Flight.objects.filter
+        """
+        data = self.validated_data
+        year, month = (int(part) for part in data['month'].split('-'))
+        start = timezone.make_aware(datetime(year, month, 1))
+        end = timezone.make_aware(datetime(year + month // 12, month % 12 + 1, 1))
+        return {
+            'departing_airport': data['departing_airport'],
+            'destination_airport': data['destination_airport'],
+            'departure_datetime__gte': start,
+            'departure_datetime__lt': end,
+        }
@@ -1,14 +1,24 @@
+import io
+import json
+import os
 import pytz
+import tempfile
 from datetime import datetime
 from unittest.mock import patch
 
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.urls import reverse
 
 from rest_framework.test import APIClient, APITestCase
 from rest_framework.views import status
 
 from users.models import User
+from .cache import bump_catalog_version, get_catalog_changes, get_catalog_version
+from .itineraries import itinerary_graph
 from .models import Flight
+from .serializers import FlightSerializer, FlightReadSerializer
 
 
 class BaseViewTest(APITestCase):
@@ -22,6 +32,7 @@ class BaseViewTest(APITestCase):
     token = []
 
     def setUp(self):
+        cache.clear()
         self.user_data = {
             'email': 'user@example.com',
             'first_name': 'John',
@@ -199,6 +210,146 @@ class FlightListViewTest(BaseViewTest):
         self.assertEqual(response.data['detail'], 'Authentication credentials were not provided.')
 
 
+class FlightListPaginationTest(BaseDetailViewTest):
+    """Flight list pagination test class
+
+    Arguments:
+        BaseDetailViewTest {APITestCase} -- BaseDetailViewTest class
+    """
+    def test_get_flights_first_page(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        response = self.client.get(reverse('flight_list'), {'page_size': 1})
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(data['data']), 1)
+        self.assertEqual(data['data'][0]['id'], self.flight_1.id)
+        self.assertEqual(data['pagination']['page_size'], 1)
+        self.assertIsNotNone(data['pagination']['next'])
+        self.assertIsNone(data['pagination']['previous'])
+
+    def test_get_flights_following_and_preceding_pages(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        response = self.client.get(reverse('flight_list'), {'page_size': 1})
+
+        response = self.client.get(response.data['pagination']['next'])
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(data['data'][0]['id'], self.flight_2.id)
+        self.assertIsNone(data['pagination']['next'])
+        self.assertIsNotNone(data['pagination']['previous'])
+
+        response = self.client.get(data['pagination']['previous'])
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(data['data'][0]['id'], self.flight_1.id)
+        self.assertIsNotNone(data['pagination']['next'])
+        self.assertIsNone(data['pagination']['previous'])
+
+    def test_get_flights_with_invalid_cursor(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        response = self.client.get(reverse('flight_list'), {'cursor': 'not-a-cursor'})
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(data['status'], 'Error')
+        self.assertEqual(data['message'], 'Invalid cursor')
+
+    def test_stream_flights(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[0]}')
+        response = self.client.get(reverse('flight_list'), {
+            'stream': 'true',
+            'page_size': 1
+        })
+        data = json.loads(b''.join(response.streaming_content))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(data['status'], 'Success')
+        self.assertEqual(data['message'], 'Flights retrieved')
+        self.assertEqual([flight['id'] for flight in data['data']],
+                         [self.flight_1.id, self.flight_2.id])
+
+    def test_stream_flights_with_search(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[0]}')
+        response = self.client.get(reverse('flight_list'), {
+            'stream': 'true',
+            'departure_date': '2019-04-20'
+        })
+        data = json.loads(b''.join(response.streaming_content))
+
+        self.assertEqual([flight['id'] for flight in data['data']], [self.flight_2.id])
+
+    def test_stream_flights_with_non_admin_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        response = self.client.get(reverse('flight_list'), {'stream': 'true'})
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data['detail'], 'Request forbidden, must be an admin')
+
+
+class FlightSearchTest(BaseDetailViewTest):
+    """Flight search test class
+
+    Arguments:
+        BaseDetailViewTest {APITestCase} -- BaseDetailViewTest class
+    """
+    def test_search_flights_by_route(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        response = self.client.get(reverse('flight_list'), {
+            'departing_airport': 'los',
+            'destination_airport': 'DXB'
+        })
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([flight['id'] for flight in data['data']], [self.flight_1.id])
+
+    def test_search_flights_by_departure_date(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        response = self.client.get(reverse('flight_list'), {'departure_date': '2019-04-20'})
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([flight['id'] for flight in data['data']], [self.flight_2.id])
+
+    def test_search_flights_by_departure_range(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        response = self.client.get(reverse('flight_list'), {
+            'departure_after': '2019-04-11T00:00Z',
+            'departure_before': '2019-04-19T00:00Z'
+        })
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([flight['id'] for flight in data['data']], [self.flight_1.id])
+
+    def test_search_flights_with_invalid_departure_range(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        response = self.client.get(reverse('flight_list'), {
+            'departure_after': '2019-04-19T00:00Z',
+            'departure_before': '2019-04-11T00:00Z'
+        })
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(data['status'], 'Error')
+        self.assertEqual(data['message'], 'Provide valid query parameters')
+        self.assertEqual(data['error']['non_field_errors'],
+                         ['Departure_after must occur before departure_before'])
+
+    def test_search_flights_with_wrong_query_params(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        response = self.client.get(reverse('flight_list'), {'airline': 'AT'})
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(data['status'], 'Error')
+        self.assertEqual(data['message'], 'Invalid query params - airline')
+
+
 class FlightDetailViewTest(BaseDetailViewTest):
     """Flight detail view test class
 
@@ -358,3 +509,549 @@ class FlightDetailViewTest(BaseDetailViewTest):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertEqual(data['status'], 'Error')
         self.assertEqual(data['message'], 'Flight not found')
+
+
+class FlightCacheTest(BaseDetailViewTest):
+    """Flight cache test class
+
+    Arguments:
+        BaseDetailViewTest {APITestCase} -- BaseDetailViewTest class
+    """
+    def test_get_flight_returns_etag(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        response = self.client.get(reverse('flight_detail',
+                                   kwargs={'flight_pk': self.flight_1.id}))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['ETag'].startswith('"'))
+
+    def test_get_flight_with_matching_etag(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        url = reverse('flight_detail', kwargs={'flight_pk': self.flight_1.id})
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(1):
+            # Only the token user lookup hits the database
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_get_flights_served_from_cache(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        first = self.client.get(reverse('flight_list'))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('flight_list'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response.data, first.data)
+
+    def test_update_flight_invalidates_cache(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[0]}')
+        url = reverse('flight_detail', kwargs={'flight_pk': self.flight_1.id})
+        etag = self.client.get(url)['ETag']
+
+        self.flight_data[0].update({
+            'flight_cost': 280,
+            'created_by': self.admin.id
+        })
+        with patch('django.utils.timezone.now', return_value=self.MOCK_NOW):
+            self.client.put(url, self.flight_data[0], format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['data']['flight_cost'], '280.00')
+
+    def test_delete_flight_invalidates_cache(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[0]}')
+        self.client.get(reverse('flight_list'))
+
+        self.client.delete(reverse('flight_detail', kwargs={'flight_pk': self.flight_1.id}))
+        response = self.client.get(reverse('flight_list'))
+
+        self.assertEqual([flight['id'] for flight in response.data['data']],
+                         [self.flight_2.id])
+
+
+class FlightReadSerializerTest(BaseDetailViewTest):
+    """Flight read serializer test class
+
+    Arguments:
+        BaseDetailViewTest {APITestCase} -- BaseDetailViewTest class
+    """
+    def test_serialize_flights_like_flight_serializer(self):
+        flights = Flight.objects.order_by('id')
+        reader = FlightReadSerializer()
+
+        self.assertEqual(json.dumps(reader.serialize(reader.values(flights))),
+                         json.dumps(FlightSerializer(flights, many=True).data))
+
+    def test_get_flight_matches_flight_serializer(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        response = self.client.get(reverse('flight_detail',
+                                   kwargs={'flight_pk': self.flight_1.id}))
+
+        self.assertEqual(json.dumps(response.data['data']),
+                         json.dumps(FlightSerializer(self.flight_1).data))
+
+
+class FlightImportViewTest(BaseViewTest):
+    """Flight import view test class
+
+    Arguments:
+        BaseViewTest {APITestCase} -- BaseViewTest class
+    """
+    CSV_HEADER = ('flight_number,departure_datetime,arrival_datetime,flight_cost,'
+                  'departing,departing_airport,destination,destination_airport\n')
+
+    def upload(self, name, content):
+        return SimpleUploadedFile(name, content.encode('utf-8'))
+
+    def test_import_flights_with_non_admin_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        response = self.client.post(reverse('flight_import'), {
+            'file': self.upload('flights.csv', self.CSV_HEADER)
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data['detail'], 'Request forbidden, must be an admin')
+
+    def test_import_flights_without_file(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[0]}')
+        response = self.client.post(reverse('flight_import'), {})
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(data['message'], 'Provide a CSV or JSONL file to import')
+
+    def test_import_flights_with_unsupported_format(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[0]}')
+        response = self.client.post(reverse('flight_import'), {
+            'file': self.upload('flights.xml', '<flights/>')
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['message'], 'Import format must be one of csv, jsonl')
+
+    def test_import_flights_from_csv(self):
+        content = self.CSV_HEADER + (
+            'FE3433,2019-04-12T09:05Z,2019-04-13T12:00Z,300,Lagos,LOS,Dubai,DXB\n'
+            'TNE245,2019-04-20T00:05Z,2019-04-20T13:20Z,250,England,ENG,China,CHI\n'
+            'TNE$45,2019-04-20T00:05Z,2019-04-20T13:20Z,250,England,ENG,China,CHI\n'
+            'TNE246,2019-04-10T12:05Z,2019-04-10T13:20Z,250,England,ENG,China,CHI\n'
+            'TNE247,2019-04-20T00:05Z,2019-04-19T13:20Z,250,England,ENG,China,CHI\n')
+        with patch('django.utils.timezone.now', return_value=self.MOCK_NOW):
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[0]}')
+            response = self.client.post(reverse('flight_import'), {
+                'file': self.upload('flights.csv', content)
+            })
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(data['message'], 'Flights imported')
+        self.assertEqual(data['data']['imported'], 2)
+        self.assertEqual(data['data']['failed'], 3)
+        self.assertEqual(data['data']['errors'], [
+            {'row': 3, 'error': {'flight_number': ['Must be only alphanumeric characters']}},
+            {'row': 4, 'error': {'departure_datetime': [
+                'Departure_datetime must be at least 24 hours ahead']}},
+            {'row': 5, 'error': {'non_field_errors': [
+                'Arrival_datetime must occur after departure_datetime']}},
+        ])
+        flight = Flight.objects.get(flight_number='FE3433')
+        self.assertEqual(flight.flight_cost.amount, 300)
+        self.assertEqual(flight.created_by, self.admin)
+        version = get_catalog_version()
+        self.assertEqual(get_catalog_changes(version - 1, version),
+                         set(Flight.objects.filter(flight_number__in=['FE3433', 'TNE245'])
+                             .values_list('id', flat=True)))
+
+    def test_import_flights_from_jsonl_without_valid_rows(self):
+        content = ('{"flight_number": "FE3433", "flight_cost": 300}\n'
+                   'not json\n')
+        with patch('django.utils.timezone.now', return_value=self.MOCK_NOW):
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[0]}')
+            response = self.client.post(reverse('flight_import'), {
+                'file': self.upload('flights.jsonl', content)
+            })
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(data['message'], 'Could not import flights')
+        self.assertEqual(set(data['error'][0]['error']),
+                         set(['destination_airport', 'departing_airport', 'departing',
+                              'departure_datetime', 'arrival_datetime', 'destination']))
+        self.assertEqual(data['error'][1], {
+            'row': 2, 'error': {'non_field_errors': ['Row must be a JSON object']}})
+        self.assertFalse(Flight.objects.exists())
+
+    def test_import_flights_with_invalid_currency(self):
+        content = (
+            '{"flight_number": "FE3433", "departure_datetime": "2019-04-12T09:05Z", '
+            '"arrival_datetime": "2019-04-13T12:00Z", "flight_cost": 300, '
+            '"flight_cost_currency": "DOLLARS", "departing": "Lagos", '
+            '"departing_airport": "LOS", "destination": "Dubai", "destination_airport": "DXB"}\n')
+        with patch('django.utils.timezone.now', return_value=self.MOCK_NOW):
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[0]}')
+            response = self.client.post(reverse('flight_import'), {
+                'file': self.upload('flights.jsonl', content)
+            })
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], [{'row': 1, 'error': {
+            'flight_cost_currency': ['"DOLLARS" is not a valid choice.']}}])
+        self.assertFalse(Flight.objects.exists())
+
+    def test_import_flights_with_invalid_capacity(self):
+        row = ('{"flight_number": "FE3433", "departure_datetime": "2019-04-12T09:05Z", '
+               '"arrival_datetime": "2019-04-13T12:00Z", "flight_cost": 300, '
+               '"departing": "Lagos", "departing_airport": "LOS", '
+               '"destination": "Dubai", "destination_airport": "DXB", "capacity": "%s"}\n')
+        content = row % '\u00b2' + row % '2147483648'
+        with patch('django.utils.timezone.now', return_value=self.MOCK_NOW):
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[0]}')
+            response = self.client.post(reverse('flight_import'), {
+                'file': self.upload('flights.jsonl', content)
+            })
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], [
+            {'row': 1, 'error': {'capacity': ['A valid integer is required.']}},
+            {'row': 2, 'error': {'capacity': [
+                'Ensure this value is less than or equal to 2147483647.']}},
+        ])
+        self.assertFalse(Flight.objects.exists())
+
+    def test_import_flights_command(self):
+        path = self.create_temp_file(
+            '{"flight_number": "FE3433", "departure_datetime": "2019-04-12T09:05Z", '
+            '"arrival_datetime": "2019-04-13T12:00Z", "flight_cost": 300, '
+            '"departing": "Lagos", "departing_airport": "LOS", '
+            '"destination": "Dubai", "destination_airport": "DXB"}\n')
+        with patch('django.utils.timezone.now', return_value=self.MOCK_NOW):
+            call_command('import_flights', path, created_by=self.admin.email,
+                         stdout=io.StringIO())
+
+        self.assertTrue(Flight.objects.filter(flight_number='FE3433').exists())
+
+    def create_temp_file(self, content):
+        temp = tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False)
+        with temp:
+            temp.write(content)
+        self.addCleanup(os.remove, temp.name)
+        return temp.name
+
+
+class FlightBatchViewTest(BaseDetailViewTest):
+    """Flight batch view test class
+
+    Arguments:
+        BaseDetailViewTest {APITestCase} -- BaseDetailViewTest class
+    """
+    def test_batch_with_non_admin_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        response = self.client.post(reverse('flight_batch'), {'delete': [1]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_batch_with_invalid_request(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[0]}')
+        response = self.client.post(reverse('flight_batch'), {
+            'delete': [self.flight_1.id],
+            'filter': {'departing_airport': 'LOS'}
+        }, format='json')
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(data['message'], 'Could not process the batch')
+        self.assertEqual(data['error']['non_field_errors'],
+                         ['Provide either updates and delete, or filter'])
+
+    def test_batch_update_flights_by_id(self):
+        with patch('django.utils.timezone.now', return_value=self.MOCK_NOW):
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[0]}')
+            response = self.client.post(reverse('flight_batch'), {
+                'updates': [
+                    {'id': self.flight_1.id, 'departure_datetime': '2019-04-12T10:05Z'},
+                    {'id': self.flight_2.id, 'flight_cost': 275},
+                    {'id': 9999, 'flight_cost': 100},
+                ]
+            }, format='json')
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(data['data']['updated'], 2)
+        self.assertEqual(data['data']['failed'], 1)
+        self.assertEqual(data['data']['results'][2], {'id': 9999, 'status': 'not_found'})
+        self.flight_1.refresh_from_db()
+        self.flight_2.refresh_from_db()
+        self.assertEqual(self.flight_1.departure_datetime,
+                         datetime(2019, 4, 12, 10, 5, tzinfo=pytz.utc))
+        self.assertEqual(self.flight_2.flight_cost.amount, 275)
+
+    def test_batch_update_flights_with_invalid_changes(self):
+        with patch('django.utils.timezone.now', return_value=self.MOCK_NOW):
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[0]}')
+            response = self.client.post(reverse('flight_batch'), {
+                'updates': [
+                    {'id': self.flight_1.id, 'arrival_datetime': '2019-04-11T10:05Z'},
+                    {'id': self.flight_2.id, 'departure_datetime': '2019-04-10T10:05Z'},
+                ]
+            }, format='json')
+        results = response.data['data']['results']
+
+        self.assertEqual(results[0]['status'], 'invalid')
+        self.assertEqual(results[0]['error']['non_field_errors'],
+                         ['Arrival_datetime must occur after departure_datetime'])
+        self.assertEqual(results[1]['error']['departure_datetime'],
+                         ['Departure_datetime must be at least 24 hours ahead'])
+
+    def test_batch_update_flights_by_filter(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[0]}')
+        response = self.client.post(reverse('flight_batch'), {
+            'filter': {'departing_airport': 'ENG'},
+            'changes': {'flight_cost': 199}
+        }, format='json')
+
+        self.assertEqual(response.data['data']['updated'], 1)
+        self.flight_2.refresh_from_db()
+        self.assertEqual(self.flight_2.flight_cost.amount, 199)
+
+    def test_batch_delete_flights(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[0]}')
+        response = self.client.post(reverse('flight_batch'), {
+            'delete': [self.flight_1.id, 9999]
+        }, format='json')
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(data['data']['results'], [
+            {'id': self.flight_1.id, 'status': 'deleted'},
+            {'id': 9999, 'status': 'not_found'},
+        ])
+        self.assertFalse(Flight.objects.filter(id=self.flight_1.id).exists())
+
+
+class ItineraryListViewTest(BaseDetailViewTest):
+    """Itinerary list view test class
+
+    Arguments:
+        BaseDetailViewTest {APITestCase} -- BaseDetailViewTest class
+    """
+    def setUp(self):
+        super().setUp()
+        itinerary_graph.reset()
+
+        leg = {
+            'departing': 'Dubai',
+            'departing_airport': 'DXB',
+            'destination': 'Nairobi',
+            'destination_airport': 'NBO',
+        }
+        self.connection = self.create_flight({
+            **leg,
+            'flight_number': 'EK719',
+            'departure_datetime': '2019-04-13T13:00Z',
+            'arrival_datetime': '2019-04-13T18:00Z',
+            'flight_cost': 200,
+        })
+        self.create_flight({
+            **leg,
+            'flight_number': 'EK721',
+            'departure_datetime': '2019-04-13T12:30Z',
+            'arrival_datetime': '2019-04-13T17:30Z',
+            'flight_cost': 100,
+        })
+        self.direct = self.create_flight({
+            'flight_number': 'KQ533',
+            'departure_datetime': '2019-04-12T20:00Z',
+            'arrival_datetime': '2019-04-13T03:00Z',
+            'flight_cost': 900,
+            'departing': 'Lagos',
+            'departing_airport': 'LOS',
+            'destination': 'Nairobi',
+            'destination_airport': 'NBO',
+        })
+
+    def search(self, **params):
+        params = {
+            'departing_airport': 'LOS',
+            'destination_airport': 'NBO',
+            'departure_date': '2019-04-12',
+            **params
+        }
+        with patch('django.utils.timezone.now', return_value=self.MOCK_NOW):
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+            return self.client.get(reverse('itinerary_list'), params)
+
+    def test_search_itineraries_by_duration(self):
+        response = self.search()
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(data['message'], 'Itineraries retrieved')
+        self.assertEqual([[flight['id'] for flight in itinerary['flights']]
+                          for itinerary in data['data']],
+                         [[self.direct.id], [self.flight_1.id, self.connection.id]])
+        self.assertEqual(data['data'][0]['stops'], 0)
+        self.assertEqual(data['data'][0]['duration'], 7 * 60)
+
+    def test_search_itineraries_by_cost(self):
+        response = self.search(sort='cost')
+        data = response.data
+
+        self.assertEqual(data['data'][0]['stops'], 1)
+        self.assertEqual(data['data'][0]['total_cost'], '500.00')
+
+    def test_search_itineraries_without_stops(self):
+        response = self.search(max_stops=0)
+
+        self.assertEqual(len(response.data['data']), 1)
+
+    def test_search_itineraries_follows_flight_changes(self):
+        self.search()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[0]}')
+        self.client.delete(reverse('flight_detail', kwargs={'flight_pk': self.direct.id}))
+
+        response = self.search()
+
+        self.assertEqual(len(response.data['data']), 1)
+        self.assertEqual(response.data['data'][0]['stops'], 1)
+
+    def test_search_itineraries_drops_deleted_flight_when_another_is_added(self):
+        self.search()
+        Flight.objects.filter(id=self.direct.id).delete()
+        self.create_flight({
+            'flight_number': 'KQ535',
+            'departure_datetime': '2019-04-14T20:00Z',
+            'arrival_datetime': '2019-04-15T03:00Z',
+            'flight_cost': 900,
+            'departing': 'Lagos',
+            'departing_airport': 'LOS',
+            'destination': 'Nairobi',
+            'destination_airport': 'NBO',
+        })
+        bump_catalog_version()
+
+        response = self.search()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(itinerary_graph.snapshot.leg(self.direct.id))
+        self.assertEqual([itinerary['stops'] for itinerary in response.data['data']], [1])
+
+    def test_search_itineraries_syncs_only_the_recorded_flights(self):
+        self.search()
+        before = itinerary_graph.snapshot
+        Flight.objects.filter(id=self.direct.id).delete()
+        bump_catalog_version([self.direct.id])
+
+        with patch.object(itinerary_graph, 'rebuild') as rebuild:
+            response = self.search()
+
+        rebuild.assert_not_called()
+        self.assertIsNone(itinerary_graph.snapshot.leg(self.direct.id))
+        self.assertIsNotNone(before.leg(self.direct.id))
+        self.assertIs(itinerary_graph.snapshot.departures['DXB'], before.departures['DXB'])
+        self.assertEqual([itinerary['stops'] for itinerary in response.data['data']], [1])
+
+    def test_search_itineraries_with_invalid_params(self):
+        response = self.search(destination_airport='LOS')
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(data['error']['non_field_errors'],
+                         ['Departing_airport must differ from destination_airport'])
+
+
+class FareCalendarViewTest(BaseDetailViewTest):
+    """Fare calendar view test class
+
+    Arguments:
+        BaseDetailViewTest {APITestCase} -- BaseDetailViewTest class
+    """
+    def setUp(self):
+        super().setUp()
+        self.create_flight({
+            'flight_number': 'FE3435',
+            'departure_datetime': '2019-04-12T18:05Z',
+            'arrival_datetime': '2019-04-13T20:00Z',
+            'flight_cost': 280,
+            'departing': 'Lagos',
+            'departing_airport': 'LOS',
+            'destination': 'Dubai',
+            'destination_airport': 'DXB',
+        })
+        self.create_flight({
+            'flight_number': 'FE3437',
+            'departure_datetime': '2019-04-14T09:05Z',
+            'arrival_datetime': '2019-04-15T12:00Z',
+            'flight_cost': 350,
+            'departing': 'Lagos',
+            'departing_airport': 'LOS',
+            'destination': 'Dubai',
+            'destination_airport': 'DXB',
+        })
+
+    def get_fares(self, **params):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[1]}')
+        return self.client.get(reverse('fare_calendar'), {
+            'departing_airport': 'LOS',
+            'destination_airport': 'DXB',
+            'month': '2019-04',
+            **params
+        })
+
+    def test_get_fare_calendar(self):
+        response = self.get_fares()
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(data['message'], 'Fares retrieved')
+        self.assertEqual(data['data']['fares'], [
+            {'date': '2019-04-12', 'min_cost': '280.00', 'currency': 'USD'},
+            {'date': '2019-04-14', 'min_cost': '350.00', 'currency': 'USD'},
+        ])
+
+    def test_get_fare_calendar_from_cache(self):
+        self.get_fares()
+
+        with self.assertNumQueries(1):
+            response = self.get_fares()
+
+        self.assertEqual(len(response.data['data']['fares']), 2)
+
+    def test_update_flight_invalidates_fare_calendar(self):
+        self.get_fares()
+        self.flight_data[0].update({
+            'flight_cost': 250,
+            'created_by': self.admin.id
+        })
+        with patch('django.utils.timezone.now', return_value=self.MOCK_NOW):
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token[0]}')
+            self.client.put(reverse('flight_detail', kwargs={'flight_pk': self.flight_1.id}),
+                            self.flight_data[0], format='json')
+
+        response = self.get_fares()
+
+        self.assertEqual(response.data['data']['fares'][0]['min_cost'], '250.00')
+
+    def test_get_fare_calendar_with_invalid_month(self):
+        response = self.get_fares(month='2019-13')
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(data['error']['month'], ['Month must be in the format YYYY-MM'])
+
+    def test_get_fare_calendar_with_invalid_airport(self):
+        with patch('flights.views.cache') as cache:
+            response = self.get_fares(departing_airport='L S', destination_airport='D\x07B')
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        for field in ('departing_airport', 'destination_airport'):
+            self.assertEqual(data['error'][field],
+                             ['Airport must be a 3 character code of letters and digits'])
+        cache.get.assert_not_called()
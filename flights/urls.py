@@ -1,8 +1,13 @@
 from django.urls import path
 
-from .views import FlightListView, FlightDetailView
+from .views import (FlightListView, FlightDetailView, FlightImportView, FlightBatchView,
+                    ItineraryListView, FareCalendarView)
 
 urlpatterns = [
     path('flights', FlightListView.as_view(), name='flight_list'),
+    path('flights/import', FlightImportView.as_view(), name='flight_import'),
+    path('flights/batch', FlightBatchView.as_view(), name='flight_batch'),
+    path('flights/itineraries', ItineraryListView.as_view(), name='itinerary_list'),
+    path('flights/fares', FareCalendarView.as_view(), name='fare_calendar'),
     path('flights/<int:flight_pk>', FlightDetailView.as_view(), name='flight_detail')
 ]
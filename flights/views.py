@@ -1,11 +1,28 @@
+import codecs
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import DecimalField, Min
+from django.db.models.functions import TruncDate
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAdminUser, IsAuthenticated, SAFE_METHODS
 
+from api.helpers.pagination import InvalidCursor, KeysetPagination
+from api.helpers.streaming import stream_envelope
 from api.helpers.validators import validate_resource_exist
+from .cache import (bump_catalog_version, bump_route_versions, catalog_cache_key,
+                    get_route_version, make_etag, etag_matches, not_modified)
+from .batch import FlightBatch
+from .itineraries import itinerary_graph
+from .importer import FlightImporter, ImportFormatError, get_import_format, read_rows
 from .models import Flight
-from .serializers import FlightSerializer
+from .serializers import (FlightSerializer, FlightReadSerializer, FlightSearchSerializer,
+                          FlightBatchSerializer, ItinerarySearchSerializer,
+                          FareCalendarSerializer)
+
+flight_reader = FlightReadSerializer()
 
 
 class IsAdminUserOrReadOnly(IsAdminUser):
@@ -29,6 +46,7 @@ class FlightListView(APIView):
         APIView {view} -- rest_framework API view
     """
     permission_classes = (IsAuthenticated, IsAdminUserOrReadOnly)
+    stream_query_param = 'stream'
 
     def post(self, request, format=None):
         flight = request.data
@@ -51,13 +69,78 @@ class FlightListView(APIView):
         status=status.HTTP_400_BAD_REQUEST)
 
     def get(self, request, format=None):
-        flights = Flight.objects.all()
-        serializer = FlightSerializer(flights, many=True)
+        if self.is_stream(request) and not IsAdminUser().has_permission(request, self):
+            # Streaming exports the whole catalog in one response
+            self.permission_denied(request, message=IsAdminUserOrReadOnly.message)
+
+        cache_key = catalog_cache_key('list', request.build_absolute_uri())
+        etag = make_etag(cache_key)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        payload = cache.get(cache_key)
+        if payload is None:
+            response = self.list_flights(request)
+            if response.status_code != status.HTTP_200_OK or response.streaming:
+                return response
+            payload = response.data
+            cache.set(cache_key, payload, settings.FLIGHT_CACHE_TIMEOUT)
+
+        response = Response(payload, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        return response
+
+    def is_stream(self, request):
+        return request.query_params.get(self.stream_query_param, '').lower() in ('1', 'true')
+
+    def list_flights(self, request):
+        params = request.query_params
+        paginator = KeysetPagination(('departure_datetime', 'id'),
+                                     settings.FLIGHT_LIST_PAGE_SIZE,
+                                     settings.FLIGHT_LIST_MAX_PAGE_SIZE)
+        supported_keys = (*FlightSearchSerializer().fields,
+                          paginator.cursor_query_param,
+                          paginator.page_size_query_param,
+                          self.stream_query_param)
+        invalid_keys = [key for key in params.keys() if key not in supported_keys]
+        if invalid_keys:
+            return Response({
+                'status': 'Error',
+                'message': f'Invalid query params - {", ".join(invalid_keys)}'
+            },
+            status=status.HTTP_400_BAD_REQUEST)
+
+        search = FlightSearchSerializer(data=params)
+        if not search.is_valid():
+            return Response({
+                'status': 'Error',
+                'message': 'Provide valid query parameters',
+                'error': search.errors
+            },
+            status=status.HTTP_400_BAD_REQUEST)
+
+        flights = flight_reader.values(Flight.objects.filter(**search.get_filters()))
+        if self.is_stream(request):
+            # Exports stream every matching flight instead of a single page
+            return stream_envelope('Flights retrieved',
+                                   flights.order_by('departure_datetime', 'id'),
+                                   flight_reader.serialize,
+                                   settings.FLIGHT_EXPORT_CHUNK_SIZE)
+
+        try:
+            flights = paginator.paginate_queryset(flights, request)
+        except InvalidCursor as error:
+            return Response({
+                'status': 'Error',
+                'message': str(error)
+            },
+            status=status.HTTP_400_BAD_REQUEST)
 
         return Response({
             'status': 'Success',
             'message': 'Flights retrieved',
-            'data': serializer.data
+            'data': flight_reader.serialize(flights),
+            'pagination': paginator.get_pagination_data()
         },
         status=status.HTTP_200_OK)
 
@@ -70,17 +153,32 @@ class FlightDetailView(APIView):
     """
     permission_classes = (IsAuthenticated, IsAdminUserOrReadOnly)
 
-    @validate_resource_exist(Flight, 'flight')
-    def get(self, request, flight_pk, format=None, **kwargs):
-        instance = kwargs['flight']
-        serializer = FlightSerializer(instance)
+    def get(self, request, flight_pk, format=None):
+        cache_key = catalog_cache_key('detail', flight_pk)
+        etag = make_etag(cache_key)
+        if etag_matches(request, etag):
+            return not_modified(etag)
 
-        return Response({
-            'status': 'Success',
-            'message': 'Flight retrieved',
-            'data': serializer.data
-        },
-        status=status.HTTP_200_OK)
+        payload = cache.get(cache_key)
+        if payload is None:
+            flight = flight_reader.values(Flight.objects.filter(pk=flight_pk)).first()
+            if flight is None:
+                return Response({
+                    'status': 'Error',
+                    'message': 'Flight not found'
+                },
+                status=status.HTTP_404_NOT_FOUND)
+
+            payload = {
+                'status': 'Success',
+                'message': 'Flight retrieved',
+                'data': flight_reader.to_representation(flight)
+            }
+            cache.set(cache_key, payload, settings.FLIGHT_CACHE_TIMEOUT)
+
+        response = Response(payload, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        return response
 
     @validate_resource_exist(Flight, 'flight')
     def put(self, request, flight_pk, format=None, **kwargs):
@@ -106,10 +204,194 @@ class FlightDetailView(APIView):
     @validate_resource_exist(Flight, 'flight')
     def delete(self, request, flight_pk, format=None, **kwargs):
         instance = kwargs['flight']
+        flight_id = instance.id
         instance.delete()
+        bump_catalog_version([flight_id])
+        bump_route_versions([(instance.departing_airport, instance.destination_airport)])
 
         return Response({
             'status': 'Success',
             'message': 'Flight deleted'
         },
         status=status.HTTP_200_OK)
+
+
+class FlightImportView(APIView):
+    """Flight bulk import view
+
+    Arguments:
+        APIView {view} -- rest_framework API view
+    """
+    permission_classes = (IsAuthenticated, IsAdminUserOrReadOnly)
+
+    def post(self, request, format=None):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({
+                'status': 'Error',
+                'message': 'Provide a CSV or JSONL file to import'
+            },
+            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            file_format = get_import_format(upload.name, request.data.get('format'))
+            rows = read_rows(codecs.iterdecode(upload, 'utf-8'), file_format)
+            report = FlightImporter(request.user).run(rows)
+        except (ImportFormatError, UnicodeDecodeError) as error:
+            return Response({
+                'status': 'Error',
+                'message': str(error)
+            },
+            status=status.HTTP_400_BAD_REQUEST)
+
+        if report['failed'] and not report['imported']:
+            return Response({
+                'status': 'Error',
+                'message': 'Could not import flights',
+                'error': report['errors']
+            },
+            status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'status': 'Success',
+            'message': 'Flights imported',
+            'data': report
+        },
+        status=status.HTTP_201_CREATED)
+
+
+class FlightBatchView(APIView):
+    """Flight batch update and delete view
+
+    Arguments:
+        APIView {view} -- rest_framework API view
+    """
+    permission_classes = (IsAuthenticated, IsAdminUserOrReadOnly)
+
+    def post(self, request, format=None):
+        serializer = FlightBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'status': 'Error',
+                'message': 'Could not process the batch',
+                'error': serializer.errors
+            },
+            status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        updates, deletes = data.get('updates', []), data.get('delete', [])
+        if 'filter' in data:
+            ids = Flight.objects.filter(**data['filter']).order_by('id').values_list(
+                'id', flat=True)
+            if data['delete_all']:
+                deletes = list(ids)
+            else:
+                updates = [{**data['changes'], 'id': flight_id} for flight_id in ids]
+
+        return Response({
+            'status': 'Success',
+            'message': 'Batch processed',
+            'data': FlightBatch().run(updates, deletes)
+        },
+        status=status.HTTP_200_OK)
+
+
+class ItineraryListView(APIView):
+    """Itinerary search view
+
+    Arguments:
+        APIView {view} -- rest_framework API view
+    """
+    def get(self, request, format=None):
+        params = request.query_params
+        search = ItinerarySearchSerializer(data=params)
+        invalid_keys = [key for key in params.keys() if key not in search.fields]
+        if invalid_keys:
+            return Response({
+                'status': 'Error',
+                'message': f'Invalid query params - {", ".join(invalid_keys)}'
+            },
+            status=status.HTTP_400_BAD_REQUEST)
+        if not search.is_valid():
+            return Response({
+                'status': 'Error',
+                'message': 'Provide valid query parameters',
+                'error': search.errors
+            },
+            status=status.HTTP_400_BAD_REQUEST)
+
+        itineraries = itinerary_graph.search(**search.get_search())
+        ids = {leg.id for legs in itineraries for leg in legs}
+        flights = {flight['id']: flight for flight in flight_reader.serialize(
+            flight_reader.values(Flight.objects.filter(id__in=ids)))}
+
+        # A flight deleted since the graph was synced drops its itineraries
+        itineraries = [legs for legs in itineraries if all(leg.id in flights for leg in legs)]
+
+        return Response({
+            'status': 'Success',
+            'message': 'Itineraries retrieved',
+            'data': [{
+                'stops': len(legs) - 1,
+                'duration': int(legs[-1].arrival - legs[0].departure) // 60,
+                'total_cost': str(sum(leg.cost for leg in legs)),
+                'currency': legs[0].currency,
+                'flights': [flights[leg.id] for leg in legs]
+            } for legs in itineraries]
+        },
+        status=status.HTTP_200_OK)
+
+
+class FareCalendarView(APIView):
+    """Fare calendar view
+
+    Arguments:
+        APIView {view} -- rest_framework API view
+    """
+    def get(self, request, format=None):
+        params = request.query_params
+        calendar = FareCalendarSerializer(data=params)
+        invalid_keys = [key for key in params.keys() if key not in calendar.fields]
+        if invalid_keys:
+            return Response({
+                'status': 'Error',
+                'message': f'Invalid query params - {", ".join(invalid_keys)}'
+            },
+            status=status.HTTP_400_BAD_REQUEST)
+        if not calendar.is_valid():
+            return Response({
+                'status': 'Error',
+                'message': 'Provide valid query parameters',
+                'error': calendar.errors
+            },
+            status=status.HTTP_400_BAD_REQUEST)
+
+        data = calendar.validated_data
+        route = (data['departing_airport'], data['destination_airport'])
+        cache_key = f'flights:fares:{":".join(route)}:{get_route_version(*route)}:{data["month"]}'
+        fares = cache.get(cache_key)
+        if fares is None:
+            # One grouped aggregate over the route index range of the month
+            days = (Flight.objects.filter(**calendar.get_filters())
+                    .annotate(date=TruncDate('departure_datetime'))
+                    .values('date', 'flight_cost_currency')
+                    .annotate(min_cost=Min('flight_cost', output_field=DecimalField(
+                        max_digits=19, decimal_places=2)))
+                    .order_by('date', 'flight_cost_currency'))
+            fares = [{
+                'date': day['date'].isoformat(),
+                'min_cost': str(day['min_cost']),
+                'currency': day['flight_cost_currency']
+            } for day in days]
+            cache.set(cache_key, fares, settings.FLIGHT_CACHE_TIMEOUT)
+
+        return Response({
+            'status': 'Success',
+            'message': 'Fares retrieved',
+            'data': {
+                'departing_airport': route[0],
+                'destination_airport': route[1],
+                'month': data['month'],
+                'fares': fares
+            }
+        },
+        status=status.HTTP_200_OK)
@@ -6,6 +6,7 @@ from rest_framework import status
 from rest_framework.permissions import AllowAny
 
 from api.helpers.auth import get_token
+from bookings.cache import invalidate_passenger_tickets
 from .models import User
 from .serializers import UserSerializer, ImageSerializer
 
@@ -102,6 +103,7 @@ class ProfilePhotoView(APIView):
         if serializer.is_valid():
             request.user.passport_photo.delete()
             serializer.save()
+            invalidate_passenger_tickets(request.user)
 
             return Response({
                 'status': 'Success',
@@ -127,6 +129,7 @@ class ProfilePhotoView(APIView):
 
         if user.passport_photo:
             user.passport_photo.delete()
+            invalidate_passenger_tickets(user)
             return Response({
                 'status': 'Success',
                 'message': 'Passport photo deleted'